@@ -3,7 +3,7 @@ import pandas as pd
 import os
 import time
 import logging
-from src.utils import db_utils
+from src.utils import db_utils, migrations, image_server
 from src.components import workspace_dashboard, admin, recipe_display, design
 from src.components.workspace_dashboard import production_dashboard
 from src.components.admin import admin_inventory_view, production_viewer, forecaster, admin_settings
@@ -26,9 +26,22 @@ logger = logging.getLogger(__name__)
 
 st.title("University Flowers Production Dashboard")
 
+@st.cache_resource
+def ensure_schema(db_path: str) -> int:
+    """Upgrades an existing database in place. Runs once per server process."""
+    return migrations.migrate_database(db_path)
+
+@st.cache_resource
+def start_image_server():
+    """Serves product images by immutable URL (browser-cached). Runs once per server process."""
+    return image_server.start()
+
 if not os.path.exists(db_utils.DB_PATH):
     st.error("Database not found! Please run `python init_db.py` first.")
 else:
+    ensure_schema(db_utils.DB_PATH)
+    start_image_server()
+
     # Handle pending navigation changes (Fix for StreamlitAPIException)
     # We update the state BEFORE the widgets are instantiated in the new run
     if "pending_nav_main" in st.session_state:
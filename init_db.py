@@ -2,6 +2,7 @@ import sqlite3
 import logging
 import os
 import sys
+from src.utils import migrations
 
 # Configure logging to match GEMINI.md standards
 if not os.path.exists('logs'):
@@ -101,7 +102,10 @@ def initialize_database(db_path='inventory.db', reset=False):
         ''')
 
         connection.commit()
-        logger.info(f"Database initialized successfully at '{db_path}'.")
+
+        # Bring the baseline schema up to date (indexes and later additions)
+        version = migrations.run_migrations(connection)
+        logger.info(f"Database initialized successfully at '{db_path}' (schema version {version}).")
     except sqlite3.Error as e:
         logger.error(f"init_db: Database error: {e}")
     finally:
@@ -3,13 +3,17 @@ import time
 import logging
 import pandas as pd
 from src.utils import db_utils
+from src.components import change_watcher
 
 logger = logging.getLogger(__name__)
 
+# Changes to these tables refresh the stock view (see change_watcher.load)
+WATCHED_TABLES = ("inventory",)
+
 @st.fragment(run_every=10)
 def render_stock_levels(raw_inventory_df):
-    # Fetch fresh data to ensure auto-updates work within the fragment
-    raw_inventory_df = db_utils.get_inventory()
+    # Fetch fresh data to ensure auto-updates work within the fragment (reused while inventory is unchanged)
+    raw_inventory_df = change_watcher.load("stock_levels", WATCHED_TABLES, db_utils.get_inventory)
 
     # Ensure numeric columns are actually numeric to avoid TypeErrors during subtraction
     if not raw_inventory_df.empty:
@@ -65,45 +69,22 @@ def render_stock_levels(raw_inventory_df):
             key="inventory_editor"
         )
 
-        # Detect Changes
-        changes_count = 0
-        changed_rows = []
-        diff_data = []
-        
-        for index, row in edited_df.iterrows():
-            original = raw_inventory_df[raw_inventory_df['item_id'] == row['item_id']]
-            if not original.empty:
-                orig_row = original.iloc[0]
-                
-                cost_changed = abs(row['unit_cost'] - orig_row['unit_cost']) > 0.001
-                count_changed = row['count_on_hand'] != orig_row['count_on_hand']
-                bundle_changed = row['bundle_count'] != orig_row['bundle_count']
-                
-                if cost_changed or count_changed or bundle_changed:
-                    changes_count += 1
-                    changed_rows.append(row)
-                    diff_data.append({
-                        "Item": row['name'],
-                        "Old Stock": orig_row['count_on_hand'],
-                        "New Stock": row['count_on_hand'],
-                        "Old Bundle": orig_row['bundle_count'],
-                        "New Bundle": row['bundle_count'],
-                        "Old Cost": orig_row['unit_cost'],
-                        "New Cost": row['unit_cost']
-                    })
+        # Detect Changes (one join on item_id instead of a per-row lookup)
+        diff_df = db_utils.diff_inventory_edits(raw_inventory_df, edited_df)
+        changes_count = len(diff_df)
 
         def perform_save():
             if changes_count > 0:
-                success_count = 0
-                for row in changed_rows:
-                    if db_utils.update_item_details(row['item_id'], row['count_on_hand'], row['unit_cost'], row['bundle_count']):
-                        success_count += 1
+                rows = list(zip(diff_df['item_id'], diff_df['New Stock'], diff_df['New Cost'], diff_df['New Bundle']))
+                success_count = db_utils.update_item_details_bulk(rows)
                 
                 if success_count > 0:
                     logger.info(f"Inventory updated via Admin: {success_count} items changed.")
                     st.toast(f"Updated {success_count} items.")
                     time.sleep(0.25)
                     st.rerun()
+                else:
+                    st.error("Could not save changes. Please try again.")
             else:
                 st.info("No changes detected.")
 
@@ -111,9 +92,8 @@ def render_stock_levels(raw_inventory_df):
             st.divider()
             st.caption("Review Changes:")
             
-            diff_df = pd.DataFrame(diff_data)
             # Ensure column order for consistent indexing in the styler
-            diff_df = diff_df[["Item", "Old Stock", "New Stock", "Old Bundle", "New Bundle", "Old Cost", "New Cost"]]
+            review_df = diff_df[["Item", "Old Stock", "New Stock", "Old Bundle", "New Bundle", "Old Cost", "New Cost"]]
             
             def highlight_cells(x):
                 c = [''] * len(x)
@@ -129,7 +109,7 @@ def render_stock_levels(raw_inventory_df):
                 return c
 
             st.dataframe(
-                diff_df.style.apply(highlight_cells, axis=1).format({"Old Cost": "${:.2f}", "New Cost": "${:.2f}"}),
+                review_df.style.apply(highlight_cells, axis=1).format({"Old Cost": "${:.2f}", "New Cost": "${:.2f}"}),
                 hide_index=True,
                 width="stretch"
             )
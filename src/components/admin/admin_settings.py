@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from src.utils import settings_utils
+from src.utils import settings_utils, db_utils
 
 def render_settings_panel():
     st.header("⚙️ System Settings")
@@ -66,4 +66,63 @@ def render_settings_panel():
             st.success("Settings saved successfully!")
             st.rerun()
         else:
-            st.error("Failed to save settings.")
\ No newline at end of file
+            st.error("Failed to save settings.")
+    st.divider()
+    render_performance_stats()
+    st.divider()
+    render_image_storage()
+
+def render_performance_stats():
+    """Read cache and connection pool counters, for checking that polling reads stay cheap."""
+    st.subheader("⚡ Performance")
+    st.caption("Shared by all open sessions. Counters reset when the app restarts.")
+    
+    cache_stats = db_utils.get_cache_stats()
+    image_stats = db_utils.get_image_cache_stats()
+    pool_stats = db_utils.get_pool_stats()
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    c2.metric("Cache Hits / Misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+    c3.metric("Pooled Connections Reused", pool_stats['reused'])
+    c4.metric("Writes Seen", pool_stats['write_generation'])
+    
+    i1, i2, i3 = st.columns(3)
+    i1.metric("Image Cache Hit Rate", f"{image_stats['hit_rate']:.0%}")
+    i2.metric("Image Cache Memory", f"{image_stats['mb_used']:.1f} / {image_stats['mb_limit']:.0f} MB")
+    i3.metric("Images Cached", image_stats['entries'])
+    
+    with st.expander("Raw Counters"):
+        st.json({"read_cache": cache_stats, "image_cache": image_stats, "connection_pool": pool_stats})
+    
+    if st.button("🧹 Clear Read Cache", key="clear_read_cache"):
+        db_utils.clear_read_cache()
+        db_utils.clear_image_cache()
+        st.toast("Read and image caches cleared.", icon="🧹")
+
+def render_image_storage():
+    """Stored product images and garbage collection of the ones no product version uses."""
+    st.subheader("🗄️ Image Storage")
+    st.caption("Each unique photo is stored once and shared by every product version that uses it. "
+               "Photos no version uses any more (e.g. replaced images) can be purged.")
+    
+    stats = db_utils.get_image_storage_stats()
+    if not stats:
+        st.error("Could not read image storage stats.")
+        return
+    
+    s1, s2, s3 = st.columns(3)
+    s1.metric("Stored Images", stats['images'], help=f"Referenced by {stats['references']} product versions")
+    s2.metric("Image Storage", f"{stats['stored_mb']:.1f} MB")
+    s3.metric("Unreferenced", stats['unreferenced'], help=f"{stats['unreferenced_mb']:.1f} MB reclaimable")
+    
+    vacuum = st.checkbox("Compact database afterwards (VACUUM)", key="purge_images_vacuum",
+                         help="Returns the freed space to the disk. Can take a while on large databases; avoid during service.")
+    if st.button("🧹 Purge Unreferenced Images", key="purge_images", disabled=stats['unreferenced'] == 0):
+        with st.spinner("Purging..."):
+            result = db_utils.purge_unreferenced_images(vacuum=vacuum)
+        if result is None:
+            st.error("Database error occurred.")
+        else:
+            st.toast(f"Purged {result['images']} images ({result['renditions']} renditions).", icon="🧹")
+            st.rerun()
@@ -2,6 +2,21 @@ import streamlit as st
 import time
 from src.utils import db_utils
 
+# Uploads larger than this are streamed in chunks with a progress bar. An interrupted
+# streamed import resumes from its last committed chunk when the same file is uploaded again.
+STREAM_UPLOAD_BYTES = 1024 * 1024
+
+def _run_import(importer, uploaded_file):
+    """Runs a bulk importer, streaming big files so the shop PC's memory stays flat."""
+    if uploaded_file.size <= STREAM_UPLOAD_BYTES:
+        return importer(uploaded_file)
+
+    bar = st.progress(0.0, text="Starting import...")
+    def report(done, total):
+        fraction = min(done / total, 1.0) if total else 0.0
+        bar.progress(fraction, text=f"Imported {done:,} of {total or 0:,} rows")
+    return importer(uploaded_file, chunk_size=db_utils.IMPORT_CHUNK_ROWS, progress=report)
+
 def render_eod_tools(raw_inventory_df):
     st.header("EOD Inventory Count")
     
@@ -48,12 +63,16 @@ def render_eod_tools(raw_inventory_df):
         
         if st.button("Update Inventory", width="stretch"):
             if clipboard_text:
-                updated, errors = db_utils.process_clipboard_update(clipboard_text)
+                results = db_utils.apply_clipboard_update(clipboard_text)
+                updated = [r.message for r in results if r.status == "updated"]
+                skipped = [r for r in results if r.status == "skipped"]
                 if updated:
                     st.success(f"✅ Successfully updated {len(updated)} items: {', '.join(updated)}")
-                if errors:
-                    for err in errors:
-                        st.error(f"❌ {err}")
+                if skipped:
+                    st.caption(f"{len(skipped)} line(s) had no count and were left unchanged.")
+                for r in results:
+                    if r.status in ("unknown", "invalid", "error"):
+                        st.error(f"❌ Line {r.line_no}: {r.message}")
 
 def render_bulk_operations(raw_inventory_df):
     # ==========================
@@ -82,15 +101,17 @@ def render_bulk_operations(raw_inventory_df):
         inv_file = st.file_uploader("Upload Inventory (.csv)", type=["csv"], key="inv_upload")
         if inv_file:
             if st.button("Process Inventory Update", type="primary", width="stretch"):
-                count, errors = db_utils.process_bulk_inventory_upload(inv_file)
+                count, errors = _run_import(db_utils.process_bulk_inventory_upload, inv_file)
                 if count > 0:
                     st.success(f"✅ Successfully updated {count} items!")
-                    time.sleep(1) # Give user time to see success
-                    st.rerun()
                 if errors:
-                    with st.expander("⚠️ Import Errors", expanded=True):
+                    # Keep the per-row report on screen (a rerun would clear it)
+                    with st.expander(f"⚠️ Import Errors ({len(errors)})", expanded=True):
                         for e in errors:
                             st.error(e)
+                elif count > 0:
+                    time.sleep(1) # Give user time to see success
+                    st.rerun()
                             
     st.divider()
     
@@ -115,15 +136,16 @@ def render_bulk_operations(raw_inventory_df):
         prod_file = st.file_uploader("Upload Recipes (.csv)", type=["csv"], key="prod_upload")
         if prod_file:
             if st.button("Process Recipe Import", type="primary", width="stretch"):
-                count, errors = db_utils.process_bulk_recipe_upload(prod_file)
+                count, errors = _run_import(db_utils.process_bulk_recipe_upload, prod_file)
                 if count > 0:
                     st.success(f"✅ Processed {count} products!")
-                    time.sleep(1)
-                    st.rerun()
                 if errors:
-                    with st.expander("⚠️ Import Errors", expanded=True):
+                    with st.expander(f"⚠️ Import Errors ({len(errors)})", expanded=True):
                         for e in errors:
                             st.error(e)
+                elif count > 0:
+                    time.sleep(1)
+                    st.rerun()
                             
     st.divider()
     
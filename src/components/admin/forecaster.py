@@ -1,8 +1,6 @@
 import streamlit as st
-import pandas as pd
 import datetime
-import math
-from src.utils import db_utils
+from src.utils import db_utils, bom
 from src.components import date_selector
 
 def render_forecaster():
@@ -56,65 +54,19 @@ def render_forecaster():
     st.divider()
     st.subheader("2. Inventory Requirements")
 
-    # Fetch all recipes and inventory data
-    recipes_df = db_utils.get_all_recipes()
+    # Fetch the recipe matrix (cached until recipes change) and inventory data
+    bom_matrix = db_utils.get_bom_matrix()
     inventory_df = db_utils.get_inventory()
 
-    if recipes_df.empty or inventory_df.empty:
+    if bom_matrix.nnz == 0 or inventory_df.empty:
         st.warning("Insufficient data to calculate requirements.")
         return
 
-    # Calculation Loop
-    total_needs = {} # item_id -> qty needed
+    # One vectorized pass: demand vector x BOM matrix -> totals per item -> deficits
+    requirements = bom_matrix.explode_frame(edited_df, qty_col='Expected')
+    res_df = bom.build_shopping_list(requirements, inventory_df)
 
-    for _, row in edited_df.iterrows():
-        qty_to_make = row['Expected']
-        if qty_to_make > 0:
-            p_id = row['product_id']
-            # Filter recipes for this product
-            prod_recipe = recipes_df[recipes_df['product_id'] == p_id]
-            
-            for _, r_row in prod_recipe.iterrows():
-                item_id = r_row['item_id']
-                qty_needed = r_row['Qty']
-                
-                if pd.notna(item_id):
-                    total_needs[item_id] = total_needs.get(item_id, 0) + (qty_needed * qty_to_make)
-
-    # Build Results Table
-    results = []
-    for item_id, needed_qty in total_needs.items():
-        inv_row = inventory_df[inventory_df['item_id'] == item_id]
-        if not inv_row.empty:
-            name = inv_row.iloc[0]['name']
-            stock = inv_row.iloc[0]['count_on_hand']
-            bundle_size = inv_row.iloc[0]['bundle_count']
-            
-            # Calculate Deficit
-            # Note: Stock is in units (bundles), but recipe is usually in stems/singles?
-            # Wait, usually inventory count_on_hand is physical units.
-            # If recipe calls for 12 stems, and bundle is 25 stems.
-            # We need to know if recipe qty is in stems or units.
-            # Assuming recipe qty is raw units (e.g. stems) and inventory is packs.
-            # Actually, standard practice: Inventory Count * Bundle Count = Total Stems Available.
-            
-            total_available_stems = stock * bundle_size
-            net_need = needed_qty - total_available_stems
-            
-            deficit_stems = max(0, net_need)
-            bundles_to_buy = math.ceil(deficit_stems / bundle_size) if deficit_stems > 0 else 0
-
-            results.append({
-                "Ingredient": name,
-                "Total Needed": needed_qty,
-                "Current Stock (Packs)": stock,
-                "Bundle Size": bundle_size,
-                "Deficit (Units)": deficit_stems,
-                "To Buy (Packs)": bundles_to_buy
-            })
-
-    if results:
-        res_df = pd.DataFrame(results)
+    if not res_df.empty:
         # Sort by To Buy (descending) then Name
         res_df = res_df.sort_values(by=['To Buy (Packs)', 'Ingredient'], ascending=[False, True])
         
@@ -149,13 +101,7 @@ def render_forecaster():
     
     if not generic_df.empty:
         # Add a column for current stock of that category
-        inventory_df = db_utils.get_inventory()
-        
-        def get_cat_stock(cat):
-            if inventory_df.empty: return 0
-            return inventory_df[inventory_df['sub_category'] == cat]['count_on_hand'].sum()
-            
-        generic_df['Current Category Stock'] = generic_df['Category'].apply(get_cat_stock)
+        generic_df['Current Category Stock'] = bom.category_stock(inventory_df, generic_df['Category'])
         generic_df['Net Need'] = generic_df['Needed'] - generic_df['Current Category Stock']
         
         st.dataframe(generic_df, hide_index=True, width="stretch")
@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
 from src.utils import db_utils
-from src.components import date_selector
+from src.components import date_selector, change_watcher
+
+# Changes to these tables refresh the manager (see change_watcher.load)
+WATCHED_TABLES = ("production_goals", "products")
 
 @st.fragment(run_every=10)
 def render_production_viewer():
@@ -15,10 +18,10 @@ def render_production_viewer():
 
     # 2. Fetch Data
     # Get list of products that are either active OR have goals in this range
-    product_options_df = db_utils.get_active_and_scheduled_products(start_date, end_date)
+    product_options_df = change_watcher.load("prod_view", WATCHED_TABLES, db_utils.get_active_and_scheduled_products, start_date, end_date)
     
     # Get the actual goals
-    goals_df = db_utils.get_production_goals_range(start_date, end_date)
+    goals_df = change_watcher.load("prod_view", WATCHED_TABLES, db_utils.get_production_goals_range, start_date, end_date)
 
     # 3. Dropdown Filter
     # Create a list of options: "All" + Product Names
@@ -31,7 +34,7 @@ def render_production_viewer():
     # Search Bar
     c_search, c_clear = st.columns([6, 1], vertical_alignment="bottom")
     with c_search:
-        search_term = st.text_input("Search Goals", placeholder="Filter by product name...", label_visibility="collapsed", key="prod_view_search")
+        search_term = st.text_input("Search Goals", placeholder="Filter by name, note or ingredient...", label_visibility="collapsed", key="prod_view_search")
     with c_clear:
         if st.button("Clear", key="clear_prod_view_search", help="Clear Search", width="stretch"):
             st.session_state.prod_view_search = ""
@@ -45,7 +48,7 @@ def render_production_viewer():
 
         # Apply Search Filter
         if search_term:
-            goals_df = db_utils.filter_dataframe_by_terms(goals_df, 'Product', search_term)
+            goals_df = db_utils.filter_dataframe_by_search(goals_df, search_term)
 
         # Create a working copy to avoid SettingWithCopyWarning
         goals_df = goals_df.copy()
@@ -49,7 +49,7 @@ def render_design_dashboard():
             # Search Bar
             c_search, c_clear = st.columns([6, 1], vertical_alignment="bottom")
             with c_search:
-                search_term = st.text_input("Filter Products", placeholder="Search by name...", label_visibility="collapsed", key="design_search")
+                search_term = st.text_input("Filter Products", placeholder="Search by name, note or ingredient...", label_visibility="collapsed", key="design_search")
             with c_clear:
                 if st.button("Clear", key="clear_design_search", help="Clear Filter", width="stretch"):
                     st.session_state.design_search = ""
@@ -58,7 +58,7 @@ def render_design_dashboard():
             # Filter options
             filtered_names = active_names
             if search_term:
-                filtered_df = db_utils.filter_dataframe_by_terms(options_df, 'display_name', search_term)
+                filtered_df = db_utils.filter_dataframe_by_search(options_df, search_term, ranked=True)
                 filtered_names = filtered_df['display_name'].tolist()
 
             # Handle selection persistence safety: Ensure current selection is in options to avoid Streamlit error
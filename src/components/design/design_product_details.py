@@ -1,6 +1,6 @@
 import streamlit as st
-import io
-from src.utils import db_utils
+from src.utils import db_utils, utils
+from src.components import image_view
 from . import design_recipe_builder
 
 def render_variant_tab(v_type, label, variant_map, group_id, base_name, category):
@@ -28,9 +28,7 @@ def render_variant_tab(v_type, label, variant_map, group_id, base_name, category
 
 def render_info_form(p_id, v_details, label, group_id):
     # Image
-    if v_details['image_data']:
-        st.image(io.BytesIO(v_details['image_data']), caption=f"{label} Preview", width="stretch")
-    else:
+    if not image_view.show(v_details.get('image_hash'), 'full', caption=f"{label} Preview", width="stretch"):
         st.info("No image available")
     
     new_img = st.file_uploader(f"Update {label} Image", type=['png', 'jpg', 'jpeg'], key=f"img_{p_id}")
@@ -41,7 +39,7 @@ def render_info_form(p_id, v_details, label, group_id):
         new_note = st.text_area("Notes", value=v_details['note'] if v_details['note'] else "")
         
         if st.form_submit_button("💾 Save Info"):
-            img_bytes = new_img.getvalue() if new_img else None
+            img_bytes = utils.process_image(new_img) if new_img else None
             
             # Use recipe from session state if available (edited), otherwise use DB version
             final_recipe = st.session_state.get(f"recipe_state_{p_id}", v_details['recipe'])
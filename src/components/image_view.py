@@ -0,0 +1,48 @@
+import io
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+import streamlit as st
+from src.utils import db_utils, image_server
+
+def _page_origin():
+    """(host, secure) of the page as the browser sees it; (None, False) outside a browser session."""
+    url = urlparse(st.context.url or "")
+    host = url.netloc or st.context.headers.get("Host")
+    return host, url.scheme == "https"
+
+def image_url(image_hash: Optional[str], rendition: str = "card") -> Optional[str]:
+    """Immutable image-server URL for this page, or None if the image must be sent inline."""
+    host, secure = _page_origin()
+    return image_server.image_url(image_hash, rendition, host=host, secure=secure)
+
+def served_by_url() -> bool:
+    """True when this session's images go by URL, so pages can skip fetching bytes."""
+    host, secure = _page_origin()
+    return image_server.image_url("probe", host=host, secure=secure) is not None
+
+def prefetch(image_hashes: Iterable, rendition: str = "card") -> dict:
+    """
+    Bytes for a page of images, batched - only needed when they will be sent inline.
+    Returns {} when the image server is serving this session.
+    """
+    return {} if served_by_url() else db_utils.get_images(image_hashes, rendition=rendition)
+
+def show(image_hash: Optional[str], rendition: str = "card", data: Optional[bytes] = None, **image_kwargs) -> bool:
+    """
+    Renders a product image: by URL when the image server is up (the browser caches it and reruns
+    only resend the URL), otherwise inline from `data` (prefetched) or a single get_image().
+
+    Returns:
+        bool: False if there is no image to show.
+    """
+    url = image_url(image_hash, rendition)
+    if url:
+        st.image(url, **image_kwargs)
+        return True
+    if data is None and isinstance(image_hash, str) and image_hash:
+        data = db_utils.get_image(image_hash, rendition=rendition)
+    if data:
+        st.image(io.BytesIO(data), **image_kwargs)
+        return True
+    return False
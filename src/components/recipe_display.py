@@ -1,57 +1,75 @@
 import streamlit as st
 import pandas as pd
-import io
 import math
 from src.utils import db_utils
+from src.components import image_view
+
+# Products per Recipe Book page
+ITEMS_PER_PAGE = 10
+
+def _pager(key_prefix, search_term):
+    """
+    Page number plus the keyset cursor that starts each visited page (cursors[-1] is the current one).
+    Starts over whenever the search changes.
+    """
+    state_key = f"{key_prefix}_pager"
+    pager = st.session_state.get(state_key)
+    if pager is None or pager["search"] != search_term:
+        pager = {"search": search_term, "page": 1, "cursors": [None]}
+        st.session_state[state_key] = pager
+    return pager
+
+def _fetch_page(active, pager, search_ids):
+    """Only the current page's products and ingredients: a keyset seek, or a slice of the ranked search hits."""
+    if search_ids is not None:
+        start_idx = (pager["page"] - 1) * ITEMS_PER_PAGE
+        return db_utils.get_recipe_products(search_ids[start_idx:start_idx + ITEMS_PER_PAGE])
+    return db_utils.get_recipe_page(active, ITEMS_PER_PAGE, after=pager["cursors"][-1])
 
 def render_recipe_display(allow_edit=False):
     st.header("📖 Recipe Book")
     st.caption("Browse product recipes.")
 
-    # Fetch all recipes (denormalized)
-    df = db_utils.get_all_recipes()
+    # Counts only; products are fetched a page at a time below
+    counts = db_utils.get_recipe_counts()
 
-    if df.empty:
+    if counts["active"] + counts["archived"] == 0:
         st.info("No recipes found.")
         return
 
     # Search Bar
     c_search, c_clear = st.columns([6, 1], vertical_alignment="bottom")
     with c_search:
-        search_term = st.text_input("Search Recipes", placeholder="Search by product name...", label_visibility="collapsed", key="recipe_book_search")
+        search_term = st.text_input("Search Recipes", placeholder="Search by name, note or ingredient...", label_visibility="collapsed", key="recipe_book_search")
     with c_clear:
         if st.button("Clear", key="clear_recipe_search", help="Clear Search", width="stretch"):
             st.session_state.recipe_book_search = ""
             st.rerun()
-    
-    if search_term:
-        df = db_utils.filter_dataframe_by_terms(df, 'Product', search_term)
 
-    # Split Active vs Archived
-    active_df = df[df['active'] == 1]
-    archived_df = df[df['active'] == 0]
+    # Split Active vs Archived (search hits are ranked ids; otherwise page through the table)
+    search_term = (search_term or "").strip()
+    active_ids = archived_ids = None
+    if search_term:
+        active_ids = db_utils.search_product_ids(search_term, active=True)
+        archived_ids = db_utils.search_product_ids(search_term, active=False)
+        counts = {"active": len(active_ids), "archived": len(archived_ids)}
 
-    def render_recipe_list(product_df, key_prefix="rec"):
-        # 1. Get Unique Products first
-        unique_products = product_df[['product_id', 'Product', 'Price', 'active', 'category', 'ProductNote', 'variant_type']].drop_duplicates()
-        
+    def render_recipe_list(active, total_items, search_ids, key_prefix="rec"):
         # --- PAGINATION LOGIC START ---
-        ITEMS_PER_PAGE = 10
-        total_items = len(unique_products)
         total_pages = max(1, math.ceil(total_items / ITEMS_PER_PAGE))
-        
-        # Initialize page state for this specific list (active vs archived)
-        page_key = f"{key_prefix}_page"
-        if page_key not in st.session_state:
-            st.session_state[page_key] = 1
-            
-        # Current Page Indexing
-        current_page = st.session_state[page_key]
+        pager = _pager(key_prefix, search_term)
+        if pager["page"] > total_pages:
+            # Catalog shrank since the cursor was taken
+            pager.update(page=1, cursors=[None])
+
+        # Fetch only this page (at most ITEMS_PER_PAGE products)
+        batch_products, batch_ingredients = _fetch_page(active, pager, search_ids)
+        if batch_products.empty and pager["page"] > 1:
+            pager.update(page=1, cursors=[None])
+            batch_products, batch_ingredients = _fetch_page(active, pager, search_ids)
+        current_page = pager["page"]
         start_idx = (current_page - 1) * ITEMS_PER_PAGE
         end_idx = start_idx + ITEMS_PER_PAGE
-        
-        # Slice the dataframe (Only process these 10 items!)
-        batch_products = unique_products.iloc[start_idx:end_idx]
         # --- PAGINATION LOGIC END ---
 
         # Controls (Top)
@@ -59,15 +77,22 @@ def render_recipe_display(allow_edit=False):
             c_prev, c_info, c_next = st.columns([1, 2, 1])
             with c_prev:
                 if st.button("Previous", key=f"{key_prefix}_prev", disabled=current_page==1):
-                    st.session_state[page_key] -= 1
+                    pager["page"] -= 1
+                    pager["cursors"].pop()
                     st.rerun()
             with c_info:
                 st.markdown(f"<div style='text-align: center'>Page {current_page} of {total_pages}</div>", unsafe_allow_html=True)
             with c_next:
                 if st.button("Next", key=f"{key_prefix}_next", disabled=current_page==total_pages):
-                    st.session_state[page_key] += 1
+                    pager["page"] += 1
+                    pager["cursors"].append(db_utils.recipe_page_cursor(batch_products))
                     st.rerun()
 
+        # Image bytes for the whole page in one call - only when they must be sent inline
+        page_images = {}
+        if not batch_products.empty and not image_view.served_by_url():
+            page_images = db_utils.get_product_images(batch_products['product_id'].tolist(), rendition='card')
+
         # Render only the batch
         for _, prod in batch_products.iterrows():
             # Variant Badge
@@ -85,11 +110,8 @@ def render_recipe_display(allow_edit=False):
                 c1, c2 = st.columns([1, 3])
                 
                 with c1:
-                    # Fetch image on demand (Now only happens 10 times max!)
-                    img_data = db_utils.get_product_image_by_id(prod['product_id'])
-                    if img_data:
-                        st.image(io.BytesIO(img_data), width="stretch")
-                    else:
+                    image_hash = prod['image_hash'] if pd.notna(prod['image_hash']) else None
+                    if not image_view.show(image_hash, 'card', data=page_images.get(int(prod['product_id'])), width="stretch"):
                         st.text("No Image")
                     
                     if pd.notna(prod['ProductNote']) and prod['ProductNote']:
@@ -110,10 +132,10 @@ def render_recipe_display(allow_edit=False):
                                         st.rerun()
 
                 with c2:
-                    # Filter ingredients for this product
-                    ingredients = product_df[product_df['product_id'] == prod['product_id']].copy()
+                    # Ingredients for this product (already limited to the page)
+                    ingredients = batch_ingredients[batch_ingredients['product_id'] == prod['product_id']] if not batch_ingredients.empty else batch_ingredients
                     
-                    if ingredients.empty or pd.isna(ingredients.iloc[0]['Ingredient']):
+                    if ingredients.empty:
                         st.info("No ingredients defined.")
                     else:
                         # Display Ingredients Table
@@ -133,16 +155,16 @@ def render_recipe_display(allow_edit=False):
              st.caption(f"Showing {start_idx + 1}-{min(end_idx, total_items)} of {total_items}")
 
     # Render Active
-    if not active_df.empty:
-        render_recipe_list(active_df, key_prefix="active")
-    elif archived_df.empty:
+    if counts["active"]:
+        render_recipe_list(True, counts["active"], active_ids, key_prefix="active")
+    elif not counts["archived"]:
         st.info("No recipes found matching criteria.")
 
     # Render Archived
-    if not archived_df.empty:
+    if counts["archived"]:
         st.divider()
         st.subheader("🗄️ Archived Recipes")
-        render_recipe_list(archived_df, key_prefix="archived")
+        render_recipe_list(False, counts["archived"], archived_ids, key_prefix="archived")
 
 def render_recipe_expander(product_id, recipes_df):
     """Reusable component to show a recipe expander inside other cards/grids."""
@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import io
 from src.utils import db_utils
-from src.components import recipe_display, date_selector
+from src.components import recipe_display, date_selector, change_watcher, image_view
 
-def handle_log_production(goal_id, product_name):
+# Changes to these tables refresh the goals view (see change_watcher.load)
+WATCHED_TABLES = ("production_goals", "products", "recipes", "inventory")
+
+def handle_log_production(goal_id, product_name, qty=1):
     # 1. Check Requirements
     # We need to get the product_id from the goal first
     conn = db_utils.get_connection()
@@ -20,15 +22,20 @@ def handle_log_production(goal_id, product_name):
     
     if not reqs['has_generics']:
         # Fast Path: Just Log it (Standard Logic)
-        if db_utils.log_production(int(goal_id)):
-            st.session_state['weekly_dash_toast'] = (f"Made 1 {product_name}!", "✅")
+        if db_utils.log_production_batch(int(goal_id), int(qty)):
+            st.session_state['weekly_dash_toast'] = (f"Made {int(qty)} {product_name}!", "✅")
     else:
         # Slow Path: Open Modal for Selection
-        trigger_generic_selection_modal(goal_id, reqs['generic_items'])
+        trigger_generic_selection_modal(goal_id, reqs['generic_items'], int(qty))
+
+def handle_log_production_n(goal_id, product_name):
+    """Callback for the 'Make N' control: reads the batch size from its number input."""
+    qty = st.session_state.get(f"make_n_qty_g_{goal_id}", 1)
+    handle_log_production(goal_id, product_name, qty)
 
 @st.dialog("🌸 Select Flowers Used")
-def trigger_generic_selection_modal(goal_id, generic_reqs):
-    st.write("This recipe requires generic items. Please specify what was used.")
+def trigger_generic_selection_modal(goal_id, generic_reqs, qty=1):
+    st.write(f"This recipe requires generic items. Please specify what was used **per arrangement** ({qty} being made).")
     
     substitutions_to_make = []
     valid_form = True
@@ -81,7 +88,7 @@ def trigger_generic_selection_modal(goal_id, generic_reqs):
 
     st.divider()
     if st.button("Confirm Production", type="primary", disabled=not valid_form, width='stretch'):
-        if db_utils.log_production(goal_id, substitutions=substitutions_to_make):
+        if db_utils.log_production_batch(goal_id, qty, substitutions=substitutions_to_make):
             st.session_state['weekly_dash_toast'] = ("Production Logged with Details!", "✅")
             st.rerun()
 
@@ -181,7 +188,7 @@ def render():
     # Search Bar
     c_search, c_clear = st.columns([6, 1], vertical_alignment="bottom")
     with c_search:
-        search_term = st.text_input("Search Goals", placeholder="Filter by product name...", label_visibility="collapsed", key="weekly_dash_search")
+        search_term = st.text_input("Search Goals", placeholder="Filter by name, note or ingredient...", label_visibility="collapsed", key="weekly_dash_search")
     with c_clear:
         if st.button("Clear", key="clear_weekly_search", help="Clear Search", width="stretch"):
             st.session_state.weekly_dash_search = ""
@@ -190,25 +197,28 @@ def render():
     st.divider()
 
     # --- Fetch Data ---
-    goals_df = db_utils.get_production_goals_range(start_date, end_date)
+    goals_df = change_watcher.load("weekly_dash", WATCHED_TABLES, db_utils.get_production_goals_range, start_date, end_date)
     recipes_df = db_utils.get_all_recipes()
 
     # Apply Search
     if search_term:
-        goals_df = db_utils.filter_dataframe_by_terms(goals_df, 'Product', search_term)
+        goals_df = db_utils.filter_dataframe_by_search(goals_df, search_term)
 
     if not goals_df.empty:
         goals_df['due_date'] = pd.to_datetime(goals_df['due_date'])
         
+        # Card image bytes for every goal in the range in one batch - skipped when images go by URL
+        images = image_view.prefetch(goals_df['image_hash'], rendition='card')
+
         unique_dates = goals_df['due_date'].dt.date.unique()
         for date_val in unique_dates:
             st.subheader(date_val.strftime('%A, %b %d'))
             day_data = goals_df[goals_df['due_date'].dt.date == date_val].reset_index(drop=True)
-            render_grid(day_data, recipes_df, key_suffix=f"_{date_val}")
+            render_grid(day_data, recipes_df, key_suffix=f"_{date_val}", images=images)
     else:
         st.info("No production goals set for this period.")
 
-def render_grid(week_data, recipes_df, key_suffix=""):
+def render_grid(week_data, recipes_df, key_suffix="", images=None):
     # Create a grid: 2 columns on desktop, stacks on mobile
     for i in range(0, len(week_data), 2):
         grid_cols = st.columns(2)
@@ -286,6 +296,25 @@ def render_grid(week_data, recipes_df, key_suffix=""):
                                         )
                                 else:
                                     st.caption(":red[Empty Cooler]")
+                                
+                                # Make N Option (one transaction for the whole run)
+                                if needed > 1:
+                                    with st.popover("🔢 Make N", use_container_width=True, help="Make several at once"):
+                                        st.number_input(
+                                            "How many?",
+                                            min_value=1,
+                                            value=int(needed),
+                                            step=1,
+                                            key=f"make_n_qty_g_{row['goal_id']}"
+                                        )
+                                        st.button(
+                                            "Make",
+                                            key=f"make_n_g_{row['goal_id']}",
+                                            type="primary",
+                                            width="stretch",
+                                            on_click=handle_log_production_n,
+                                            args=(int(row['goal_id']), row['Product'])
+                                        )
 
                         with col_undo:
                             # Only allow undo if something has been made this week
@@ -301,8 +330,9 @@ def render_grid(week_data, recipes_df, key_suffix=""):
                                 )
                         
                         with st.expander("🌿 Recipe & Image"):
-                            if pd.notna(row['image_data']):
-                                st.image(io.BytesIO(row['image_data']), width=200)
+                            # Only the key travels with the polling query; the browser caches the image by URL
+                            if pd.notna(row['image_hash']):
+                                image_view.show(row['image_hash'], 'card', data=(images or {}).get(row['image_hash']), width=200)
                             
                             # Filter for recipe
                             r_data = recipes_df[recipes_df['product_id'] == row['product_id']]
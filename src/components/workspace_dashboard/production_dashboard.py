@@ -1,25 +1,32 @@
 import streamlit as st
 import pandas as pd
-import io
 from src.utils import db_utils
-from src.components import recipe_display, date_selector
+from src.components import recipe_display, date_selector, change_watcher, image_view
 
-def handle_make_stock(product_id, product_name):
-    """Callback to increase stock."""
+# Changes to these tables refresh the dashboard (see change_watcher.load)
+WATCHED_TABLES = ("products", "recipes", "production_goals", "inventory")
+
+def handle_make_stock(product_id, product_name, qty=1):
+    """Callback to increase stock by qty units in one transaction."""
     # 1. Check Requirements
     reqs = db_utils.get_recipe_requirements(product_id)
     
     if not reqs['has_generics']:
         # Fast Path: Just Log it
-        if db_utils.produce_stock(product_id):
-            st.session_state['prod_dash_toast'] = (f"Made 1 {product_name}", "📦")
+        if db_utils.produce_stock_batch(product_id, int(qty)):
+            st.session_state['prod_dash_toast'] = (f"Made {int(qty)} {product_name}", "📦")
     else:
         # Slow Path: Open Modal for Selection
-        trigger_generic_stock_modal(product_id, product_name, reqs['generic_items'])
+        trigger_generic_stock_modal(product_id, product_name, reqs['generic_items'], qty)
+
+def handle_make_stock_n(product_id, product_name):
+    """Callback for the 'Make N' control: reads the batch size from its number input."""
+    qty = st.session_state.get(f"make_n_qty_{product_id}", 1)
+    handle_make_stock(product_id, product_name, qty)
 
 @st.dialog("🌸 Select Flowers Used")
-def trigger_generic_stock_modal(product_id, product_name, generic_reqs):
-    st.write(f"Making **{product_name}**. Please specify generic items used.")
+def trigger_generic_stock_modal(product_id, product_name, generic_reqs, qty=1):
+    st.write(f"Making **{qty} x {product_name}**. Please specify generic items used **per arrangement**.")
     
     substitutions_to_make = []
     valid_form = True
@@ -70,8 +77,8 @@ def trigger_generic_stock_modal(product_id, product_name, generic_reqs):
 
     st.divider()
     if st.button("Confirm Production", type="primary", disabled=not valid_form, width='stretch'):
-        if db_utils.produce_stock(product_id, substitutions=substitutions_to_make):
-            st.session_state['prod_dash_toast'] = (f"Made 1 {product_name} with details!", "📦")
+        if db_utils.produce_stock_batch(product_id, qty, substitutions=substitutions_to_make):
+            st.session_state['prod_dash_toast'] = (f"Made {qty} {product_name} with details!", "📦")
             st.rerun()
 
 @st.dialog("📝 Adjust Recipe & Make")
@@ -186,7 +193,7 @@ def render():
     # Search Bar & Filter
     c_search, c_filter, c_clear = st.columns([5, 2, 1], vertical_alignment="bottom")
     with c_search:
-        search_term = st.text_input("Search", placeholder="Filter by product name...", label_visibility="collapsed", key="prod_dash_search")
+        search_term = st.text_input("Search", placeholder="Filter by name, note or ingredient...", label_visibility="collapsed", key="prod_dash_search")
     with c_filter:
         show_all = st.checkbox("Show All Items", value=False, help="Uncheck to see only items with a deficit.")
     with c_clear:
@@ -197,12 +204,17 @@ def render():
     st.divider()
 
     # --- Fetch Data ---
-    df = db_utils.get_production_requirements(st.session_state.prod_dash_start, st.session_state.prod_dash_end)
+    df = change_watcher.load("prod_dash", WATCHED_TABLES, db_utils.get_production_requirements, st.session_state.prod_dash_start, st.session_state.prod_dash_end)
     recipes_df = db_utils.get_all_recipes()
     
+    # What raw inventory can still produce (per product, and shared across all deficits)
+    capacity_df = change_watcher.load("prod_dash", WATCHED_TABLES, db_utils.get_production_capacity, st.session_state.prod_dash_start, st.session_state.prod_dash_end)
+    if not df.empty and not capacity_df.empty:
+        df = df.merge(capacity_df[['product_id', 'can_make', 'plan_covered']], on='product_id', how='left')
+    
     # Apply Search Filter
     if search_term:
-        df = db_utils.filter_dataframe_by_terms(df, 'Product', search_term)
+        df = db_utils.filter_dataframe_by_search(df, search_term)
     
     # Apply "Needed Only" Filter (Default)
     # If searching, we ignore this filter to show what the user is looking for.
@@ -220,6 +232,9 @@ def render():
     
     df = df.sort_values(by=['sort_base', 'sort_rank'], ascending=[True, True])
 
+    # Card image bytes for the whole grid in one batch - skipped when images go by URL
+    images = image_view.prefetch(df['image_hash'], rendition='card')
+
     # --- Render Grid ---
     # 2 columns on desktop
     for i in range(0, len(df), 2):
@@ -228,9 +243,9 @@ def render():
             if i + j < len(df):
                 row = df.iloc[i+j]
                 with cols[j]:
-                    render_card(row, recipes_df)
+                    render_card(row, recipes_df, images)
 
-def render_card(row, recipes_df):
+def render_card(row, recipes_df, images=None):
     with st.container(border=True):
         # Layout: Info (Name, Stats, Bar) | Actions (+/-)
         c_info, c_act = st.columns([3, 1], vertical_alignment="center")
@@ -276,6 +291,16 @@ def render_card(row, recipes_df):
                 st.caption(f"(+{diff} surplus)")
             elif diff < 0:
                 st.caption(f"({diff} deficit)")
+            
+            # Capacity from raw inventory
+            can_make = row.get('can_make')
+            if can_make is not None and pd.notna(can_make):
+                cap_text = f"🌿 Can make: **{int(can_make)}**"
+                if diff < 0:
+                    covered = int(row.get('plan_covered', 0))
+                    cap_color = "green" if covered >= -diff else "orange"
+                    cap_text += f" · Shared stock covers :{cap_color}[**{covered}** / {-diff}]"
+                st.caption(cap_text)
 
         with c_act:
             # Split Make actions
@@ -292,6 +317,24 @@ def render_card(row, recipes_df):
                 if st.button("📝", key=f"adj_stock_{row['product_id']}", help="Make with Adjustments", width="stretch"):
                     trigger_adjustment_modal(int(row['product_id']), row['Product'])
             
+            # Make N (one transaction for a whole production run)
+            with st.popover("🔢", help="Make several at once", use_container_width=True):
+                st.number_input(
+                    "How many?",
+                    min_value=1,
+                    value=max(1, int(row['required_qty'] - row['stock_on_hand'])),
+                    step=1,
+                    key=f"make_n_qty_{row['product_id']}"
+                )
+                st.button(
+                    "Make N",
+                    key=f"make_n_{row['product_id']}",
+                    type="primary",
+                    width="stretch",
+                    on_click=handle_make_stock_n,
+                    args=(int(row['product_id']), row['Product'])
+                )
+            
             # Undo Button (Removes from Stock)
             st.button(
                 "➖", 
@@ -302,8 +345,9 @@ def render_card(row, recipes_df):
             )
         
         with st.expander("🌿 Recipe & Image"):
-            if pd.notna(row['image_data']):
-                st.image(io.BytesIO(row['image_data']), width=200)
+            # Only the key travels with the polling query; the browser caches the image by URL
+            if pd.notna(row['image_hash']):
+                image_view.show(row['image_hash'], 'card', data=(images or {}).get(row['image_hash']), width=200)
             
             # Filter for recipe
             r_data = recipes_df[recipes_df['product_id'] == row['product_id']]
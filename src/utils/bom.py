@@ -0,0 +1,279 @@
+import logging
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🧮 BILL OF MATERIALS EXPLOSION
+# ==========================================
+# Pure DataFrame functions (no database access) that turn exploded requirements
+# (BomMatrix.explode_frame below) into a shopping list against the frame the UI already
+# holds: db_utils.get_inventory().
+
+SHOPPING_LIST_COLUMNS = ["Ingredient", "Total Needed", "Current Stock (Packs)", "Bundle Size", "Deficit (Units)", "To Buy (Packs)"]
+
+def build_shopping_list(requirements: pd.DataFrame, inventory_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compares exploded requirements with stock on hand (packs x bundle size) and computes
+    what to buy, in whole packs. Items missing from inventory are dropped.
+    """
+    if requirements.empty or inventory_df.empty:
+        return pd.DataFrame(columns=SHOPPING_LIST_COLUMNS)
+
+    inv = inventory_df[["item_id", "name", "count_on_hand", "bundle_count"]].copy()
+    inv["item_id"] = inv["item_id"].astype("int64")
+    merged = requirements.merge(inv, on="item_id", how="inner")
+
+    stock = pd.to_numeric(merged["count_on_hand"], errors="coerce").fillna(0)
+    # A bundle size of 0/NULL would make every pack worthless; treat it as singles
+    bundle = pd.to_numeric(merged["bundle_count"], errors="coerce").fillna(1).clip(lower=1)
+
+    deficit = (merged["qty_needed"] - stock * bundle).clip(lower=0)
+    to_buy = np.ceil(deficit / bundle).astype("int64")
+
+    return pd.DataFrame({
+        "Ingredient": merged["name"],
+        "Total Needed": merged["qty_needed"],
+        "Current Stock (Packs)": merged["count_on_hand"],
+        "Bundle Size": merged["bundle_count"],
+        "Deficit (Units)": deficit,
+        "To Buy (Packs)": to_buy,
+    })
+
+def category_stock(inventory_df: pd.DataFrame, categories: pd.Series) -> pd.Series:
+    """Total count_on_hand per sub_category, aligned to `categories` (0 where none is stocked)."""
+    if inventory_df.empty:
+        return pd.Series(0, index=categories.index)
+    totals = inventory_df.groupby("sub_category")["count_on_hand"].sum()
+    return categories.map(totals).fillna(0)
+
+# ==========================================
+# 🧱 SPARSE BOM MATRIX
+# ==========================================
+# Rows are product_ids; columns are inventory item_ids (int) plus one "cat:<Category>" column
+# per generic requirement. Stored as CSR arrays (numpy only, no scipy dependency) and built once
+# per recipes change - see db_utils.get_bom_matrix().
+
+CATEGORY_PREFIX = "cat:"
+
+class BomMatrix:
+    """Read-only product x ingredient quantity matrix in compressed sparse row form."""
+
+    def __init__(self, product_ids: list, columns: list, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.product_ids = list(product_ids)
+        self.columns = list(columns)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self._row_of = {p_id: i for i, p_id in enumerate(self.product_ids)}
+        # Row number of every stored entry, used for per-row reductions
+        self._entry_rows = np.repeat(np.arange(len(self.product_ids)), np.diff(indptr))
+
+    @classmethod
+    def from_records(cls, records: list) -> "BomMatrix":
+        """
+        Builds the matrix from (product_id, item_id, qty, requirement_type, requirement_value) rows.
+        Category rows become "cat:<value>" columns; repeated (product, column) pairs are summed.
+        """
+        cells = {}
+        for p_id, item_id, qty, req_type, req_val in records:
+            if not qty:
+                continue
+            if req_type == 'Category':
+                if not req_val:
+                    continue
+                col = f"{CATEGORY_PREFIX}{req_val}"
+            elif item_id is not None:
+                col = int(item_id)
+            else:
+                continue
+            key = (int(p_id), col)
+            cells[key] = cells.get(key, 0) + qty
+
+        product_ids = sorted({p for p, _ in cells})
+        columns = sorted({c for _, c in cells}, key=lambda c: (isinstance(c, str), str(c) if isinstance(c, str) else c))
+        row_of = {p: i for i, p in enumerate(product_ids)}
+        col_of = {c: j for j, c in enumerate(columns)}
+
+        ordered = sorted(cells.items(), key=lambda kv: (row_of[kv[0][0]], col_of[kv[0][1]]))
+        rows = np.fromiter((row_of[p] for (p, _), _ in ordered), dtype=np.int64, count=len(ordered))
+        indices = np.fromiter((col_of[c] for (_, c), _ in ordered), dtype=np.int64, count=len(ordered))
+        data = np.fromiter((q for _, q in ordered), dtype=np.float64, count=len(ordered))
+        indptr = np.zeros(len(product_ids) + 1, dtype=np.int64)
+        np.add.at(indptr, rows + 1, 1)
+        return cls(product_ids, columns, np.cumsum(indptr), indices, data)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.data.size)
+
+    def row(self, product_id: int) -> dict:
+        """{column: qty} for one product (empty if the product has no recipe)."""
+        i = self._row_of.get(product_id)
+        if i is None:
+            return {}
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return {self.columns[j]: float(q) for j, q in zip(self.indices[lo:hi], self.data[lo:hi])}
+
+    def has_generics(self, product_id: int) -> bool:
+        return any(isinstance(c, str) for c in self.row(product_id))
+
+    def explode(self, demand: dict) -> dict:
+        """Demand vector {product_id: units} times the matrix -> {column: total qty}."""
+        weights = np.zeros(len(self.product_ids))
+        for p_id, qty in demand.items():
+            i = self._row_of.get(p_id)
+            if i is not None and qty:
+                weights[i] += qty
+        totals = np.bincount(self.indices, weights=self.data * weights[self._entry_rows], minlength=len(self.columns))
+        return {self.columns[j]: float(totals[j]) for j in np.flatnonzero(totals)}
+
+    def explode_frame(self, demand: pd.DataFrame, qty_col: str = "Expected", product_col: str = "product_id") -> pd.DataFrame:
+        """
+        explode() for a DataFrame (e.g. the forecaster editor). Returns specific items only, as
+        columns item_id (int) and qty_needed - the input of build_shopping_list().
+        """
+        qty = pd.to_numeric(demand[qty_col], errors="coerce").fillna(0)
+        totals = self.explode(dict(zip(demand[product_col].astype("int64"), qty)))
+        items = {c: q for c, q in totals.items() if not isinstance(c, str)}
+        return pd.DataFrame({
+            "item_id": pd.Series(list(items.keys()), dtype="int64"),
+            "qty_needed": pd.Series(list(items.values()), dtype="float64"),
+        })
+
+    def max_makeable(self, stock: dict) -> dict:
+        """
+        Units of each product that current stock supports on its own, ignoring competition
+        between products. `stock` maps columns (item_ids and "cat:" columns) to quantity on hand;
+        missing columns count as 0. Products without a recipe are omitted.
+        """
+        available = np.array([max(0.0, float(stock.get(c, 0) or 0)) for c in self.columns])
+        ratios = np.floor(available[self.indices] / self.data)
+        result = {}
+        for i, p_id in enumerate(self.product_ids):
+            lo, hi = self.indptr[i], self.indptr[i + 1]
+            if hi > lo:
+                result[p_id] = int(ratios[lo:hi].min())
+        return result
+
+# ==========================================
+# 🏭 CAPACITY (MAX MAKEABLE)
+# ==========================================
+# Stock is inventory.count_on_hand, in the same units production deducts. A "cat:<Category>"
+# requirement can be filled from any member item (inventory.category or sub_category match),
+# so generic and specific lines may compete for the same stems; feasibility is checked on
+# real item pools, with BomMatrix.max_makeable() as the fast upper bound.
+
+def category_members(inventory_df: pd.DataFrame, columns: list) -> dict:
+    """Maps each "cat:<Category>" column to the item_ids that can fill it (case-insensitive)."""
+    members = {}
+    if inventory_df.empty:
+        return members
+    category = inventory_df["category"].fillna("").astype(str).str.casefold()
+    sub_category = inventory_df["sub_category"].fillna("").astype(str).str.casefold()
+    for col in columns:
+        if isinstance(col, str) and col.startswith(CATEGORY_PREFIX):
+            wanted = col[len(CATEGORY_PREFIX):].casefold()
+            mask = (category == wanted) | (sub_category == wanted)
+            members[col] = inventory_df.loc[mask, "item_id"].astype("int64").tolist()
+    return members
+
+def _draw_for_units(recipe: dict, units: int, remaining: dict, members: dict) -> Optional[dict]:
+    """Item quantities `units` of a recipe would consume, or None if remaining stock cannot cover it."""
+    draw = {}
+    for col, qty in recipe.items():
+        if not isinstance(col, str):
+            draw[col] = draw.get(col, 0) + qty * units
+    if any(remaining.get(item, 0) < need for item, need in draw.items()):
+        return None
+
+    for col, qty in recipe.items():
+        if not isinstance(col, str):
+            continue
+        need = qty * units
+        # Fill generics from the fullest member items first
+        pool = sorted(members.get(col, ()), key=lambda i: remaining.get(i, 0) - draw.get(i, 0), reverse=True)
+        for item in pool:
+            if need <= 0:
+                break
+            avail = remaining.get(item, 0) - draw.get(item, 0)
+            if avail <= 0:
+                break
+            take = min(avail, need)
+            draw[item] = draw.get(item, 0) + take
+            need -= take
+        if need > 0:
+            return None
+    return draw
+
+def _max_units(recipe: dict, bound: int, remaining: dict, members: dict) -> Tuple[int, dict]:
+    """Largest n <= bound whose draw fits in remaining stock (binary search; feasibility is monotonic)."""
+    lo, hi, best = 0, max(0, int(bound)), {}
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        draw = _draw_for_units(recipe, mid, remaining, members)
+        if draw is None:
+            hi = mid - 1
+        else:
+            lo, best = mid, draw
+    if lo and not best:
+        best = _draw_for_units(recipe, lo, remaining, members) or {}
+    return lo, best
+
+def _row_bound(recipe: dict, remaining: dict, members: dict) -> int:
+    """Per-column upper bound for one recipe (ignores specific/generic overlap)."""
+    bound = None
+    for col, qty in recipe.items():
+        if isinstance(col, str):
+            avail = sum(max(0, remaining.get(i, 0)) for i in members.get(col, ()))
+        else:
+            avail = max(0, remaining.get(col, 0))
+        col_bound = int(avail // qty)
+        bound = col_bound if bound is None else min(bound, col_bound)
+    return bound or 0
+
+def _column_stock(matrix: "BomMatrix", item_stock: dict, members: dict) -> dict:
+    stock = {c: item_stock.get(c, 0) for c in matrix.columns if not isinstance(c, str)}
+    for col, items in members.items():
+        stock[col] = sum(max(0, item_stock.get(i, 0)) for i in items)
+    return stock
+
+def max_makeable_units(matrix: "BomMatrix", item_stock: dict, members: dict, product_ids: list) -> dict:
+    """
+    Units of each product makeable right now from `item_stock` ({item_id: count_on_hand}), each
+    product considered on its own. Products without a recipe map to None (not limited by stock).
+    """
+    bounds = matrix.max_makeable(_column_stock(matrix, item_stock, members))
+    result = {}
+    for p_id in product_ids:
+        if p_id not in bounds:
+            result[p_id] = None
+            continue
+        result[p_id], _ = _max_units(matrix.row(p_id), bounds[p_id], item_stock, members)
+    return result
+
+def allocate_capacity(matrix: "BomMatrix", item_stock: dict, members: dict, demand: list) -> dict:
+    """
+    Greedy joint allocation of shared stock over a prioritized demand list [(product_id, units), ...].
+    Each product takes as many of its units as the stock left by earlier products allows.
+    Returns {product_id: units_covered}; products without a recipe are fully covered.
+    """
+    remaining = {i: max(0, q) for i, q in item_stock.items()}
+    covered = {}
+    for p_id, units in demand:
+        units = int(units)
+        if units <= 0:
+            covered[p_id] = covered.get(p_id, 0)
+            continue
+        recipe = matrix.row(p_id)
+        if not recipe:
+            covered[p_id] = covered.get(p_id, 0) + units
+            continue
+        bound = min(units, _row_bound(recipe, remaining, members))
+        n, draw = _max_units(recipe, bound, remaining, members)
+        for item, qty in draw.items():
+            remaining[item] = remaining.get(item, 0) - qty
+        covered[p_id] = covered.get(p_id, 0) + n
+    return covered
@@ -0,0 +1,130 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Cheap fingerprint of a file: (inode, mtime_ns, size). Changes when another process writes to
+    the database (or its WAL), or when the file is deleted and recreated.
+    """
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class VersionedCache:
+    """
+    Thread-safe memo of read results, each stored with the data version it was computed under.
+
+    A lookup is a hit only while the caller's current version equals the stored one, so a write
+    anywhere (which moves the version) invalidates every entry without explicit bookkeeping.
+    Shared by all Streamlit sessions in the process.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get_or_load(self, key: Hashable, version: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value for key if it was built at `version`, otherwise calls loader() and stores it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                self._stats["stale"] += 1
+            self._stats["misses"] += 1
+
+        # Load outside the lock so a slow query does not block other sessions' hits
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters, hit rate and the number of entries held."""
+        with self._lock:
+            result = dict(self._stats)
+            result["entries"] = len(self._entries)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0.0
+        return result
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU of immutable byte strings, capped by total size rather than entry count,
+    so a few large photos cannot crowd out memory and many thumbnails still fit.
+    Values larger than the whole budget are not cached.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters, hit rate, entries and megabytes held."""
+        with self._lock:
+            result = dict(self._stats)
+            result["entries"] = len(self._entries)
+            result["mb_used"] = round(self._bytes / (1024 * 1024), 2)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0.0
+        result["mb_limit"] = round(self.max_bytes / (1024 * 1024), 2)
+        return result
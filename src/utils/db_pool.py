@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A sqlite3 connection owned by a ConnectionPool.
+    Calling close() hands the connection back to the pool instead of closing it,
+    so existing `conn = get_connection() ... finally: conn.close()` code is pooled for free.
+    """
+
+    def close(self) -> None:
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            pool.checkin(self)
+        else:
+            super().close()
+
+    def discard(self) -> None:
+        """Really closes the underlying SQLite handle."""
+        self._pool = None
+        try:
+            sqlite3.Connection.close(self)
+        except sqlite3.Error as e:
+            logger.warning(f"PooledConnection.discard: Error closing connection: {e}")
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pre-configured SQLite connections, keyed by database path.
+
+    Connections are configured once at creation (busy timeout, WAL, foreign keys) and reused
+    across calls and Streamlit session threads. A connection is only ever used by one caller
+    at a time, which is why check_same_thread is disabled.
+    """
+
+    def __init__(self, max_idle: int = 8, timeout: int = 30):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[PooledConnection]] = {}
+        self._stats = {"checkouts": 0, "checkins": 0, "created": 0, "reused": 0, "discarded": 0, "in_use": 0}
+        self._write_generation = 0
+
+    # --- Internals ---
+
+    @staticmethod
+    def _file_identity(db_path: str) -> Optional[Tuple[int, int]]:
+        """Identifies the file behind a path so a deleted/recreated database is never served stale."""
+        try:
+            st = os.stat(db_path)
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+
+    def _create(self, db_path: str) -> PooledConnection:
+        # 1. timeout means "If the DB is locked, wait before crashing"
+        conn = sqlite3.connect(db_path, timeout=self.timeout, factory=PooledConnection, check_same_thread=False)
+
+        # 2. WAL Mode allows simultaneous reading and writing
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        # 3. Protect data integrity (prevents deleting used inventory items)
+        conn.execute("PRAGMA foreign_keys = ON")
+
+        conn._pool = self
+        conn._db_path = db_path
+        conn._identity = self._file_identity(db_path)
+        conn._checked_out = False
+        with self._lock:
+            self._stats["created"] += 1
+        return conn
+
+    # --- Public API ---
+
+    def checkout(self, db_path: str) -> PooledConnection:
+        """Returns a ready-to-use connection for db_path, reusing an idle one when possible."""
+        conn = None
+        if self.enabled:
+            identity = self._file_identity(db_path)
+            stale = []
+            with self._lock:
+                idle = self._idle.get(db_path, [])
+                while idle:
+                    candidate = idle.pop()
+                    if candidate._identity == identity:
+                        conn = candidate
+                        self._stats["reused"] += 1
+                        break
+                    stale.append(candidate)
+            for s in stale:
+                self._discard(s)
+
+        if conn is None:
+            conn = self._create(db_path)
+
+        conn._checked_out = True
+        conn._changes_at_checkout = conn.total_changes
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+        return conn
+
+    def checkin(self, conn: PooledConnection) -> None:
+        """Returns a connection to the pool. Any transaction left open by the caller is rolled back."""
+        if not getattr(conn, "_checked_out", False):
+            return
+        conn._checked_out = False
+        wrote = conn.total_changes != conn._changes_at_checkout
+        with self._lock:
+            self._stats["checkins"] += 1
+            self._stats["in_use"] -= 1
+            if wrote:
+                self._write_generation += 1
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error as e:
+            logger.warning(f"ConnectionPool.checkin: Dropping broken connection: {e}")
+            self._discard(conn)
+            return
+
+        if not self.enabled:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(conn._db_path, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        self._discard(conn)
+
+    @property
+    def write_generation(self) -> int:
+        """
+        Counter bumped whenever a checked-in connection modified rows. Read caches key on it,
+        so every write function that goes through the pool invalidates them automatically.
+        """
+        with self._lock:
+            return self._write_generation
+
+    def _discard(self, conn: PooledConnection) -> None:
+        conn.discard()
+        with self._lock:
+            self._stats["discarded"] += 1
+
+    @contextmanager
+    def connection(self, db_path: str) -> Iterator[PooledConnection]:
+        """Context-manager API: `with pool.connection(path) as conn:` checks the connection back in on exit."""
+        conn = self.checkout(db_path)
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def close_all(self) -> int:
+        """Closes every idle connection (e.g. before deleting a test database). Returns the number closed."""
+        with self._lock:
+            to_close = [c for conns in self._idle.values() for c in conns]
+            self._idle.clear()
+        for conn in to_close:
+            self._discard(conn)
+        return len(to_close)
+
+    def stats(self) -> dict:
+        """Checkout/checkin counters plus the current number of idle connections."""
+        with self._lock:
+            result = dict(self._stats)
+            result["idle"] = sum(len(c) for c in self._idle.values())
+            result["write_generation"] = self._write_generation
+        return result
@@ -1,26 +1,401 @@
 import sqlite3
 import pandas as pd
+import numpy as np
 import os
 import logging
-from typing import Optional, List, Tuple, Union
+import hashlib
+from typing import Callable, Iterator, NamedTuple, Optional, List, Tuple, Union
 import uuid
-from src.utils import utils
+from src.utils import utils, bom
+from src.utils.db_pool import ConnectionPool
+from src.utils.cache import ByteLRUCache, VersionedCache, file_signature
 
 logger = logging.getLogger(__name__)
 
 DB_PATH = 'inventory.db'
 
+# Shared across all Streamlit sessions. Connections are created with busy timeout, WAL and
+# foreign keys already configured, so a checkout costs no connect/PRAGMA round trips.
+_pool = ConnectionPool(max_idle=8, timeout=30)
+
 def get_connection() -> sqlite3.Connection:
-    # 1. timeout=30 means "If the DB is locked, wait 30 seconds before crashing"
-    conn = sqlite3.connect(DB_PATH, timeout=30) 
-    
-    # 2. WAL Mode allows simultaneous reading and writing
-    conn.execute("PRAGMA journal_mode=WAL")
-    
-    # 3. Protect your data integrity (prevents deleting used inventory items)
-    conn.execute("PRAGMA foreign_keys = ON")
-    
-    return conn
+    """
+    Checks out a pre-configured connection for DB_PATH from the shared pool.
+    Calling close() on it returns it to the pool (any uncommitted work is rolled back).
+    """
+    return _pool.checkout(DB_PATH)
+
+def connection():
+    """Context-manager form of get_connection(): `with db_utils.connection() as conn:`."""
+    return _pool.connection(DB_PATH)
+
+def get_pool_stats() -> dict:
+    """Returns checkout/checkin/reuse counters for the connection pool (for the Admin panel)."""
+    return _pool.stats()
+
+def set_connection_pooling(enabled: bool) -> None:
+    """
+    Toggles pooling. When disabled every checkout opens a fresh connection and close() really
+    closes it (the old behaviour) - useful for tests that swap DB_PATH between temp files.
+    """
+    _pool.enabled = enabled
+    if not enabled:
+        _pool.close_all()
+
+def close_pooled_connections() -> int:
+    """Closes all idle pooled connections so the database file can be deleted or replaced."""
+    return _pool.close_all()
+
+# ==========================================
+# ⚡ READ CACHE (Write-Invalidated)
+# ==========================================
+# Heavy, rarely-changing reads are memoized per data version. The version moves on every
+# pooled write (see ConnectionPool.write_generation) and whenever the database or its WAL
+# file changes on disk, which also catches writes from other processes (seed scripts, CLI).
+
+_read_cache = VersionedCache(max_entries=32)
+
+def get_data_version() -> tuple:
+    """Current data version of DB_PATH. Any write moves it."""
+    return (DB_PATH, _pool.write_generation, file_signature(DB_PATH), file_signature(DB_PATH + "-wal"))
+
+def _cached_read(name: str, loader):
+    # Version is taken BEFORE loading: a write racing the query can only cause an extra miss
+    return _read_cache.get_or_load((DB_PATH, name), get_data_version(), loader)
+
+def get_data_versions(tables: Tuple[str, ...]) -> dict:
+    """
+    Returns {table: change_counter} for the given tables (maintained by triggers, see migration 7).
+    A single indexed read - cheap enough to call on every polling tick.
+    """
+    conn = get_connection()
+    try:
+        placeholders = ",".join("?" * len(tables))
+        rows = conn.execute(f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})", tuple(tables)).fetchall()
+        return dict(rows)
+    except sqlite3.Error as e:
+        logger.error(f"get_data_versions: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def get_bom_matrix() -> "bom.BomMatrix":
+    """
+    Sparse product x ingredient matrix built from all recipes (archived versions included).
+    Cached in memory and rebuilt only when the recipes table changes.
+    """
+    # Keyed on the recipes change counter only (plus the file's inode, in case the DB is replaced),
+    # so production clicks and stock edits do not force a rebuild
+    signature = file_signature(DB_PATH)
+    version = (DB_PATH, signature[0] if signature else None, get_data_versions(("recipes",)).get("recipes"))
+    return _read_cache.get_or_load((DB_PATH, "bom_matrix"), version, _load_bom_matrix)
+
+def _load_bom_matrix() -> "bom.BomMatrix":
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT product_id, item_id, qty_needed, requirement_type, requirement_value FROM recipes").fetchall()
+        return bom.BomMatrix.from_records(rows)
+    finally:
+        conn.close()
+
+def get_cache_stats() -> dict:
+    """Returns hit/miss counters for the read cache (for the Admin panel)."""
+    return _read_cache.stats()
+
+def clear_read_cache() -> None:
+    """Drops every cached read result."""
+    _read_cache.clear()
+
+# ==========================================
+# 🖼️ IMAGE STORE (Content-Addressed)
+# ==========================================
+# Product rows only carry `image_hash`; the original bytes (at most utils.FULL_IMAGE_SIZE,
+# served as the "full" rendition) live in `product_images` and the smaller pre-sized JPEG
+# copies (see utils.RENDITION_SIZES) live in `image_renditions`.
+# Bytes behind a hash never change, so fetched images can be cached indefinitely.
+
+# Memory budget for fetched image bytes, shared by all sessions. Keys are (image_hash, rendition):
+# a product whose photo changes gets a new hash, so entries never go stale.
+IMAGE_CACHE_MB = 64
+_image_cache = ByteLRUCache(max_bytes=IMAGE_CACHE_MB * 1024 * 1024)
+
+def _store_renditions(cursor: sqlite3.Cursor, image_hash: str, image_bytes: bytes, renditions: Optional[dict] = None) -> dict:
+    """
+    Decodes the image once and saves every rendition. Returns {(rendition, format): bytes}.
+    Pass `renditions` when they were already built (e.g. by utils.prepare_images) to skip the work.
+    """
+    if renditions is None:
+        renditions = utils.process_image_renditions(image_bytes)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO image_renditions (image_hash, rendition, format, image_data, byte_size) VALUES (?, ?, ?, ?, ?)",
+        [(image_hash, name, fmt, data, len(data)) for (name, fmt), data in renditions.items()]
+    )
+    return renditions
+
+def _stored_rendition(rendition: Optional[str]) -> Optional[str]:
+    """Name a rendition is stored under in image_renditions, or None when it is served from the original ("full")."""
+    return rendition if rendition in utils.RENDITION_SIZES else None
+
+def _store_image(cursor: sqlite3.Cursor, image_bytes: Optional[bytes], renditions: Optional[dict] = None) -> Optional[str]:
+    """Saves image bytes (once per unique content) and their renditions inside the caller's transaction. Returns the hash key."""
+    if not image_bytes:
+        return None
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    cursor.execute("INSERT OR IGNORE INTO product_images (image_hash, image_data, byte_size) VALUES (?, ?, ?)",
+                   (image_hash, image_bytes, len(image_bytes)))
+    if cursor.rowcount == 1:
+        _store_renditions(cursor, image_hash, image_bytes, renditions)
+    return image_hash
+
+def get_image(image_hash: Optional[str], rendition: Optional[str] = "card") -> Optional[bytes]:
+    """
+    Fetches an image by hash key, served from an in-process cache after the first load.
+    rendition: "card" (see utils.RENDITION_SIZES), or "full" / None for the stored original.
+    """
+    if not image_hash or not isinstance(image_hash, str):
+        return None
+    rendition = _stored_rendition(rendition)
+
+    cache_key = (image_hash, rendition)
+    cached = _image_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        data = None
+        if rendition:
+            cursor.execute("SELECT image_data FROM image_renditions WHERE image_hash = ? AND rendition = ? AND format = 'JPEG'", (image_hash, rendition))
+            res = cursor.fetchone()
+            if res:
+                data = res[0]
+
+        if data is None:
+            cursor.execute("SELECT image_data FROM product_images WHERE image_hash = ?", (image_hash,))
+            res = cursor.fetchone()
+            if not res:
+                return None
+            data = res[0]
+            if rendition:
+                # Image stored before renditions existed: build them once, fall back to the original
+                renditions = _store_renditions(cursor, image_hash, data)
+                conn.commit()
+                data = renditions.get((rendition, 'JPEG'), data)
+    except sqlite3.Error as e:
+        logger.error(f"get_image: {e}")
+        return None
+    finally:
+        conn.close()
+
+    _image_cache.put(cache_key, data)
+    return data
+
+def get_images(image_hashes, rendition: Optional[str] = "card") -> dict:
+    """
+    Batch get_image for a rendered page: {image_hash: bytes} for every hash that has an image.
+    Cached bytes cost no query; the rest are read with one IN (...) query per table.
+    """
+    rendition = _stored_rendition(rendition)
+    wanted = list(dict.fromkeys(h for h in image_hashes if isinstance(h, str) and h))
+    found = {}
+    missing = []
+    for image_hash in wanted:
+        cached = _image_cache.get((image_hash, rendition))
+        if cached is not None:
+            found[image_hash] = cached
+        else:
+            missing.append(image_hash)
+    if not missing:
+        return found
+
+    conn = get_connection()
+    try:
+        loaded = {}
+        if rendition:
+            placeholders = ",".join("?" * len(missing))
+            loaded.update(conn.execute(
+                f"SELECT image_hash, image_data FROM image_renditions WHERE rendition = ? AND format = 'JPEG' AND image_hash IN ({placeholders})",
+                (rendition, *missing)).fetchall())
+
+        originals = [h for h in missing if h not in loaded]
+        if originals:
+            placeholders = ",".join("?" * len(originals))
+            rows = conn.execute(f"SELECT image_hash, image_data FROM product_images WHERE image_hash IN ({placeholders})", originals).fetchall()
+            built = False
+            for image_hash, data in rows:
+                if rendition:
+                    # Image stored before renditions existed: build them once, fall back to the original
+                    data = _store_renditions(conn.cursor(), image_hash, data).get((rendition, 'JPEG'), data)
+                    built = True
+                loaded[image_hash] = data
+            if built:
+                conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"get_images: {e}")
+        return found
+    finally:
+        conn.close()
+
+    for image_hash, data in loaded.items():
+        _image_cache.put((image_hash, rendition), data)
+    found.update(loaded)
+    return found
+
+def _load_product_image_hashes() -> dict:
+    conn = get_connection()
+    try:
+        return dict(conn.execute("SELECT product_id, image_hash FROM products WHERE image_hash IS NOT NULL").fetchall())
+    finally:
+        conn.close()
+
+def get_product_images(product_ids, rendition: Optional[str] = "card") -> dict:
+    """
+    {product_id: bytes} for the products that have an image, in one call per rendered page.
+    The product -> hash map comes from the read cache and the bytes from the image cache, so
+    repeat views of the same products do not touch SQLite until something is written.
+    """
+    try:
+        hashes = _cached_read("product_image_hashes", _load_product_image_hashes)
+    except sqlite3.Error as e:
+        logger.error(f"get_product_images: {e}")
+        return {}
+    wanted = {int(pid): hashes.get(int(pid)) for pid in product_ids}
+    images = get_images([h for h in wanted.values() if h], rendition)
+    return {pid: images[h] for pid, h in wanted.items() if h in images}
+
+def get_image_cache_stats() -> dict:
+    """Hit/miss counters and memory use of the shared image byte cache (for the Admin panel)."""
+    return _image_cache.stats()
+
+def clear_image_cache() -> None:
+    """Drops every cached image."""
+    _image_cache.clear()
+
+def set_product_image(product_id: int, image_bytes: Optional[bytes], image_renditions: Optional[dict] = None) -> Optional[str]:
+    """
+    Replaces a product's image in place (no new product version; the recipe is untouched).
+    Returns the new image hash, or None on failure.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        image_hash = _store_image(cursor, image_bytes, image_renditions)
+        cursor.execute("UPDATE products SET image_hash = ? WHERE product_id = ?", (image_hash, product_id))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return None
+        conn.commit()
+        return image_hash
+    except sqlite3.Error as e:
+        logger.error(f"set_product_image: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+# Reference counts are derived from products.image_hash (indexed) rather than kept in a counter
+# column: every product version, archived ones included, holds a reference, so the history stays
+# viewable and nothing can drift. Images that lose their last reference (e.g. a photo replaced by
+# set_product_image) stay stored until purge_unreferenced_images() runs.
+_UNREFERENCED_IMAGES_SQL = """
+    SELECT i.image_hash FROM product_images i
+    WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.image_hash = i.image_hash)
+"""
+
+def get_image_storage_stats() -> dict:
+    """Stored images, their references and the bytes held by unreferenced ones (renditions included)."""
+    conn = get_connection()
+    try:
+        images, image_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(byte_size), 0) FROM product_images").fetchone()
+        references = conn.execute("SELECT COUNT(*) FROM products WHERE image_hash IS NOT NULL").fetchone()[0]
+        rendition_bytes = conn.execute("SELECT COALESCE(SUM(byte_size), 0) FROM image_renditions").fetchone()[0]
+        unreferenced, unreferenced_bytes = conn.execute(f"""
+            WITH orphans AS ({_UNREFERENCED_IMAGES_SQL})
+            SELECT (SELECT COUNT(*) FROM orphans),
+                   (SELECT COALESCE(SUM(byte_size), 0) FROM product_images WHERE image_hash IN orphans)
+                 + (SELECT COALESCE(SUM(byte_size), 0) FROM image_renditions WHERE image_hash IN orphans)
+        """).fetchone()
+        return {
+            "images": images,
+            "references": references,
+            "unreferenced": unreferenced,
+            "stored_mb": round((image_bytes + rendition_bytes) / (1024 * 1024), 2),
+            "unreferenced_mb": round(unreferenced_bytes / (1024 * 1024), 2),
+        }
+    except sqlite3.Error as e:
+        logger.error(f"get_image_storage_stats: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def purge_unreferenced_images(vacuum: bool = False) -> Optional[dict]:
+    """
+    Garbage-collects images no product (active or archived) points at, with their renditions.
+
+    Args:
+        vacuum (bool): Also run VACUUM afterwards so the file actually shrinks (slow on big databases).
+
+    Returns:
+        dict: {"images": deleted originals, "renditions": deleted renditions}, or None on error.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # One write transaction: an image saved concurrently is committed with its product row,
+        # so it is either already referenced or not visible yet
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"DELETE FROM image_renditions WHERE image_hash IN ({_UNREFERENCED_IMAGES_SQL})")
+        renditions = cursor.rowcount
+        cursor.execute(f"DELETE FROM product_images WHERE image_hash IN ({_UNREFERENCED_IMAGES_SQL})")
+        images = cursor.rowcount
+        conn.commit()
+        logger.info(f"purge_unreferenced_images: Deleted {images} images and {renditions} renditions")
+
+        if vacuum:
+            cursor.execute("VACUUM")
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"images": images, "renditions": renditions}
+    except sqlite3.Error as e:
+        logger.error(f"purge_unreferenced_images: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def get_image_manifest() -> dict:
+    """{source_path: (mtime_ns, byte_size, content_hash, product_id)} as recorded by the last seeding run."""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT source_path, mtime_ns, byte_size, content_hash, product_id FROM image_manifest").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+    except sqlite3.Error as e:
+        logger.error(f"get_image_manifest: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def save_image_manifest(entries: List[Tuple[str, int, int, str, Optional[int]]]) -> int:
+    """Upserts (source_path, mtime_ns, byte_size, content_hash, product_id) rows in one transaction."""
+    if not entries:
+        return 0
+    conn = get_connection()
+    try:
+        conn.executemany("""
+            INSERT INTO image_manifest (source_path, mtime_ns, byte_size, content_hash, product_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(source_path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns, byte_size = excluded.byte_size, content_hash = excluded.content_hash,
+                product_id = excluded.product_id, updated_at = excluded.updated_at
+        """, entries)
+        conn.commit()
+        return len(entries)
+    except sqlite3.Error as e:
+        logger.error(f"save_image_manifest: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
 
 def filter_dataframe_by_terms(df: pd.DataFrame, column: str, search_term: str) -> pd.DataFrame:
     """
@@ -36,6 +411,99 @@ def filter_dataframe_by_terms(df: pd.DataFrame, column: str, search_term: str) -
     
     return df
 
+# ==========================================
+# 🔍 PRODUCT SEARCH (FTS5 Trigram Index)
+# ==========================================
+# `product_search` (migration 10) indexes product names, notes, variant types and ingredient
+# names; triggers keep it in sync with every write. Search boxes ask it for matching
+# product_ids instead of scanning their DataFrames once per search token.
+
+# bm25 column weights: display_name, note, variant_type, ingredients. A name hit outranks an ingredient hit.
+_SEARCH_WEIGHTS = (10.0, 2.0, 1.0, 1.0)
+_SEARCH_COLUMNS = ("display_name", "note", "variant_type", "ingredients")
+
+def _like_pattern(term: str) -> str:
+    """Substring LIKE pattern with %, _ and the escape character itself escaped (use with ESCAPE '\\')."""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _search_index(conn: sqlite3.Connection, terms: List[str], limit: Optional[int], active: Optional[bool] = None) -> List[int]:
+    # Trigram MATCH needs 3+ characters; shorter terms are LIKE filters on the index (still no base-table scan)
+    match_terms = [t for t in terms if len(t) >= 3]
+    like_terms = [t for t in terms if len(t) < 3]
+
+    where, params = [], []
+    if match_terms:
+        where.append("product_search MATCH ?")
+        params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in match_terms))
+    for term in like_terms:
+        where.append("(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in _SEARCH_COLUMNS) + ")")
+        params.extend([_like_pattern(term)] * len(_SEARCH_COLUMNS))
+
+    if active is not None:
+        where.append("rowid IN (SELECT product_id FROM products WHERE active = ?)")
+        params.append(1 if active else 0)
+
+    order = f"bm25(product_search, {', '.join(map(str, _SEARCH_WEIGHTS))})" if match_terms else "display_name COLLATE NOCASE"
+    sql = f"SELECT rowid FROM product_search WHERE {' AND '.join(where)} ORDER BY {order}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [row[0] for row in conn.execute(sql, params)]
+
+def _search_tables(conn: sqlite3.Connection, terms: List[str], limit: Optional[int], active: Optional[bool] = None) -> List[int]:
+    """Same semantics as _search_index with plain LIKE over the base tables (SQLite without FTS5)."""
+    text = """(p.display_name LIKE ? ESCAPE '\\' OR p.note LIKE ? ESCAPE '\\' OR p.variant_type LIKE ? ESCAPE '\\'
+              OR EXISTS (SELECT 1 FROM recipes r LEFT JOIN inventory i ON i.item_id = r.item_id
+                         WHERE r.product_id = p.product_id AND COALESCE(i.name, r.requirement_value) LIKE ? ESCAPE '\\'))"""
+    where = [text] * len(terms)
+    params = []
+    for term in terms:
+        params.extend([_like_pattern(term)] * 4)
+    if active is not None:
+        where.append("p.active = ?")
+        params.append(1 if active else 0)
+    sql = f"SELECT p.product_id FROM products p WHERE {' AND '.join(where)} ORDER BY p.display_name COLLATE NOCASE"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [row[0] for row in conn.execute(sql, params)]
+
+def search_product_ids(search_term: str, limit: Optional[int] = None, active: Optional[bool] = None) -> List[int]:
+    """
+    Product ids matching every whitespace-separated term in the name, note, variant type or an
+    ingredient name. Case-insensitive substring matching, best match first (name hits rank
+    highest). `active` limits results to active (True) or archived (False) products.
+    Returns [] for an empty search.
+    """
+    terms = search_term.split() if search_term else []
+    if not terms:
+        return []
+    conn = get_connection()
+    try:
+        try:
+            return _search_index(conn, terms, limit, active)
+        except sqlite3.OperationalError as e:
+            # No product_search table (SQLite built without FTS5 / trigram)
+            logger.debug(f"search_product_ids: index unavailable ({e}); using LIKE")
+            return _search_tables(conn, terms, limit, active)
+    except sqlite3.Error as e:
+        logger.error(f"search_product_ids: {e}")
+        return []
+    finally:
+        conn.close()
+
+def filter_dataframe_by_search(df: pd.DataFrame, search_term: str, id_column: str = 'product_id', ranked: bool = False) -> pd.DataFrame:
+    """
+    Keeps the rows whose product matches search_product_ids(search_term).
+    ranked=True reorders rows best match first; otherwise the frame's own order is kept.
+    """
+    if not search_term or not search_term.strip() or df.empty:
+        return df
+    ids = search_product_ids(search_term)
+    matched = df[df[id_column].isin(ids)]
+    if ranked and not matched.empty:
+        rank = {pid: i for i, pid in enumerate(ids)}
+        matched = matched.iloc[matched[id_column].map(rank).to_numpy().argsort(kind="stable")]
+    return matched
+
 def get_inventory() -> pd.DataFrame:
     try:
         if not os.path.exists(DB_PATH):
@@ -53,12 +521,96 @@ def get_inventory() -> pd.DataFrame:
         logger.error(f"get_inventory: Error fetching inventory: {e}")
         return pd.DataFrame()
 
-def log_production(goal_id: int, substitutions: list = None, ignore_recipe: bool = False) -> bool:
+# ==========================================
+# 🧾 BILL OF MATERIALS DEDUCTION
+# ==========================================
+
+def _build_deduction_map(cursor: sqlite3.Cursor, product_id: int, substitutions: list = None, ignore_recipe: bool = False) -> dict:
+    """
+    Merges the product's Specific recipe rows and any substitutions into a single
+    {item_id: qty_per_unit} map. Repeated items are summed, not deducted twice.
+    """
+    per_unit = {}
+    if not ignore_recipe:
+        # Only Specific items are deducted automatically; generics arrive as substitutions
+        cursor.execute("""
+            SELECT item_id, SUM(qty_needed) FROM recipes
+            WHERE product_id = ? AND requirement_type = 'Specific' AND item_id IS NOT NULL
+            GROUP BY item_id
+        """, (product_id,))
+        for i_id, item_qty in cursor.fetchall():
+            per_unit[i_id] = per_unit.get(i_id, 0) + item_qty
+
+    for sub_item_id, sub_qty in substitutions or []:
+        # Values often come from DataFrames (numpy types), which sqlite3 cannot bind
+        i_id, item_qty = int(sub_item_id), int(sub_qty)
+        per_unit[i_id] = per_unit.get(i_id, 0) + item_qty
+
+    return {i_id: item_qty for i_id, item_qty in per_unit.items() if item_qty}
+
+def _apply_inventory_deltas(cursor: sqlite3.Cursor, per_unit: dict, units: int = 1, sign: int = -1) -> None:
+    """Applies a per-unit {item_id: qty} map for `units` units in one executemany. sign=-1 deducts, +1 restores."""
+    if per_unit:
+        cursor.executemany("UPDATE inventory SET count_on_hand = count_on_hand + ? WHERE item_id = ?",
+                           [(sign * item_qty * units, i_id) for i_id, item_qty in per_unit.items()])
+
+def _snapshot_log_items(cursor: sqlite3.Cursor, log_id: int, per_unit: dict) -> None:
+    """
+    Journals the exact per-unit deduction of a log row (same transaction as the make),
+    so undo can reverse it without the recipe.
+    """
+    cursor.execute("UPDATE production_logs SET bom_journaled = 1 WHERE log_id = ?", (log_id,))
+    if per_unit:
+        cursor.executemany("INSERT INTO production_log_items (log_id, item_id, qty) VALUES (?, ?, ?)",
+                           [(log_id, i_id, item_qty) for i_id, item_qty in per_unit.items()])
+
+def _restore_log_unit(cursor: sqlite3.Cursor, log_id: int, product_id: int) -> None:
+    """Returns one unit's worth of a log's deduction to inventory in a single set-based UPDATE."""
+    cursor.execute("SELECT bom_journaled FROM production_logs WHERE log_id = ?", (log_id,))
+    journaled = cursor.fetchone()[0]
+    if journaled:
+        # Replay the journal: touches only the items this log actually deducted
+        cursor.execute("""
+            UPDATE inventory SET count_on_hand = count_on_hand + j.qty
+            FROM production_log_items j
+            WHERE j.log_id = ? AND inventory.item_id = j.item_id
+        """, (log_id,))
+        return
+
+    # Legacy log written before the journal: the best we know is the Specific rows of the
+    # logged version's recipe. Substitutions made at the time were never recorded.
+    logger.info(f"_restore_log_unit: log_id {log_id} has no deduction journal; restoring from recipe of product {product_id}")
+    cursor.execute("""
+        UPDATE inventory SET count_on_hand = count_on_hand + r.qty
+        FROM (
+            SELECT item_id, SUM(qty_needed) AS qty FROM recipes
+            WHERE product_id = ? AND requirement_type = 'Specific' AND item_id IS NOT NULL
+            GROUP BY item_id
+        ) AS r
+        WHERE inventory.item_id = r.item_id
+    """, (product_id,))
+
+def _pop_log_unit(cursor: sqlite3.Cursor, log_id: int, log_qty: int) -> None:
+    """
+    Removes one unit from a log row: a batch row is decremented, a single-unit row is deleted
+    (its snapshot items go with it via ON DELETE CASCADE).
+    """
+    if log_qty > 1:
+        cursor.execute("UPDATE production_logs SET qty = qty - 1 WHERE log_id = ?", (log_id,))
+    else:
+        cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (log_id,))
+
+def log_production(goal_id: int, substitutions: list = None, ignore_recipe: bool = False, qty: int = 1) -> bool:
     """
-    Increments production count and deducts inventory (BOM).
-    substitutions: List of (item_id, qty_to_deduct) derived from user selection for generics.
+    Increments production count by `qty` and deducts inventory (BOM) for all units at once.
+    substitutions: List of (item_id, qty_to_deduct) PER UNIT, derived from user selection for generics.
     ignore_recipe: If True, standard recipe items are NOT deducted; only 'substitutions' are used.
     """
+    qty = int(qty)
+    if qty < 1:
+        logger.warning(f"log_production: Invalid qty {qty} for goal_id {goal_id}")
+        return False
+
     conn = get_connection()
     try:
         cursor = conn.cursor()
@@ -75,23 +627,16 @@ def log_production(goal_id: int, substitutions: list = None, ignore_recipe: bool
         logger.debug(f"log_production: goal_id={goal_id}, product_id={p_id}")
 
         # Update Goal
-        cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled + 1 WHERE goal_id = ?", (goal_id,))
+        cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled + ? WHERE goal_id = ?", (qty, goal_id))
         
-        # Insert Log Entry
-        cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type) VALUES (?, ?, 'MAKE')", (goal_id, p_id))
+        # Insert Log Entry (one row for the whole batch; undo peels off one unit at a time)
+        cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type, qty) VALUES (?, ?, 'MAKE', ?)", (goal_id, p_id, qty))
+        log_id = cursor.lastrowid
         
-        # 3. Deduct Standard Inventory (Specific Items)
-        if not ignore_recipe:
-            cursor.execute("SELECT item_id, qty_needed FROM recipes WHERE product_id = ? AND requirement_type = 'Specific'", (p_id,))
-            specific_items = cursor.fetchall()
-            
-            for i_id, qty in specific_items:
-                cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand - ? WHERE item_id = ?", (qty, i_id))
-            
-        # 4. Deduct Substitutions (The Dynamic Part)
-        if substitutions:
-            for sub_item_id, sub_qty in substitutions:
-                cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand - ? WHERE item_id = ?", (sub_qty, sub_item_id))
+        # 3. Deduct Recipe + Substitutions as one merged map, and snapshot it on the log
+        per_unit = _build_deduction_map(cursor, p_id, substitutions, ignore_recipe)
+        _apply_inventory_deltas(cursor, per_unit, qty)
+        _snapshot_log_items(cursor, log_id, per_unit)
         
         conn.commit()
         return True
@@ -102,6 +647,10 @@ def log_production(goal_id: int, substitutions: list = None, ignore_recipe: bool
     finally:
         conn.close()
 
+def log_production_batch(goal_id: int, qty: int, substitutions: list = None, ignore_recipe: bool = False) -> bool:
+    """Makes `qty` units for a goal in one transaction with a single log row. Substitutions are per unit."""
+    return log_production(goal_id, substitutions=substitutions, ignore_recipe=ignore_recipe, qty=qty)
+
 # ==========================================
 # 📦 BULK INVENTORY OPERATIONS (Count & Cost)
 # ==========================================
@@ -119,92 +668,232 @@ def export_inventory_csv() -> str:
     finally:
         conn.close()
 
-def process_bulk_inventory_upload(file_obj) -> Tuple[int, List[str]]:
-    """Reads a CSV file and updates inventory. Matches by ID first, then Name."""
+# ==========================================
+# 📥 STREAMING CSV IMPORT (Chunked & Resumable)
+# ==========================================
+# With `chunk_size` set, the bulk importers read the upload in bounded chunks and commit each
+# one on its own, so a wholesaler catalog never sits in memory as a single DataFrame and other
+# writers (POS, dashboards) get the database between chunks. Every chunk commit also records a
+# checkpoint in `import_progress`; uploading the same file again skips the rows already done.
+
+# Rows per committed batch in streaming mode
+IMPORT_CHUNK_ROWS = 2000
+
+# progress(rows_done, total_rows) - called once before the first chunk and after every commit
+ImportProgressCallback = Callable[[int, Optional[int]], None]
+
+def _normalize_headers(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-cases and strips column names so headers are user-friendly."""
+    df.columns = [str(c).lower().strip() for c in df.columns]
+    return df
+
+def _upload_fingerprint(file_obj) -> Tuple[str, int]:
+    """SHA-256 and data row count (lines minus header) of an upload, read in 1 MB blocks. Rewinds the file."""
+    digest = hashlib.sha256()
+    lines, last = 0, b"\n"
+    file_obj.seek(0)
+    while True:
+        block = file_obj.read(1 << 20)
+        if not block:
+            break
+        if isinstance(block, str):
+            block = block.encode("utf-8")
+        digest.update(block)
+        lines += block.count(b"\n")
+        last = block[-1:]
+    file_obj.seek(0)
+    if last != b"\n":
+        lines += 1
+    return digest.hexdigest(), max(lines - 1, 0)
+
+def get_import_checkpoint(import_key: str) -> int:
+    """Number of data rows already committed for an interrupted import (0 if none)."""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT rows_done FROM import_progress WHERE import_key = ?", (import_key,)).fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error as e:
+        logger.error(f"get_import_checkpoint: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def _save_import_checkpoint(cursor: sqlite3.Cursor, import_key: str, kind: str, rows_done: int, total_rows: Optional[int]) -> None:
+    """Records progress inside the chunk's own transaction, so checkpoint and data commit together."""
+    cursor.execute("""
+        INSERT INTO import_progress (import_key, kind, rows_done, total_rows, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(import_key) DO UPDATE SET rows_done = excluded.rows_done, updated_at = excluded.updated_at
+    """, (import_key, kind, rows_done, total_rows))
+
+def _clear_import_checkpoint(cursor: sqlite3.Cursor, import_key: str) -> None:
+    cursor.execute("DELETE FROM import_progress WHERE import_key = ?", (import_key,))
+
+def _iter_csv_chunks(file_obj, chunk_size: int, skip_rows: int = 0) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Yields (offset of the chunk's first data row, chunk) with normalized headers.
+    The first `skip_rows` data rows are parsed and dropped, which stays correct for quoted
+    multi-line fields (unlike skipping raw lines).
+    """
+    offset = 0
+    for chunk in pd.read_csv(file_obj, chunksize=chunk_size):
+        end = offset + len(chunk)
+        if end > skip_rows:
+            first = max(skip_rows - offset, 0)
+            yield offset + first, _normalize_headers(chunk.iloc[first:])
+        offset = end
+
+def _open_csv_import(
+    file_obj, kind: str, chunk_size: Optional[int], resume: bool
+) -> Tuple[Iterator[Tuple[int, pd.DataFrame]], Optional[str], Optional[int], int]:
+    """
+    Prepares an import. Returns (chunks, checkpoint key, total data rows, rows already done).
+    Without chunk_size the whole file is a single chunk and no checkpoint is kept.
+    """
+    if not chunk_size:
+        df = _normalize_headers(pd.read_csv(file_obj))
+        return iter([(0, df)]), None, len(df), 0
+
+    file_hash, total_rows = _upload_fingerprint(file_obj)
+    import_key = f"{kind}:{file_hash}"
+    rows_done = get_import_checkpoint(import_key) if resume else 0
+    if rows_done:
+        logger.info(f"_open_csv_import: Resuming {kind} import at row {rows_done} of {total_rows}")
+    return _iter_csv_chunks(file_obj, chunk_size, rows_done), import_key, total_rows, rows_done
+
+def _clean_inventory_frame(df: pd.DataFrame, first_row: int = 0) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Column-wise cleaning of an inventory CSV (headers already lower-cased).
+    Bad numbers fall back to defaults (count 0, cost 0.0, bundle 1, no ID) and fractions are
+    truncated like int(float(x)); rows without a name are dropped and reported. `first_row` is the data row offset of df within the file.
+    Returns (clean rows with `row_num`, errors).
+    """
+    n = len(df)
+    def column(name, default=None):
+        return df[name] if name in df.columns else pd.Series([default] * n, index=df.index, dtype="object")
+    def whole_numbers(name):
+        # NaN for text, inf and values outside SQLite's INTEGER range, so no cast below can raise
+        values = np.trunc(pd.to_numeric(column(name), errors='coerce').astype('float64'))
+        return values.where(values.abs() < 2.0 ** 63)
+
+    names = column('name').astype("string").str.strip()
+    missing_name = names.isna() | (names == "")
+    errors = [f"Row {first_row + i + 2} Error: missing name" for i in np.flatnonzero(missing_name.to_numpy())]
+
+    cost_text = column('unit_cost').astype("string").str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+    item_ids = whole_numbers('item_id')
+
+    clean = pd.DataFrame({
+        # CSV row number as the user sees it (header is row 1)
+        'row_num': np.arange(n) + first_row + 2,
+        'item_id': item_ids.where(item_ids >= 1).astype('Int64'),
+        'name': names,
+        'category': column('category').astype(object).where(column('category').notna(), None),
+        'sub_category': column('sub_category').astype(object).where(column('sub_category').notna(), None),
+        'count_on_hand': whole_numbers('count_on_hand').fillna(0).astype('int64'),
+        'unit_cost': pd.to_numeric(cost_text, errors='coerce').fillna(0.0).astype('float64'),
+        'bundle_count': whole_numbers('bundle_count').fillna(1).astype('int64'),
+    }, index=df.index)
+    return clean[~missing_name.to_numpy()], errors
+
+def _upsert_inventory_rows(cursor: sqlite3.Cursor, clean: pd.DataFrame) -> int:
+    """Loads cleaned rows through a temp staging table with two set-based statements. Returns rows staged."""
+    # Plain Python values for sqlite3 (no numpy / pandas NA)
+    staged = [
+        (int(r.row_num), None if pd.isna(r.item_id) else int(r.item_id), str(r.name), r.category, r.sub_category,
+         int(r.count_on_hand), float(r.unit_cost), int(r.bundle_count))
+        for r in clean.itertuples(index=False)
+    ]
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS inventory_import_staging (
+            row_num INTEGER, item_id INTEGER, name TEXT, category TEXT, sub_category TEXT,
+            count_on_hand INTEGER, unit_cost REAL, bundle_count INTEGER
+        )
+    """)
+    cursor.execute("DELETE FROM temp.inventory_import_staging")
+    cursor.executemany("INSERT INTO temp.inventory_import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?)", staged)
+
+    # LOGIC: ID Match -> Update (or re-create with that ID); file order decides duplicate IDs.
+    # `name` is always in the SET list, so SQLite fires the UPDATE OF name search trigger for every
+    # matched row; its WHEN OLD.name IS NOT NEW.name guard (migration 14) keeps unchanged names cheap.
+    cursor.execute("""
+        INSERT INTO inventory (item_id, name, category, sub_category, count_on_hand, unit_cost, bundle_count)
+        SELECT item_id, name, category, sub_category, count_on_hand, unit_cost, bundle_count
+        FROM temp.inventory_import_staging WHERE item_id IS NOT NULL ORDER BY row_num
+        ON CONFLICT(item_id) DO UPDATE SET
+            name = excluded.name, category = excluded.category, sub_category = excluded.sub_category,
+            count_on_hand = excluded.count_on_hand, unit_cost = excluded.unit_cost, bundle_count = excluded.bundle_count
+    """)
+    # No ID -> Insert New (No Name Match Overwrite)
+    cursor.execute("""
+        INSERT INTO inventory (name, category, sub_category, count_on_hand, unit_cost, bundle_count)
+        SELECT name, category, sub_category, count_on_hand, unit_cost, bundle_count
+        FROM temp.inventory_import_staging WHERE item_id IS NULL ORDER BY row_num
+    """)
+    cursor.execute("DELETE FROM temp.inventory_import_staging")
+    return len(staged)
+
+def process_bulk_inventory_upload(
+    file_obj,
+    chunk_size: Optional[int] = None,
+    progress: Optional[ImportProgressCallback] = None,
+    resume: bool = True
+) -> Tuple[int, List[str]]:
+    """
+    Reads a CSV file and updates inventory. Rows with an item_id are upserted by ID
+    (re-created if missing, e.g. after clear_inventory); rows without one are inserted as new items.
+    Cleaning is column-wise and the load is a staging table plus two set-based statements.
+
+    Args:
+        file_obj: The uploaded CSV (file-like).
+        chunk_size (int, optional): Stream the file and commit every `chunk_size` rows.
+            An interrupted streaming import resumes from its last committed chunk when
+            the same file is uploaded again (unless resume=False).
+        progress (callable, optional): progress(rows_done, total_rows).
+
+    Returns:
+        Tuple[int, List[str]]: (rows loaded in this run, per-row errors).
+    """
+    try:
+        chunks, import_key, total_rows, rows_done = _open_csv_import(file_obj, "inventory", chunk_size, resume)
+    except Exception as e:
+        logger.error(f"process_bulk_inventory_upload: {e}")
+        return 0, [str(e)]
+
+    loaded = 0
+    errors = []
+    if progress:
+        progress(rows_done, total_rows)
+
     conn = get_connection()
     try:
-        # Puts the DB in 'write mode' immediately, preventing others from jumping the line
-        conn.execute("BEGIN IMMEDIATE") 
         cursor = conn.cursor()
-        updated_count = 0
-        errors = []
-        df = pd.read_csv(file_obj)
-        # Normalize headers to lowercase to be user-friendly
-        df.columns = [c.lower().strip() for c in df.columns]
-        
-        if 'name' not in df.columns or 'count_on_hand' not in df.columns:
-            return 0, ["CSV missing required columns: 'name', 'count_on_hand'"]
-            
-        for index, row in df.iterrows():
-            try:
-                name = str(row['name']).strip()
-                
-                # Robust casting for Quantity
-                try:
-                    qty = int(float(row['count_on_hand']))
-                except (ValueError, TypeError):
-                    qty = 0
-                
-                # Optional fields (use existing defaults if missing)
-                cat = row.get('category', None)
-                if pd.isna(cat): cat = None
-                
-                sub = row.get('sub_category', None)
-                if pd.isna(sub): sub = None
-                
-                # Robust casting for Cost (handle '$' and ',')
-                raw_cost = row.get('unit_cost', 0.0)
-                try:
-                    cost = float(str(raw_cost).replace('$', '').replace(',', '')) if pd.notna(raw_cost) else 0.0
-                except (ValueError, TypeError):
-                    cost = 0.0
-                
-                # Robust casting for Bundle Count
-                raw_bundle = row.get('bundle_count', 1)
-                try:
-                    bundle = int(float(raw_bundle)) if pd.notna(raw_bundle) else 1
-                except (ValueError, TypeError):
-                    bundle = 1
-
-                i_id = row.get('item_id', None)
-                if pd.isna(i_id): i_id = None
-                else:
-                    try:
-                        i_id = int(float(i_id))
-                    except (ValueError, TypeError):
-                        i_id = None
-                
-                # LOGIC: ID Match -> Update; No ID -> Insert New (No Name Match Overwrite)
-                if i_id:
-                    cursor.execute("""
-                        UPDATE inventory 
-                        SET name=?, category=?, sub_category=?, count_on_hand=?, unit_cost=?, bundle_count=?
-                        WHERE item_id=?
-                    """, (name, cat, sub, qty, cost, bundle, i_id))
-                    
-                    # If ID provided but row doesn't exist (e.g. after clear_inventory), Insert with ID
-                    if cursor.rowcount == 0:
-                        cursor.execute("""
-                            INSERT INTO inventory (item_id, name, category, sub_category, count_on_hand, unit_cost, bundle_count)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, (i_id, name, cat, sub, qty, cost, bundle))
-                else:
-                    cursor.execute("""
-                        INSERT INTO inventory (name, category, sub_category, count_on_hand, unit_cost, bundle_count)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (name, cat, sub, qty, cost, bundle))
-                
-                updated_count += 1
-                
-            except Exception as row_e:
-                errors.append(f"Row {index + 2} Error: {row_e}")
-                
-        conn.commit()
-        return updated_count, errors
+        for start, df in chunks:
+            if 'name' not in df.columns or 'count_on_hand' not in df.columns:
+                return 0, ["CSV missing required columns: 'name', 'count_on_hand'"]
+
+            clean, chunk_errors = _clean_inventory_frame(df, first_row=start)
+            errors.extend(chunk_errors)
+
+            # Puts the DB in 'write mode' immediately, preventing others from jumping the line
+            conn.execute("BEGIN IMMEDIATE")
+            staged = _upsert_inventory_rows(cursor, clean) if not clean.empty else 0
+            rows_done = start + len(df)
+            if import_key:
+                _save_import_checkpoint(cursor, import_key, "inventory", rows_done, total_rows)
+            conn.commit()
+            loaded += staged
+            if progress:
+                progress(rows_done, total_rows)
+
+        if import_key:
+            _clear_import_checkpoint(cursor, import_key)
+            conn.commit()
+        return loaded, errors
     except Exception as e:
         logger.error(f"process_bulk_inventory_upload: {e}")
         conn.rollback()
-        return 0, [str(e)]
+        return loaded, errors + [str(e)]
     finally:
         conn.close()
 
@@ -234,6 +923,8 @@ def clear_products() -> bool:
         cursor.execute("DELETE FROM production_goals")
         cursor.execute("DELETE FROM recipes")
         cursor.execute("DELETE FROM products")
+        cursor.execute("DELETE FROM image_renditions")
+        cursor.execute("DELETE FROM product_images")
         conn.commit()
         logger.info("clear_products: All products, recipes, goals, and logs deleted.")
         return True
@@ -273,217 +964,375 @@ def export_products_csv() -> str:
     finally:
         conn.close()
 
-def _get_local_image_bytes(product_name: str) -> Optional[bytes]:
-    """Helper to find and process a local image for a product from images/recipes."""
-    image_dir = os.path.join("images", "recipes")
-    if not os.path.exists(image_dir):
-        return None
-        
+# Extensions picked up from images/recipes, in order of preference when a name has several
+RECIPE_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG"]
+
+def _scan_recipe_images(image_dir: str = os.path.join("images", "recipes")) -> dict:
+    """Lists images/recipes once. Returns {file stem: path}, keeping the preferred extension per stem."""
+    if not os.path.isdir(image_dir):
+        return {}
+    rank = {ext: i for i, ext in enumerate(RECIPE_IMAGE_EXTENSIONS)}
+    index = {}
+    for entry in sorted(os.scandir(image_dir), key=lambda e: e.name):
+        stem, ext = os.path.splitext(entry.name)
+        if ext not in rank or not entry.is_file():
+            continue
+        current = index.get(stem)
+        if current is None or rank[ext] < rank[os.path.splitext(current)[1]]:
+            index[stem] = entry.path
+    return index
+
+def _find_local_image(product_name: str, image_index: dict) -> Optional[str]:
+    """Path of the images/recipes file for a product, trying the usual spellings of its name."""
     candidates = [
         product_name,
         product_name.replace(" ", "_"),
         product_name.lower(),
         product_name.lower().replace(" ", "_")
     ]
-    
     for name in candidates:
-        for ext in [".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG"]:
-            path = os.path.join(image_dir, name + ext)
-            if os.path.exists(path):
-                try:
-                    return utils.process_image(path)
-                except Exception as e:
-                    logger.warning(f"Failed to process image {path}: {e}")
+        if name in image_index:
+            return image_index[name]
     return None
 
-def process_bulk_recipe_upload(file_obj) -> Tuple[int, List[str]]:
-    """Imports products/recipes. Format: Product, Price, Type, Ingredient, Qty."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_count = 0
-    errors = []
-    
-    # Track BaseName -> GroupID for this batch to link variants (e.g. Std/Dlx)
-    batch_groups = {}
+class _RecipeImportState:
+    """
+    Lookups and pending writes for one recipe import.
+    Inventory ids/names and product rows are (re)loaded by load() once per chunk, inside that
+    chunk's write transaction, so a product costs no lookup queries and the lookups cannot go
+    stale while the chunk is written. The image directory is scanned once per import.
+    Products are inserted as they are queued (SQLite assigns the ids); archives and recipe
+    rows are written with executemany in flush().
+    """
+
+    def __init__(self):
+        self.image_index = _scan_recipe_images()
+        # product name -> utils.PreparedImage, filled per chunk by prepare_images()
+        self.images = {}
+        # Track BaseName -> GroupID for this batch to link variants (e.g. Std/Dlx)
+        self.batch_groups = {}
+        self.archived = []
+        self.new_recipes = []
+
+    def load(self, cursor: sqlite3.Cursor) -> None:
+        """Reads the inventory and product lookups. Call after BEGIN IMMEDIATE, before queuing the chunk."""
+        self.item_ids = set()
+        # Case-folded name -> item_id (lowest id wins on duplicate names)
+        self.item_names = {}
+        for item_id, name in cursor.execute("SELECT item_id, name FROM inventory ORDER BY item_id"):
+            self.item_ids.add(item_id)
+            if name is not None:
+                self.item_names.setdefault(name.casefold(), item_id)
+
+        # product_id -> (image_hash, stock_on_hand, variant_group_id, variant_type, category)
+        self.products = {}
+        # product_id -> (lower-cased display_name, variant_group_id) for active products
+        self.active = {}
+        # (variant_group_id, variant_type) -> product_id of the active version
+        self.versions = {}
+        for row in cursor.execute("""
+            SELECT product_id, image_hash, stock_on_hand, variant_group_id, variant_type, category, display_name, active
+            FROM products ORDER BY product_id
+        """):
+            self.products[row[0]] = row[1:6]
+            if row[7]:
+                self.active[row[0]] = ((row[6] or "").lower(), row[3])
+                if row[3]:
+                    self.versions[(row[3], row[4] or 'STD')] = row[0]
+
+    def prepare_images(self, product_names) -> None:
+        """Processes the local images of a chunk's products on the image pool, before any writes."""
+        paths = {}
+        for name in product_names:
+            path = _find_local_image(name, self.image_index) if isinstance(name, str) else None
+            if path:
+                paths[name] = path
+        unique = list(dict.fromkeys(paths.values()))
+        prepared = dict(zip(unique, utils.prepare_images(unique)))
+        for name, path in paths.items():
+            result = prepared[path]
+            if result.error:
+                logger.warning(f"Failed to process image {path}: {result.error}")
+            else:
+                self.images[name] = result
 
+    def find_item(self, item_id_val, ing_name: str) -> Optional[int]:
+        # Strategy 1: Lookup by ID (Preferred)
+        if pd.notna(item_id_val):
+            try:
+                tid = int(float(item_id_val))
+                if tid in self.item_ids:
+                    return tid
+            except (ValueError, TypeError): pass
+        # Strategy 2: Lookup by Name (Fallback)
+        if ing_name:
+            return self.item_names.get(ing_name.casefold())
+        return None
+
+    def find_family(self, base_name: str) -> Optional[str]:
+        """Group of the first active product whose name starts with base_name (case-insensitive)."""
+        prefix = base_name.lower()
+        for name, group_id in self.active.values():
+            if name.startswith(prefix):
+                return group_id
+        return None
+
+    def current_version(self, product_id: int) -> int:
+        """
+        The active version of a product. A file exported before someone else edited the product
+        still names the now-archived id; its update then applies to the version that replaced it.
+        """
+        if product_id in self.active:
+            return product_id
+        _, _, group_id, variant_type, _ = self.products[product_id]
+        return self.versions.get((group_id, variant_type or 'STD'), product_id)
+
+    def add_product(self, cursor: sqlite3.Cursor, product_id: Optional[int], row: tuple) -> int:
+        """
+        Inserts a product and returns its id (assigned by SQLite unless product_id is given).
+        row = (display_name, selling_price, image_hash, stock_on_hand, category, note, variant_group_id, variant_type).
+        """
+        cursor.execute("""
+            INSERT INTO products (product_id, display_name, selling_price, image_hash, active, stock_on_hand, category, note, variant_group_id, variant_type)
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+        """, (product_id,) + row)
+        product_id = cursor.lastrowid
+        self.products[product_id] = (row[2], row[3], row[6], row[7], row[4])
+        self.active[product_id] = (row[0].lower(), row[6])
+        if row[6]:
+            self.versions[(row[6], row[7] or 'STD')] = product_id
+        return product_id
+
+    def archive_product(self, product_id: int) -> None:
+        self.active.pop(product_id, None)
+        self.archived.append((product_id,))
+
+    def flush(self, cursor: sqlite3.Cursor) -> None:
+        """Writes queued archives and recipes in two executemany calls."""
+        cursor.executemany("UPDATE products SET active = 0 WHERE product_id = ?", self.archived)
+        cursor.executemany("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value, note) VALUES (?, ?, ?, ?, ?, ?)",
+                           self.new_recipes)
+        self.archived, self.new_recipes = [], []
+
+def _import_recipe_group(cursor: sqlite3.Cursor, product_name: str, group: pd.DataFrame, state: _RecipeImportState) -> Optional[str]:
+    """
+    Queues one product (or a new version of it) and its recipe from all of its CSV rows.
+    Returns an error message if the product was skipped, None once it is queued.
+    """
+    # 1. Product Details (from first row)
+    first_row = group.iloc[0]
+
+    # Check for Product ID
+    p_id_val = first_row.get('product_id')
+    target_p_id = None
+    if pd.notna(p_id_val):
+        try:
+            target_p_id = int(float(p_id_val))
+        except (ValueError, TypeError): pass
+
+    raw_price = first_row.get('price', 0.0)
     try:
-        df = pd.read_csv(file_obj)
-        df.columns = [c.lower().strip() for c in df.columns]
-        
-        required = ['product', 'qty']
-        if not all(col in df.columns for col in required):
-            return 0, [f"CSV missing required columns: {required}"]
-            
+        price = float(str(raw_price).replace('$', '').replace(',', '')) if pd.notna(raw_price) else 0.0
+    except (ValueError, TypeError):
+        price = 0.0
+
+    # This handles your "One-Off" vs "Standard" logic
+    cat = first_row.get('type', None) 
+    if pd.isna(cat): cat = None
+
+    # Product Note
+    prod_note = str(first_row.get('product note', '')).strip() or None
+
+    # 2. Build Recipe List
+    recipe_items = []
+    for row in group.to_dict('records'):
+        try:
+            qty = int(float(row['qty']))
+        except (ValueError, TypeError):
+            qty = 0
+
+        if qty <= 0: continue
+
+        req_type = 'Specific'
+        req_val = None
+        note = str(row.get('note', '')).strip() or None
+        ing_name = str(row.get('ingredient', '')).strip()
+
+        item_id = state.find_item(row.get('item_id'), ing_name)
+
+        # Strategy 3: Generic Detection
+        # FIXED: Logic is now looser. If ID not found, treat as Category.
+        if item_id is None:
+            req_type = 'Category'
+            # Use Name (remove "Any " prefix if user added it manually)
+            if ing_name.lower().startswith("any "):
+                 req_val = ing_name[4:].strip()
+            else:
+                 req_val = ing_name.strip()
+
+        recipe_items.append((item_id, qty, req_type, req_val, note))
+
+    if not recipe_items:
+        return f"Skipped '{product_name}': No valid ingredients."
+
+    # 3. Create or Update Product based on ID
+    prod_exists = bool(target_p_id) and target_p_id in state.products
+
+    # Local image (already processed by state.prepare_images)
+    image = state.images.pop(product_name, None)
+    new_image_bytes = image.image_bytes if image else None
+    new_renditions = image.renditions if image else None
+
+    if prod_exists:
+        # UPDATE (Immutable Pattern)
+        target_p_id = state.current_version(target_p_id)
+        # 1. Existing data to preserve
+        old_img_hash, old_stock, old_group_id, old_variant_type, old_category = state.products[target_p_id]
+        old_stock = old_stock or 0
+        old_group_id = old_group_id or str(uuid.uuid4())
+        old_variant_type = old_variant_type or 'STD'
+
+        # Determine final image/cat
+        final_img_hash = _store_image(cursor, new_image_bytes, new_renditions) if new_image_bytes else old_img_hash
+        final_cat = cat if cat is not None else old_category
+
+        # 2. Create New, 3. Archive Old (only once the new version exists)
+        new_id = state.add_product(cursor, None, (product_name, price, final_img_hash, old_stock, final_cat, prod_note, old_group_id, old_variant_type))
+        state.archive_product(target_p_id)
+    else:
+        # INSERT (New Product)
+        final_cat = cat if cat is not None else 'Standard'
+
+        # --- FIXED VARIANT LOGIC ---
+        words = product_name.split()
+        last_word = words[-1].lower() if words else ""
+        variant_type = "STD"
+        suffix_map = {"standard": "STD", "deluxe": "DLX", "premium": "PRM"}
+
+        if last_word in suffix_map:
+            variant_type = suffix_map[last_word]
+            # Base Name = "Rose Dozen Red" (Strip "Standard")
+            base_name = " ".join(words[:-1]).strip()
+        else:
+            base_name = product_name.strip()
+
+        # Grouping Strategy:
+        # 1. Check Batch: Did we just make a sibling?
+        if base_name in state.batch_groups:
+            new_group_id = state.batch_groups[base_name]
+        else:
+            # 2. Check Database: Does a sibling exist from a previous upload?
+            # 3. Otherwise a New Family
+            new_group_id = state.find_family(base_name) or str(uuid.uuid4())
+            # Register in batch
+            state.batch_groups[base_name] = new_group_id
+
+        new_img_hash = _store_image(cursor, new_image_bytes, new_renditions)
+        new_id = state.add_product(cursor, target_p_id or None, (product_name, price, new_img_hash, 0, final_cat, prod_note, new_group_id, variant_type))
+
+    # 4. Recipes
+    state.new_recipes.extend((new_id, item_id, q, r_type, r_val, note) for item_id, q, r_type, r_val, note in recipe_items)
+    return None
+
+def process_bulk_recipe_upload(
+    file_obj,
+    chunk_size: Optional[int] = None,
+    progress: Optional[ImportProgressCallback] = None,
+    resume: bool = True
+) -> Tuple[int, List[str]]:
+    """
+    Imports products/recipes. Format: Product, Price, Type, Ingredient, Qty.
+
+    With `chunk_size` the file is streamed and committed a chunk at a time (see
+    process_bulk_inventory_upload). A product is only written once all of its rows are read,
+    so its rows must be contiguous, as in export_products_csv(); a product whose rows reappear
+    later in a streamed file is reported instead of overwriting the recipe written earlier.
+    """
+    try:
+        chunks, import_key, total_rows, rows_done = _open_csv_import(file_obj, "recipes", chunk_size, resume)
+    except Exception as e:
+        logger.error(f"process_bulk_recipe_upload: {e}")
+        return 0, [str(e)]
+
+    created_count = 0
+    committed_count = 0
+    errors = []
+    # Products already written by this run (streaming only)
+    seen_products = set()
+    streaming = import_key is not None
+    if progress:
+        progress(rows_done, total_rows)
+
+    def import_rows(cursor, state, rows):
+        """Imports one chunk inside a write transaction that the caller commits."""
+        nonlocal created_count
         # Group by Product Name so we process the whole recipe at once
-        grouped = df.groupby('product')
-        
-        for product_name, group in grouped:
-            try:
-                # 1. Product Details (from first row)
-                first_row = group.iloc[0]
-                
-                # Check for Product ID
-                p_id_val = first_row.get('product_id')
-                target_p_id = None
-                if pd.notna(p_id_val):
-                    try:
-                        target_p_id = int(float(p_id_val))
-                    except (ValueError, TypeError): pass
-
-                raw_price = first_row.get('price', 0.0)
-                try:
-                    price = float(str(raw_price).replace('$', '').replace(',', '')) if pd.notna(raw_price) else 0.0
-                except (ValueError, TypeError):
-                    price = 0.0
-
-                # This handles your "One-Off" vs "Standard" logic
-                cat = first_row.get('type', None) 
-                if pd.isna(cat): cat = None
-                
-                # Product Note
-                prod_note = str(first_row.get('product note', '')).strip() or None
-                
-                # 2. Build Recipe List
-                recipe_items = []
-                for _, row in group.iterrows():
-                    try:
-                        qty = int(float(row['qty']))
-                    except (ValueError, TypeError):
-                        qty = 0
-                        
-                    if qty <= 0: continue
-                    
-                    item_id = None
-                    req_type = 'Specific'
-                    req_val = None
-                    note = str(row.get('note', '')).strip() or None
-                    ing_name = str(row.get('ingredient', '')).strip()
-                    
-                    # Strategy 1: Lookup by ID (Preferred)
-                    if 'item_id' in row and pd.notna(row['item_id']):
-                        try:
-                            tid = int(float(row['item_id']))
-                            cursor.execute("SELECT item_id FROM inventory WHERE item_id = ?", (tid,))
-                            res = cursor.fetchone()
-                            if res: item_id = res[0]
-                        except (ValueError, TypeError): pass
-                    
-                    # Strategy 2: Lookup by Name (Fallback)
-                    if item_id is None and ing_name:
-                        cursor.execute("SELECT item_id FROM inventory WHERE name = ? COLLATE NOCASE", (ing_name,))
-                        res = cursor.fetchone()
-                        if res: item_id = res[0]
-                    
-                    # Strategy 3: Generic Detection
-                    # FIXED: Logic is now looser. If ID not found, treat as Category.
-                    if item_id is None:
-                        req_type = 'Category'
-                        # Use Name (remove "Any " prefix if user added it manually)
-                        if ing_name.lower().startswith("any "):
-                             req_val = ing_name[4:].strip()
-                        else:
-                             req_val = ing_name.strip()
-                    
-                    recipe_items.append((item_id, qty, req_type, req_val, note))
-                
-                if not recipe_items:
-                    errors.append(f"Skipped '{product_name}': No valid ingredients.")
+        groups = list(rows.groupby('product', sort=not streaming))
+        # Image work runs before the write lock is taken, so other sessions are not blocked by it
+        state.prepare_images([name for name, _ in groups if name not in seen_products])
+
+        # Puts the DB in 'write mode' immediately; lookups read from here on cannot go stale
+        cursor.execute("BEGIN IMMEDIATE")
+        state.load(cursor)
+        for product_name, group in groups:
+            if streaming:
+                if product_name in seen_products:
+                    errors.append(f"Skipped '{product_name}': its rows are split across the file. Keep each product's rows together.")
                     continue
-
-                # 3. Create or Update Product based on ID
-                prod_exists = False
-                if target_p_id:
-                    cursor.execute("SELECT 1 FROM products WHERE product_id = ?", (target_p_id,))
-                    if cursor.fetchone():
-                        prod_exists = True
-                
-                # Try to find local image
-                new_image_bytes = _get_local_image_bytes(product_name)
-                
-                if prod_exists:
-                    # UPDATE (Immutable Pattern)
-                    # 1. Fetch existing data to preserve
-                    cursor.execute("SELECT image_data, stock_on_hand, variant_group_id, variant_type, category FROM products WHERE product_id = ?", (target_p_id,))
-                    existing_data = cursor.fetchone()
-                    old_img = existing_data[0] if existing_data else None
-                    old_stock = existing_data[1] if existing_data else 0
-                    old_group_id = existing_data[2] if existing_data and existing_data[2] else str(uuid.uuid4())
-                    old_variant_type = existing_data[3] if existing_data and existing_data[3] else 'STD'
-                    old_category = existing_data[4] if existing_data else 'Standard'
-                    
-                    # Determine final image/cat
-                    final_img = new_image_bytes if new_image_bytes else old_img
-                    final_cat = cat if cat is not None else old_category
-                    
-                    # 2. Archive Old
-                    cursor.execute("UPDATE products SET active = 0 WHERE product_id = ?", (target_p_id,))
-                    
-                    # 3. Create New
-                    cursor.execute("INSERT INTO products (display_name, selling_price, image_data, active, stock_on_hand, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)", 
-                                   (product_name, price, final_img, old_stock, final_cat, prod_note, old_group_id, old_variant_type))
-                    new_id = cursor.lastrowid
-                    
-                    # 4. Insert Recipes
-                    for item_id, q, r_type, r_val, note in recipe_items:
-                        cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value, note) VALUES (?, ?, ?, ?, ?, ?)", (new_id, item_id, q, r_type, r_val, note))
+                seen_products.add(product_name)
+            try:
+                error = _import_recipe_group(cursor, product_name, group, state)
+                if error:
+                    errors.append(error)
                 else:
-                    # INSERT (New Product)
-                    final_cat = cat if cat is not None else 'Standard'
-
-                    # --- FIXED VARIANT LOGIC ---
-                    words = product_name.split()
-                    last_word = words[-1].lower() if words else ""
-                    variant_type = "STD"
-                    suffix_map = {"standard": "STD", "deluxe": "DLX", "premium": "PRM"}
-                    
-                    if last_word in suffix_map:
-                        variant_type = suffix_map[last_word]
-                        # Base Name = "Rose Dozen Red" (Strip "Standard")
-                        base_name = " ".join(words[:-1]).strip()
-                    else:
-                        base_name = product_name.strip()
-                    
-                    # Grouping Strategy:
-                    # 1. Check Batch: Did we just make a sibling?
-                    if base_name in batch_groups:
-                        new_group_id = batch_groups[base_name]
-                    else:
-                        # 2. Check Database: Does a sibling exist from a previous upload?
-                        # Find any active product starting with this base name
-                        cursor.execute("SELECT variant_group_id FROM products WHERE display_name LIKE ? AND active = 1 LIMIT 1", (base_name + "%",))
-                        existing_grp = cursor.fetchone()
-                        if existing_grp and existing_grp[0]:
-                            new_group_id = existing_grp[0]
-                        else:
-                            # 3. New Family
-                            new_group_id = str(uuid.uuid4())
-                        
-                        # Register in batch
-                        batch_groups[base_name] = new_group_id
-
-                    if target_p_id:
-                        cursor.execute("INSERT INTO products (product_id, display_name, selling_price, image_data, category, active, stock_on_hand, note, variant_group_id, variant_type) VALUES (?, ?, ?, ?, ?, 1, 0, ?, ?, ?)", 
-                                       (target_p_id, product_name, price, new_image_bytes, final_cat, prod_note, new_group_id, variant_type))
-                        new_id = target_p_id
-                    else:
-                        cursor.execute("INSERT INTO products (display_name, selling_price, image_data, category, active, stock_on_hand, note, variant_group_id, variant_type) VALUES (?, ?, ?, ?, 1, 0, ?, ?, ?)", 
-                                       (product_name, price, new_image_bytes, final_cat, prod_note, new_group_id, variant_type))
-                        new_id = cursor.lastrowid
-
-                    for item_id, q, r_type, r_val, note in recipe_items:
-                        cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value, note) VALUES (?, ?, ?, ?, ?, ?)", (new_id, item_id, q, r_type, r_val, note))
-                
-                created_count += 1
-                
+                    created_count += 1
             except Exception as prod_e:
                 errors.append(f"Error processing '{product_name}': {prod_e}")
-        
+        state.flush(cursor)
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        state = _RecipeImportState()
+        carry = None
+        for start, df in chunks:
+            required = ['product', 'qty']
+            if not all(col in df.columns for col in required):
+                return 0, [f"CSV missing required columns: {required}"]
+
+            if carry is not None:
+                start, df = start - len(carry), pd.concat([carry, df])
+            ready, carry = df, None
+            if streaming and not df.empty:
+                # Hold back the trailing product: its rows may continue in the next chunk
+                names = df['product']
+                differs = np.flatnonzero((names != names.iloc[-1]).to_numpy())
+                cut = differs[-1] + 1 if len(differs) else 0
+                ready, carry = df.iloc[:cut], df.iloc[cut:]
+                if carry.empty:
+                    carry = None
+
+            import_rows(cursor, state, ready)
+            rows_done = start + len(ready)
+            if streaming:
+                _save_import_checkpoint(cursor, import_key, "recipes", rows_done, total_rows)
+            conn.commit()
+            committed_count = created_count
+            if progress:
+                progress(rows_done, total_rows)
+
+        if carry is not None:
+            import_rows(cursor, state, carry)
+        if streaming:
+            _clear_import_checkpoint(cursor, import_key)
         conn.commit()
+        if progress and carry is not None:
+            progress(total_rows, total_rows)
         return created_count, errors
     except Exception as e:
         logger.error(f"process_bulk_recipe_upload: {e}")
         conn.rollback()
-        return 0, [str(e)]
+        return committed_count, errors + [str(e)]
     finally:
         conn.close()
 
@@ -506,16 +1355,17 @@ def update_product_recipe(
     cursor = conn.cursor()
     try:
         # 1. Find the current product to get its current data
-        cursor.execute("SELECT selling_price, image_data, display_name, stock_on_hand, note, variant_group_id, variant_type, category FROM products WHERE product_id = ?", (current_product_id,))
+        cursor.execute("SELECT selling_price, image_hash, display_name, stock_on_hand, note, variant_group_id, variant_type, category FROM products WHERE product_id = ?", (current_product_id,))
         res = cursor.fetchone()
         if not res:
             return False
         
-        old_price, old_image_data, old_name, current_stock, old_note, old_group_id, old_variant_type, old_category = res
+        old_price, old_image_hash, old_name, current_stock, old_note, old_group_id, old_variant_type, old_category = res
         
         # 2. Determine new values (use old ones if not provided)
         final_price = new_price if new_price is not None else old_price
-        final_image = image_bytes if image_bytes is not None else old_image_data
+        # New versions point at the same stored image unless a new one was uploaded
+        final_image_hash = _store_image(cursor, image_bytes) if image_bytes is not None else old_image_hash
         final_name = new_name.strip()
         final_note = note if note is not None else old_note
         final_category = category if category is not None else old_category
@@ -536,8 +1386,8 @@ def update_product_recipe(
         
         # 4. Create new product version
         final_stock = current_stock if rollover_stock else 0
-        cursor.execute("INSERT INTO products (display_name, selling_price, image_data, active, stock_on_hand, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)",
-                       (final_name, final_price, final_image, final_stock, final_category, final_note, final_group_id, old_variant_type or 'STD'))
+        cursor.execute("INSERT INTO products (display_name, selling_price, image_hash, active, stock_on_hand, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)",
+                       (final_name, final_price, final_image_hash, final_stock, final_category, final_note, final_group_id, old_variant_type or 'STD'))
         new_p_id = cursor.lastrowid
         
         # 5. Insert new recipe items
@@ -609,36 +1459,32 @@ def undo_production(goal_id: int) -> bool:
         goal_p_id = res[0] # Current Goal Product ID (for Stock returns)
         
         # Find latest log entry SPECIFICALLY for this goal
-        cursor.execute("SELECT log_id, action_type, product_id FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT 1", (goal_id,))
+        cursor.execute("SELECT log_id, action_type, product_id, qty FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT 1", (goal_id,))
         log_res = cursor.fetchone()
         
         if log_res:
-            l_id, action_type, log_p_id = log_res
+            l_id, action_type, log_p_id, log_qty = log_res
             logger.info(f"undo_production: Reverting production for goal_id {goal_id}, log_id {l_id}")
             
             # If this was a PACK action (Cooler -> Order), we must return to Cooler, not Raw Inventory
             if action_type == 'PACK':
-                cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (l_id,))
+                _pop_log_unit(cursor, l_id, log_qty)
                 cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled - 1 WHERE goal_id = ?", (goal_id,))
                 # Return to the CURRENT Goal's product stock (handles migration correctly)
                 cursor.execute("UPDATE products SET stock_on_hand = stock_on_hand + 1 WHERE product_id = ?", (goal_p_id,))
                 conn.commit()
                 return True
             
-            # Delete the log entry
-            cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (l_id,))
+            # Add back to Inventory exactly what this log deducted (snapshot)
+            # CRITICAL: The legacy fallback uses log_p_id (Original Version) to restore correct ingredients
+            _restore_log_unit(cursor, l_id, log_p_id)
+            
+            # Remove one unit from the log entry (after the restore reads its snapshot)
+            _pop_log_unit(cursor, l_id, log_qty)
             
             # Decrement the goal
             cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled - 1 WHERE goal_id = ?", (goal_id,))
             
-            # Add back to Inventory (Bill of Materials) 
-            # CRITICAL: Use log_p_id (Original Version) to restore correct ingredients
-            cursor.execute("SELECT item_id, qty_needed FROM recipes WHERE product_id = ?", (log_p_id,))
-            recipe_items = cursor.fetchall()
-            
-            for i_id, qty in recipe_items:
-                cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand + ? WHERE item_id = ?", (qty, i_id))
-            
             conn.commit()
             return True
         return False
@@ -685,9 +1531,8 @@ def fulfill_goal(goal_id: int, qty: int = 1) -> int:
         # 2. Update Goal (Mark as Fulfilled)
         cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled + ? WHERE goal_id = ?", (actual_qty, goal_id))
         
-        # 3. Log it (Multiple entries for granular undo)
-        logs = [(goal_id, p_id, 'PACK') for _ in range(actual_qty)]
-        cursor.executemany("INSERT INTO production_logs (goal_id, product_id, action_type) VALUES (?, ?, ?)", logs)
+        # 3. Log it (One batch row; undo still reverts one unit at a time)
+        cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type, qty) VALUES (?, ?, 'PACK', ?)", (goal_id, p_id, actual_qty))
         
         # 4. Auto-Archive One-Offs if complete
         if category == 'One-Off':
@@ -727,14 +1572,14 @@ def undo_fulfillment(goal_id: int) -> bool:
         p_id = res[0]
         
         # Find latest log for this goal
-        cursor.execute("SELECT log_id FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT 1", (goal_id,))
+        cursor.execute("SELECT log_id, qty FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT 1", (goal_id,))
         log_res = cursor.fetchone()
         
         if not log_res: return False
-        log_id = log_res[0]
+        log_id, log_qty = log_res
         
-        # 1. Delete Log
-        cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (log_id,))
+        # 1. Remove one unit from the Log
+        _pop_log_unit(cursor, log_id, log_qty)
         
         # 2. Revert Goal
         cursor.execute("UPDATE production_goals SET qty_fulfilled = qty_fulfilled - 1 WHERE goal_id = ?", (goal_id,))
@@ -752,11 +1597,23 @@ def undo_fulfillment(goal_id: int) -> bool:
         conn.close()
 
 def get_all_recipes() -> pd.DataFrame:
-    """Fetches all active product recipes with ingredient details."""
+    """
+    Fetches all active product recipes with ingredient details.
+    Served from the read cache until the data changes; callers get their own copy.
+    """
+    try:
+        df = _cached_read("get_all_recipes", _load_all_recipes)
+    except Exception as e:
+        # Failures are not cached; the next call retries the query
+        logger.error(f"get_all_recipes: Error fetching recipes: {e}")
+        return pd.DataFrame()
+    return df.copy()
+
+def _load_all_recipes() -> pd.DataFrame:
     conn = get_connection()
     try:
         query = """
-        SELECT p.product_id, p.display_name as Product, p.selling_price as Price, p.active, p.stock_on_hand, p.category, p.note as ProductNote, p.variant_type,
+        SELECT p.product_id, p.display_name as Product, p.selling_price as Price, p.active, p.stock_on_hand, p.category, p.note as ProductNote, p.variant_type, p.image_hash,
                r.item_id, 
                COALESCE(i.name, 'Any ' || r.requirement_value, 'Unknown Item') as Ingredient, 
                r.qty_needed as Qty,
@@ -766,14 +1623,107 @@ def get_all_recipes() -> pd.DataFrame:
         LEFT JOIN inventory i ON r.item_id = i.item_id
         ORDER BY p.display_name ASC
         """
-        df = pd.read_sql_query(query, conn)
-        return df
+        return pd.read_sql_query(query, conn)
+    finally:
+        conn.close()
+
+# ==========================================
+# 📖 RECIPE BOOK PAGES (Keyset Pagination)
+# ==========================================
+# The Recipe Book reads one page at a time instead of get_all_recipes(). Pages are keyed on
+# (display_name, product_id) of the last row shown, so every page is one index range seek
+# (idx_products_active_name_id) and costs the same however many archived versions pile up.
+
+# A page position: (display_name, product_id) of the last product on the previous page
+RecipePageCursor = Tuple[str, int]
+
+_RECIPE_PAGE_PRODUCT_COLUMNS = """
+    product_id, display_name as Product, selling_price as Price, active, stock_on_hand, category,
+    note as ProductNote, variant_type, image_hash
+"""
+
+def get_recipe_counts() -> dict:
+    """{'active': n, 'archived': m} product counts for the Recipe Book page controls."""
+    conn = get_connection()
+    try:
+        counts = dict(conn.execute("SELECT active, COUNT(*) FROM products GROUP BY active").fetchall())
+        return {"active": counts.get(1, 0), "archived": counts.get(0, 0)}
+    except sqlite3.Error as e:
+        logger.error(f"get_recipe_counts: {e}")
+        return {"active": 0, "archived": 0}
+    finally:
+        conn.close()
+
+def _recipe_page_ingredients(conn: sqlite3.Connection, product_ids: List[int]) -> pd.DataFrame:
+    """Ingredient rows (same labels as get_all_recipes) for just the given products."""
+    placeholders = ",".join("?" * len(product_ids))
+    query = f"""
+        SELECT r.product_id, r.item_id,
+               COALESCE(i.name, 'Any ' || r.requirement_value, 'Unknown Item') as Ingredient,
+               r.qty_needed as Qty, r.note as Note
+        FROM recipes r
+        LEFT JOIN inventory i ON r.item_id = i.item_id
+        WHERE r.product_id IN ({placeholders})
+        ORDER BY r.product_id, r.rowid
+    """
+    return pd.read_sql_query(query, conn, params=tuple(product_ids))
+
+def get_recipe_page(active: bool, limit: int = 10, after: Optional[RecipePageCursor] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    One Recipe Book page in name order.
+
+    Args:
+        active (bool): Active (True) or archived (False) products.
+        limit (int): Products per page.
+        after (tuple, optional): Cursor of the previous page's last product (see recipe_page_cursor); None for page 1.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (products, their ingredients). Empty frames on error.
+    """
+    conn = get_connection()
+    try:
+        where = "active = ?"
+        params = [1 if active else 0]
+        if after is not None:
+            where += " AND (display_name, product_id) > (?, ?)"
+            params += [after[0], int(after[1])]
+        products = pd.read_sql_query(
+            f"SELECT {_RECIPE_PAGE_PRODUCT_COLUMNS} FROM products WHERE {where} ORDER BY display_name, product_id LIMIT ?",
+            conn, params=tuple(params + [int(limit)]))
+        ingredients = _recipe_page_ingredients(conn, products['product_id'].tolist()) if not products.empty else pd.DataFrame()
+        return products, ingredients
     except Exception as e:
-        logger.error(f"get_all_recipes: Error fetching recipes: {e}")
-        return pd.DataFrame()
+        logger.error(f"get_recipe_page: {e}")
+        return pd.DataFrame(), pd.DataFrame()
+    finally:
+        conn.close()
+
+def get_recipe_products(product_ids: List[int]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Products (kept in the given order, e.g. search rank) and their ingredients, for one page of search results."""
+    if not product_ids:
+        return pd.DataFrame(), pd.DataFrame()
+    conn = get_connection()
+    try:
+        placeholders = ",".join("?" * len(product_ids))
+        products = pd.read_sql_query(
+            f"SELECT {_RECIPE_PAGE_PRODUCT_COLUMNS} FROM products WHERE product_id IN ({placeholders})",
+            conn, params=tuple(product_ids))
+        order = {pid: i for i, pid in enumerate(product_ids)}
+        products = products.iloc[products['product_id'].map(order).to_numpy().argsort(kind="stable")].reset_index(drop=True)
+        return products, _recipe_page_ingredients(conn, product_ids)
+    except Exception as e:
+        logger.error(f"get_recipe_products: {e}")
+        return pd.DataFrame(), pd.DataFrame()
     finally:
         conn.close()
 
+def recipe_page_cursor(products: pd.DataFrame) -> Optional[RecipePageCursor]:
+    """Cursor that continues after the last product of a page (None for an empty page)."""
+    if products.empty:
+        return None
+    last = products.iloc[-1]
+    return (last['Product'], int(last['product_id']))
+
 def get_forecast_initial_data(start_date, end_date) -> pd.DataFrame:
     """Fetches all active products + archived ones with goals, aggregating expected qty."""
     conn = get_connection()
@@ -797,100 +1747,157 @@ def get_forecast_initial_data(start_date, end_date) -> pd.DataFrame:
     finally:
         conn.close()
 
-def process_clipboard_update(text_data: str) -> Tuple[List[str], List[str]]:
-    """Parses lines like 'Rose 50' or 'Vase, 10' to update inventory counts."""
+class ClipboardLine(NamedTuple):
+    """
+    Outcome of one pasted line. status: "updated", "skipped" (ID line without a count), "unknown",
+    "invalid", or "error" (the write failed, so nothing was saved - every line then carries the message).
+    """
+    line_no: int
+    text: str
+    status: str
+    item_id: Optional[int]
+    name: Optional[str]
+    new_count: Optional[int]
+    message: str
+
+def _parse_clipboard_line(line: str) -> dict:
+    """
+    Parses one non-empty line without touching the database.
+    Returns {"kind": "id", item_id, count, bundle_count, loss} | {"kind": "name", name, qty} | {"kind": "invalid", message}.
+    """
+    # Strategy 0: ID-based Update (Format: ID, Name..., bundle count X, count= Y, loss= Z)
+    if line[0].isdigit() and "count=" in line:
+        try:
+            parts = [p.strip() for p in line.split(',')]
+            item_id = int(parts[0])
+
+            bundle_count = 1
+            count_val = None
+            loss_val = 0
+
+            for part in parts:
+                lower = part.lower()
+                if "bundle_count=" in lower:
+                    val = lower.split("bundle_count=")[1].strip()
+                    if val: bundle_count = int(val)
+                elif "count=" in lower:
+                    val = lower.split("count=")[1].strip()
+                    if val: count_val = int(val)
+                elif "loss=" in lower:
+                    val = lower.split("loss=")[1].strip()
+                    if val: loss_val = int(val)
+            return {"kind": "id", "item_id": item_id, "count": count_val, "bundle_count": bundle_count, "loss": loss_val}
+        except Exception as e:
+            return {"kind": "invalid", "message": f"Error parsing ID line '{line}': {e}"}
+
+    name = None
+    qty = None
+
+    # Strategy 1: Comma Separated (New Format: Name, Sub-Cat, Qty)
+    if ',' in line:
+        parts = [p.strip() for p in line.split(',')]
+        # We expect at least Name and Qty (e.g. "Name, Qty" or "Name, Sub, Qty")
+        if len(parts) >= 2 and parts[-1].isdigit():
+            name = parts[0]
+            qty = int(parts[-1])
+
+    # Strategy 2: Whitespace Separated (Old Format: Name Qty)
+    if name is None:
+        parts = line.rsplit(None, 1)
+        if len(parts) == 2 and parts[1].isdigit():
+            name = parts[0].strip().rstrip(',')
+            qty = int(parts[1])
+
+    if name and qty is not None:
+        return {"kind": "name", "name": name, "qty": qty}
+    return {"kind": "invalid", "message": f"Invalid format: {line}"}
+
+def apply_clipboard_update(text_data: str) -> List[ClipboardLine]:
+    """
+    Clipboard Protocol engine. Parses every line first, resolves IDs and names against one
+    preloaded inventory lookup, then writes all counts with a single executemany in one
+    transaction. Returns one ClipboardLine per non-empty line, in paste order (later lines
+    for the same item win). If the write fails nothing is saved and every line reports the error.
+    """
+    lines = [(no, line.strip()) for no, line in enumerate(text_data.strip().split('\n'), start=1) if line.strip()]
+    if not lines:
+        return []
+
     conn = get_connection()
-    updated_items = []
-    errors = []
-    
     try:
-        cursor = conn.cursor()
-        for line in text_data.strip().split('\n'):
-            line = line.strip()
-            if not line: continue
-            
-            # Strategy 0: ID-based Update (Format: ID, Name..., bundle count X, count= Y, loss= Z)
-            if line[0].isdigit() and "count=" in line:
-                try:
-                    parts = [p.strip() for p in line.split(',')]
-                    item_id = int(parts[0])
-
-                    # make sure this item exists in inventory
-                    cursor.execute("SELECT 1 FROM inventory WHERE item_id = ?", (item_id,))
-                    if not cursor.fetchone():
-                        raise ValueError(f"Item ID {item_id} not found in inventory.")
-                    
-                    bundle_count = 1
-                    count_val = None
-                    loss_val = 0
-                    
-                    for part in parts:
-                        lower = part.lower()
-                        if "bundle_count=" in lower:
-                            val = lower.split("bundle_count=")[1].strip()
-                            if val: bundle_count = int(val)
-                        elif "count=" in lower:
-                            val = lower.split("count=")[1].strip()
-                            if val: count_val = int(val)
-                        elif "loss=" in lower:
-                            val = lower.split("loss=")[1].strip()
-                            if val: loss_val = int(val)
-                    
-                    if count_val is not None:
-                        final_count = max(0, (count_val * bundle_count) - loss_val)
-                        cursor.execute("UPDATE inventory SET count_on_hand = ? WHERE item_id = ?", (final_count, item_id))
-                        
-                        cursor.execute("SELECT name FROM inventory WHERE item_id = ?", (item_id,))
-                        res = cursor.fetchone()
-                        name = res[0] if res else f"Item {item_id}"
-                        updated_items.append(f"{name} (New Stock: {final_count})")
+        names_by_id = {}
+        # Case-insensitive name -> item_id (lowest id wins on duplicate names)
+        ids_by_name = {}
+        for item_id, name in conn.execute("SELECT item_id, name FROM inventory ORDER BY item_id"):
+            names_by_id[item_id] = name
+            if name is not None:
+                ids_by_name.setdefault(name.casefold(), item_id)
+
+        results = []
+        updates = []
+        for line_no, line in lines:
+            parsed = _parse_clipboard_line(line)
+            kind = parsed["kind"]
+
+            if kind == "invalid":
+                results.append(ClipboardLine(line_no, line, "invalid", None, None, None, parsed["message"]))
+            elif kind == "id":
+                item_id = parsed["item_id"]
+                # make sure this item exists in inventory
+                if item_id not in names_by_id:
+                    message = f"Error parsing ID line '{line}': Item ID {item_id} not found in inventory."
+                    results.append(ClipboardLine(line_no, line, "unknown", item_id, None, None, message))
                     continue
-                except Exception as e:
-                    errors.append(f"Error parsing ID line '{line}': {e}")
+                name = names_by_id[item_id] or f"Item {item_id}"
+                if parsed["count"] is None:
+                    results.append(ClipboardLine(line_no, line, "skipped", item_id, name, None, f"{name}: no count entered"))
                     continue
-
-            name = None
-            qty = None
-
-            # Strategy 1: Comma Separated (New Format: Name, Sub-Cat, Qty)
-            if ',' in line:
-                parts = [p.strip() for p in line.split(',')]
-                # We expect at least Name and Qty (e.g. "Name, Qty" or "Name, Sub, Qty")
-                if len(parts) >= 2 and parts[-1].isdigit():
-                    name = parts[0]
-                    qty = int(parts[-1])
-            
-            # Strategy 2: Whitespace Separated (Old Format: Name Qty)
-            if name is None:
-                parts = line.rsplit(None, 1)
-                if len(parts) == 2 and parts[1].isdigit():
-                    name = parts[0].strip().rstrip(',')
-                    qty = int(parts[1])
-
-            if name and qty is not None:
-                # Case-insensitive lookup to find the item
-                cursor.execute("SELECT item_id FROM inventory WHERE name = ? COLLATE NOCASE", (name,))
-                row = cursor.fetchone()
-                
-                if row:
-                    cursor.execute("UPDATE inventory SET count_on_hand = ? WHERE item_id = ?", (qty, row[0]))
-                    updated_items.append(f"{name}")
-                else:
-                    errors.append(f"Unknown: {name}")
+                final_count = max(0, (parsed["count"] * parsed["bundle_count"]) - parsed["loss"])
+                updates.append((final_count, item_id))
+                results.append(ClipboardLine(line_no, line, "updated", item_id, name, final_count, f"{name} (New Stock: {final_count})"))
             else:
-                errors.append(f"Invalid format: {line}")
-                
-        logger.info(f"process_clipboard_update: Processed batch. Updated: {len(updated_items)}, Errors: {len(errors)}")
-        conn.commit()
+                name = parsed["name"]
+                item_id = ids_by_name.get(name.casefold())
+                if item_id is None:
+                    results.append(ClipboardLine(line_no, line, "unknown", None, name, None, f"Unknown: {name}"))
+                    continue
+                updates.append((parsed["qty"], item_id))
+                results.append(ClipboardLine(line_no, line, "updated", item_id, name, parsed["qty"], f"{name}"))
+
+        if updates:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE inventory SET count_on_hand = ? WHERE item_id = ?", updates)
+            conn.commit()
+        logger.info(f"apply_clipboard_update: Processed {len(lines)} lines. Updated: {len(updates)}")
+        return results
     except Exception as e:
-        logger.error(f"process_clipboard_update: Error: {e}")
-        errors.append(f"System Error: {e}")
+        logger.error(f"apply_clipboard_update: Error: {e}")
         conn.rollback()
+        return [ClipboardLine(line_no, line, "error", None, None, None, f"System Error: {e}") for line_no, line in lines]
     finally:
         conn.close()
-        
+
+def process_clipboard_update(text_data: str) -> Tuple[List[str], List[str]]:
+    """Parses lines like 'Rose 50' or 'Vase, 10' to update inventory counts. Returns (updated, errors) messages."""
+    results = apply_clipboard_update(text_data)
+    updated_items = [r.message for r in results if r.status == "updated"]
+    errors = [r.message for r in results if r.status in ("unknown", "invalid")]
+    # A failed write reports the same system error on every line; surface it once
+    errors += list(dict.fromkeys(r.message for r in results if r.status == "error"))
     return updated_items, errors
 
+_RECIPE_INSERT_SQL = """
+    INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value, note)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+
+def _recipe_row(product_id: int, item: Union[Tuple[int, int], dict]) -> tuple:
+    """Recipe insert parameters from an (item_id, qty) tuple (old format) or a requirement dict."""
+    if isinstance(item, tuple):
+        item_id, qty = item
+        return (product_id, item_id, qty, 'Specific', None, None)
+    return (product_id, item.get('id') or item.get('item_id'), item.get('qty'), item.get('type', 'Specific'),
+            item.get('val') or item.get('value'), item.get('note'))
+
 def create_new_product(
     name: str, 
     selling_price: float, 
@@ -901,9 +1908,13 @@ def create_new_product(
     goal_qty: int = 0, 
     note: Optional[str] = None,
     variant_group_id: Optional[str] = None,
-    variant_type: str = "STD"
+    variant_type: str = "STD",
+    image_renditions: Optional[dict] = None
 ) -> bool:
-    """Creates a new product and its associated recipe in a single transaction."""
+    """
+    Creates a new product and its associated recipe in a single transaction.
+    `image_renditions` may carry renditions already built by utils.prepare_images.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
@@ -912,27 +1923,13 @@ def create_new_product(
             variant_group_id = str(uuid.uuid4())
 
         # 1. Insert Product
-        cursor.execute("INSERT INTO products (display_name, selling_price, image_data, active, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, 1, ?, ?, ?, ?)",
-                       (name, selling_price, image_bytes, category, note, variant_group_id, variant_type))
+        image_hash = _store_image(cursor, image_bytes, image_renditions)
+        cursor.execute("INSERT INTO products (display_name, selling_price, image_hash, active, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, 1, ?, ?, ?, ?)",
+                       (name, selling_price, image_hash, category, note, variant_group_id, variant_type))
         product_id = cursor.lastrowid
         
         # 2. Insert Recipe Items
-        for item in recipe_items:
-            # Handle both old format (tuple) and new format (dict)
-            if isinstance(item, tuple):
-                item_id, qty = item
-                req_type, req_val = 'Specific', None
-                note = None
-            elif isinstance(item, dict):
-                item_id = item.get('id') or item.get('item_id')
-                qty = item.get('qty')
-                req_type = item.get('type', 'Specific')
-                req_val = item.get('val') or item.get('value')
-                note = item.get('note')
-
-            cursor.execute("""
-                INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value, note) 
-                VALUES (?, ?, ?, ?, ?, ?)""", (product_id, item_id, qty, req_type, req_val, note))
+        cursor.executemany(_RECIPE_INSERT_SQL, [_recipe_row(product_id, item) for item in recipe_items])
         
         # 3. Insert Goal (if provided)
         if goal_date and goal_qty > 0:
@@ -951,6 +1948,53 @@ def create_new_product(
     finally:
         conn.close()
 
+def create_new_products(products: List[dict]) -> Optional[List[int]]:
+    """
+    Batch form of create_new_product for bulk seeding: every product, image and recipe row in
+    one transaction, with products and recipes written through executemany. Goals are not supported.
+
+    Args:
+        products (list): Dicts with create_new_product's arguments (name, selling_price, image_bytes,
+            recipe_items, category, note, variant_group_id, variant_type, image_renditions).
+
+    Returns:
+        list: The new product ids in input order, or None if nothing was created.
+    """
+    if not products:
+        return []
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # The write lock makes the ids below ours until commit; AUTOINCREMENT never reuses
+        # ids, so start after both the highest row and the highest id ever handed out
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            SELECT MAX(COALESCE((SELECT MAX(product_id) FROM products), 0),
+                       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'products'), 0))
+        """)
+        first_id = cursor.fetchone()[0] + 1
+        product_ids = list(range(first_id, first_id + len(products)))
+
+        product_rows, recipe_rows = [], []
+        for product_id, p in zip(product_ids, products):
+            image_hash = _store_image(cursor, p.get('image_bytes'), p.get('image_renditions'))
+            product_rows.append((product_id, p['name'], p.get('selling_price', 0.0), image_hash, p.get('category', "Standard"),
+                                 p.get('note'), p.get('variant_group_id') or str(uuid.uuid4()), p.get('variant_type', "STD")))
+            recipe_rows.extend(_recipe_row(product_id, item) for item in p.get('recipe_items') or [])
+
+        cursor.executemany("INSERT INTO products (product_id, display_name, selling_price, image_hash, active, category, note, variant_group_id, variant_type) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)",
+                           product_rows)
+        cursor.executemany(_RECIPE_INSERT_SQL, recipe_rows)
+        conn.commit()
+        logger.info(f"create_new_products: Created {len(product_ids)} products with {len(recipe_rows)} recipe rows")
+        return product_ids
+    except sqlite3.Error as e:
+        logger.error(f"create_new_products: Database error: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
 def check_product_exists(product_name: str) -> bool:
     """Checks if a product name already exists (case-insensitive) and is active."""
     conn = get_connection()
@@ -993,33 +2037,54 @@ def get_product_group_id(product_name: str) -> Optional[str]:
     finally:
         conn.close()
 
-def get_product_image(product_name: str) -> Optional[bytes]:
-    """Fetches the thumbnail for a specific active product."""
+def get_active_product_variants() -> dict:
+    """
+    {(lower-cased display_name, variant_type): (product_id, variant_group_id)} for every active product.
+    One query in place of a check_product_variant / get_product_group_id call per name.
+    """
+    conn = get_connection()
+    try:
+        rows = conn.execute("""
+            SELECT display_name, variant_type, product_id, variant_group_id FROM products
+            WHERE active = 1 ORDER BY product_id
+        """).fetchall()
+        variants = {}
+        for name, variant_type, product_id, group_id in rows:
+            variants.setdefault(((name or "").lower(), variant_type), (product_id, group_id))
+        return variants
+    except sqlite3.Error as e:
+        logger.error(f"get_active_product_variants: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def get_product_image(product_name: str, rendition: Optional[str] = "card") -> Optional[bytes]:
+    """Fetches the image (default: the 200px card rendition) for a specific active product."""
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT image_data FROM products WHERE display_name = ? COLLATE NOCASE AND active = 1", (product_name,))
+        cursor.execute("SELECT image_hash FROM products WHERE display_name = ? COLLATE NOCASE AND active = 1", (product_name,))
         res = cursor.fetchone()
-        return res[0] if res else None
     except Exception as e:
         logger.error(f"get_product_image: Error fetching image for {product_name}: {e}")
         return None
     finally:
         conn.close()
+    return get_image(res[0], rendition) if res else None
 
-def get_product_image_by_id(product_id: int) -> Optional[bytes]:
-    """Fetches the image for a specific product ID."""
+def get_product_image_by_id(product_id: int, rendition: Optional[str] = "card") -> Optional[bytes]:
+    """Fetches the image (default: the 200px card rendition) for a specific product ID."""
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT image_data FROM products WHERE product_id = ?", (product_id,))
+        cursor.execute("SELECT image_hash FROM products WHERE product_id = ?", (product_id,))
         res = cursor.fetchone()
-        return res[0] if res else None
     except Exception as e:
         logger.error(f"get_product_image_by_id: {e}")
         return None
     finally:
         conn.close()
+    return get_image(res[0], rendition) if res else None
 
 def get_product_details(product_name: str) -> Optional[dict]:
     """Fetches full details for a product, including all recipe items."""
@@ -1027,12 +2092,12 @@ def get_product_details(product_name: str) -> Optional[dict]:
     try:
         cursor = conn.cursor()
         # Get Product Info
-        cursor.execute("SELECT product_id, selling_price, image_data, display_name, stock_on_hand, category, note, variant_group_id, variant_type FROM products WHERE display_name = ? COLLATE NOCASE AND active = 1", (product_name,))
+        cursor.execute("SELECT product_id, selling_price, image_hash, display_name, stock_on_hand, category, note, variant_group_id, variant_type FROM products WHERE display_name = ? COLLATE NOCASE AND active = 1", (product_name,))
         res = cursor.fetchone()
         if not res:
             return None
         
-        p_id, price, img, db_name, stock, category, note, group_id, v_type = res
+        p_id, price, img_hash, db_name, stock, category, note, group_id, v_type = res
         
         # Get Recipe Items
         cursor.execute("""
@@ -1076,7 +2141,8 @@ def get_product_details(product_name: str) -> Optional[dict]:
             "product_id": p_id,
             "name": db_name,
             "price": price,
-            "image_data": img,
+            "image_hash": img_hash,
+            "image_data": get_image(img_hash, rendition=None), # Original upload (used when duplicating)
             "recipe": recipe_items,
             "stock_on_hand": stock,
             "category": category,
@@ -1122,6 +2188,57 @@ def update_item_details(item_id, count, cost, bundle_count):
     finally:
         conn.close()
 
+def update_item_details_bulk(rows: List[Tuple[int, int, float, int]]) -> int:
+    """
+    Updates count, cost, and bundle_count for many items in one transaction.
+    rows: [(item_id, count, cost, bundle_count), ...]. Returns the number of items updated (0 on error).
+    """
+    if not rows:
+        return 0
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # Values usually come from DataFrames (numpy types), which sqlite3 cannot bind
+        params = [(int(count), float(cost), int(bundle), int(item_id)) for item_id, count, cost, bundle in rows]
+        cursor.executemany("UPDATE inventory SET count_on_hand = ?, unit_cost = ?, bundle_count = ? WHERE item_id = ?", params)
+        conn.commit()
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logger.error(f"update_item_details_bulk: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
+def diff_inventory_edits(original_df: pd.DataFrame, edited_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compares an edited inventory table with the original in one join on item_id.
+    Returns only the changed rows: item_id, Item, Old/New Stock, Old/New Bundle, Old/New Cost.
+    """
+    columns = ["item_id", "Item", "Old Stock", "New Stock", "Old Bundle", "New Bundle", "Old Cost", "New Cost"]
+    if original_df.empty or edited_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    fields = ['count_on_hand', 'bundle_count', 'unit_cost']
+    merged = edited_df[['item_id', 'name'] + fields].merge(
+        original_df[['item_id'] + fields], on='item_id', how='inner', suffixes=('_new', '_old')
+    )
+    cost_changed = (merged['unit_cost_new'] - merged['unit_cost_old']).abs() > 0.001
+    count_changed = merged['count_on_hand_new'] != merged['count_on_hand_old']
+    bundle_changed = merged['bundle_count_new'] != merged['bundle_count_old']
+    changed = merged[cost_changed | count_changed | bundle_changed]
+
+    return pd.DataFrame({
+        "item_id": changed['item_id'],
+        "Item": changed['name'],
+        "Old Stock": changed['count_on_hand_old'],
+        "New Stock": changed['count_on_hand_new'],
+        "Old Bundle": changed['bundle_count_old'],
+        "New Bundle": changed['bundle_count_new'],
+        "Old Cost": changed['unit_cost_old'],
+        "New Cost": changed['unit_cost_new'],
+    }, columns=columns).reset_index(drop=True)
+
 def add_inventory_item(name: str, category: str, sub_category: str, count: int, cost: float, bundle_count: int) -> bool:
     """Adds a new inventory item. Returns False if name exists."""
     conn = get_connection()
@@ -1155,7 +2272,7 @@ def get_production_goals_range(start_date, end_date) -> pd.DataFrame:
         e_date = end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date)
         
         query = """
-        SELECT pg.goal_id, p.product_id, p.display_name as Product, p.image_data, p.active, p.stock_on_hand, p.note, p.variant_type, pg.due_date, pg.qty_ordered, pg.qty_fulfilled
+        SELECT pg.goal_id, p.product_id, p.display_name as Product, p.image_hash, p.active, p.stock_on_hand, p.note, p.variant_type, pg.due_date, pg.qty_ordered, pg.qty_fulfilled
         FROM production_goals pg
         JOIN products p ON pg.product_id = p.product_id
         WHERE pg.due_date BETWEEN ? AND ?
@@ -1205,7 +2322,7 @@ def get_production_requirements(start_date, end_date) -> pd.DataFrame:
         SELECT 
             p.product_id, 
             p.display_name as Product, 
-            p.image_data, 
+            p.image_hash, 
             p.active, 
             MAX(p.stock_on_hand) as stock_on_hand,
             MAX(p.note) as note,
@@ -1225,35 +2342,79 @@ def get_production_requirements(start_date, end_date) -> pd.DataFrame:
     finally:
         conn.close()
 
-def produce_stock(product_id: int, substitutions: list = None, ignore_recipe: bool = False) -> bool:
-    """Increments stock_on_hand and deducts inventory (BOM). Logs with goal_id=NULL."""
+def get_production_capacity(start_date, end_date) -> pd.DataFrame:
+    """
+    What current inventory can actually produce, for the products shown on the Cooler Dashboard.
+    Returns product_id, deficit (needed - in cooler), can_make (units makeable now, product on its
+    own; NaN if it has no recipe) and plan_covered (deficit units covered when all deficits share
+    the stock, allocated greedily by earliest due date).
+    """
+    conn = get_connection()
+    try:
+        s_date = start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date)
+        e_date = end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date)
+
+        products = pd.read_sql_query("""
+            SELECT p.product_id, MAX(p.stock_on_hand) as stock_on_hand,
+                   COALESCE(SUM(MAX(0, pg.qty_ordered - pg.qty_fulfilled)), 0) as required_qty,
+                   MIN(pg.due_date) as first_due
+            FROM products p
+            LEFT JOIN production_goals pg ON p.product_id = pg.product_id AND pg.due_date BETWEEN ? AND ?
+            WHERE p.active = 1 OR pg.goal_id IS NOT NULL
+            GROUP BY p.product_id
+        """, conn, params=(s_date, e_date))
+        inventory_df = pd.read_sql_query("SELECT item_id, category, sub_category, count_on_hand FROM inventory", conn)
+    except Exception as e:
+        logger.error(f"get_production_capacity: {e}")
+        return pd.DataFrame(columns=['product_id', 'deficit', 'can_make', 'plan_covered'])
+    finally:
+        conn.close()
+
+    matrix = get_bom_matrix()
+    item_stock = dict(zip(inventory_df['item_id'].astype(int), pd.to_numeric(inventory_df['count_on_hand'], errors='coerce').fillna(0)))
+    members = bom.category_members(inventory_df, matrix.columns)
+
+    product_ids = products['product_id'].astype(int).tolist()
+    products['deficit'] = (products['required_qty'] - products['stock_on_hand'].fillna(0)).clip(lower=0).astype(int)
+    can_make = bom.max_makeable_units(matrix, item_stock, members, product_ids)
+
+    # Earliest due first; products with no goals in range have no deficit anyway
+    queue = products[products['deficit'] > 0].sort_values(['first_due', 'product_id'], na_position='last')
+    covered = bom.allocate_capacity(matrix, item_stock, members, list(zip(queue['product_id'].astype(int), queue['deficit'])))
+
+    products['can_make'] = products['product_id'].map(can_make).astype('float64')
+    products['plan_covered'] = products['product_id'].map(covered).fillna(0).astype(int)
+    return products[['product_id', 'deficit', 'can_make', 'plan_covered']]
+
+def produce_stock(product_id: int, substitutions: list = None, ignore_recipe: bool = False, qty: int = 1) -> bool:
+    """
+    Increments stock_on_hand by `qty` and deducts inventory (BOM) for all units at once. Logs with goal_id=NULL.
+    substitutions: List of (item_id, qty_to_deduct) PER UNIT.
+    """
+    qty = int(qty)
+    if qty < 1:
+        logger.warning(f"produce_stock: Invalid qty {qty} for product_id {product_id}")
+        return False
+
     conn = get_connection()
     try:
         cursor = conn.cursor()
         
         # 1. Update Product Stock
-        cursor.execute("UPDATE products SET stock_on_hand = stock_on_hand + 1 WHERE product_id = ?", (product_id,))
+        cursor.execute("UPDATE products SET stock_on_hand = stock_on_hand + ? WHERE product_id = ?", (qty, product_id))
         
         if cursor.rowcount == 0:
             logger.warning(f"produce_stock: No product found with ID {product_id}")
             return False
         
-        # 2. Log it (goal_id is NULL for stock production)
-        cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type) VALUES (NULL, ?, 'STOCK')", (product_id,))
+        # 2. Log it (goal_id is NULL for stock production, one row for the whole batch)
+        cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type, qty) VALUES (NULL, ?, 'STOCK', ?)", (product_id, qty))
+        log_id = cursor.lastrowid
         
-        # 3. Deduct Inventory
-        if not ignore_recipe:
-            # Only deduct Specific items automatically
-            cursor.execute("SELECT item_id, qty_needed FROM recipes WHERE product_id = ? AND requirement_type = 'Specific'", (product_id,))
-            specific_items = cursor.fetchall()
-            
-            for i_id, qty in specific_items:
-                cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand - ? WHERE item_id = ?", (qty, i_id))
-            
-        # 4. Deduct Substitutions (Generic Items)
-        if substitutions:
-            for sub_item_id, sub_qty in substitutions:
-                cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand - ? WHERE item_id = ?", (sub_qty, sub_item_id))
+        # 3. Deduct Recipe + Substitutions as one merged map, and snapshot it on the log
+        per_unit = _build_deduction_map(cursor, product_id, substitutions, ignore_recipe)
+        _apply_inventory_deltas(cursor, per_unit, qty)
+        _snapshot_log_items(cursor, log_id, per_unit)
             
         conn.commit()
         return True
@@ -1264,6 +2425,10 @@ def produce_stock(product_id: int, substitutions: list = None, ignore_recipe: bo
     finally:
         conn.close()
 
+def produce_stock_batch(product_id: int, qty: int, substitutions: list = None, ignore_recipe: bool = False) -> bool:
+    """Makes `qty` units of stock in one transaction with a single log row. Substitutions are per unit."""
+    return produce_stock(product_id, substitutions=substitutions, ignore_recipe=ignore_recipe, qty=qty)
+
 def undo_stock_production(product_id: int) -> bool:
     """Decrements stock_on_hand and restores inventory. Reverts last log where goal_id is NULL."""
     conn = get_connection()
@@ -1271,35 +2436,32 @@ def undo_stock_production(product_id: int) -> bool:
         cursor = conn.cursor()
         
         # Find latest log for this product with NULL goal_id (meaning it was a stock production)
-        cursor.execute("SELECT log_id, action_type FROM production_logs WHERE product_id = ? AND goal_id IS NULL ORDER BY log_id DESC LIMIT 1", (product_id,))
+        cursor.execute("SELECT log_id, action_type, qty FROM production_logs WHERE product_id = ? AND goal_id IS NULL ORDER BY log_id DESC LIMIT 1", (product_id,))
         res = cursor.fetchone()
         
         if not res:
             return False
         
-        log_id, action_type = res
+        log_id, action_type, log_qty = res
 
         # Safety: Never undo a PACK action here (it implies a deleted goal, not stock production)
         if action_type == 'PACK':
             logger.warning(f"undo_stock_production: Skipped PACK log {log_id}. This log should have been deleted when its goal was removed.")
             return False
         
-        # 1. Delete Log
-        cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (log_id,))
+        # 1. Restore Inventory exactly as deducted (snapshot, recipe fallback for legacy logs)
+        _restore_log_unit(cursor, log_id, product_id)
         
-        # 2. Decrement Stock
+        # 2. Remove one unit from the Log
+        _pop_log_unit(cursor, log_id, log_qty)
+        
+        # 3. Decrement Stock
         cursor.execute("UPDATE products SET stock_on_hand = stock_on_hand - 1 WHERE product_id = ?", (product_id,))
         
         if cursor.rowcount == 0:
             logger.warning(f"undo_stock_production: No product found with ID {product_id}")
+            conn.rollback()
             return False
-
-        # 3. Restore Inventory
-        cursor.execute("SELECT item_id, qty_needed FROM recipes WHERE product_id = ?", (product_id,))
-        recipe_items = cursor.fetchall()
-        
-        for i_id, qty in recipe_items:
-            cursor.execute("UPDATE inventory SET count_on_hand = count_on_hand + ? WHERE item_id = ?", (qty, i_id))
             
         conn.commit()
         return True
@@ -1510,20 +2672,38 @@ def release_overage_to_stock(goal_id: int, qty_to_release: int) -> bool:
         cursor.execute("UPDATE products SET stock_on_hand = stock_on_hand + ? WHERE product_id = ?", (qty_to_release, p_id))
         
         # 4. Handle Logs (LIFO)
-        # Identify the specific logs affected by this release
-        cursor.execute("SELECT log_id, action_type FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT ?", (goal_id, qty_to_release))
+        # Walk back through the goal's logs until qty_to_release units are covered.
+        # A batch row that is only partly released is split.
+        cursor.execute("SELECT log_id, action_type, product_id, qty FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC", (goal_id,))
         logs = cursor.fetchall()
         
-        pack_ids = [str(row[0]) for row in logs if row[1] == 'PACK']
-        make_ids = [str(row[0]) for row in logs if row[1] != 'PACK']
-        
-        if pack_ids:
-            # Delete PACK logs (Reversing the move from Cooler -> Goal)
-            cursor.execute(f"DELETE FROM production_logs WHERE log_id IN ({','.join(pack_ids)})")
+        remaining = qty_to_release
+        for log_id, action_type, log_p_id, log_qty in logs:
+            if remaining <= 0:
+                break
+            take = min(remaining, log_qty)
+            remaining -= take
             
-        if make_ids:
-            # Detach MAKE logs (Converting Goal Production -> Stock Production)
-            cursor.execute(f"UPDATE production_logs SET goal_id = NULL, action_type = 'STOCK' WHERE log_id IN ({','.join(make_ids)})")
+            if action_type == 'PACK':
+                # Delete PACK logs (Reversing the move from Cooler -> Goal)
+                if take == log_qty:
+                    cursor.execute("DELETE FROM production_logs WHERE log_id = ?", (log_id,))
+                else:
+                    cursor.execute("UPDATE production_logs SET qty = qty - ? WHERE log_id = ?", (take, log_id))
+            elif take == log_qty:
+                # Detach MAKE logs (Converting Goal Production -> Stock Production)
+                cursor.execute("UPDATE production_logs SET goal_id = NULL, action_type = 'STOCK' WHERE log_id = ?", (log_id,))
+            else:
+                cursor.execute("UPDATE production_logs SET qty = qty - ? WHERE log_id = ?", (take, log_id))
+                cursor.execute("""
+                    INSERT INTO production_logs (goal_id, product_id, action_type, qty, bom_journaled)
+                    SELECT NULL, product_id, 'STOCK', ?, bom_journaled FROM production_logs WHERE log_id = ?
+                """, (take, log_id))
+                # The split-off units deducted the same items as the rest of the batch
+                cursor.execute("""
+                    INSERT INTO production_log_items (log_id, item_id, qty)
+                    SELECT ?, item_id, qty FROM production_log_items WHERE log_id = ?
+                """, (cursor.lastrowid, log_id))
         
         conn.commit()
         return True
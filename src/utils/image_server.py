@@ -0,0 +1,162 @@
+import os
+import re
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.utils import db_utils
+from src.utils.utils import RENDITION_SIZES
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🖼️ IMAGE HTTP SERVER
+# ==========================================
+# Product images are content-addressed (products.image_hash = SHA-256 of the bytes), so the URL
+# /img/<hash>/<rendition>.jpg names one exact image forever. Served with a one-year immutable
+# Cache-Control and an ETag, a browser downloads each image once; Streamlit reruns (polling
+# refreshes included) then only resend the short URL instead of the JPEG over the websocket.
+
+# Port of the image server. It binds every interface, like Streamlit, so tablets on the shop
+# network can load images from the same host they opened the app on.
+IMAGE_SERVER_PORT = int(os.environ.get("IMAGE_SERVER_PORT", "8502"))
+IMAGE_SERVER_BIND = os.environ.get("IMAGE_SERVER_BIND", "0.0.0.0")
+
+# Public origin override (e.g. "https://shop.example.com/images") for when the app sits behind
+# a reverse proxy. Without it URLs are built from the host the browser used to reach Streamlit.
+IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "").rstrip("/")
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_PATH_RE = re.compile(r"^/img/([0-9A-Za-z]{1,128})/([a-z]+)\.jpg$")
+_RENDITIONS = ("full", *RENDITION_SIZES)
+
+_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def image_path(image_hash: str, rendition: str = "card") -> str:
+    """Path component of an image URL (no host)."""
+    return f"/img/{image_hash}/{rendition}.jpg"
+
+
+def _hostname(host: str) -> str:
+    """Drops the Streamlit port from a Host header, keeping IPv6 brackets: "[::1]:8501" -> "[::1]"."""
+    if host.startswith("["):
+        return host[:host.find("]") + 1]
+    return host.split(":", 1)[0]
+
+
+def _etag(image_hash: str, rendition: str) -> str:
+    return f'"{image_hash}-{rendition}"'
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """GET/HEAD /img/<hash>/<rendition>.jpg. Bytes come from db_utils.get_image (shared image cache)."""
+
+    server_version = "UniFlowersImages/1.0"
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body: bool):
+        match = _PATH_RE.match(self.path.split("?", 1)[0])
+        if not match or match.group(2) not in _RENDITIONS:
+            self._send_error(404)
+            return
+        image_hash, rendition = match.groups()
+        etag = _etag(image_hash, rendition)
+
+        # The content behind a URL never changes, so any matching ETag is still valid
+        if etag in (self.headers.get("If-None-Match") or ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        data = db_utils.get_image(image_hash, rendition=rendition)
+        if not data:
+            self._send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+    def _send_error(self, code: int):
+        # Not cached: the image may simply not have been saved yet
+        self.send_response(code)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(f"image_server: {self.address_string()} {format % args}")
+
+
+def start(port: Optional[int] = None, bind: Optional[str] = None) -> Optional[int]:
+    """
+    Starts the image server on a daemon thread (once per process) and returns its port.
+    Returns None if it cannot bind (e.g. port taken); pages then fall back to inline images.
+    """
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server.server_address[1]
+        try:
+            server = ThreadingHTTPServer((bind or IMAGE_SERVER_BIND, IMAGE_SERVER_PORT if port is None else port), _ImageHandler)
+        except OSError as e:
+            logger.warning(f"image_server.start: Could not bind image server ({e}); images will be sent inline")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="image-server", daemon=True).start()
+        _server = server
+        logger.info(f"image_server.start: Serving images on port {server.server_address[1]}")
+        return server.server_address[1]
+
+
+def stop() -> None:
+    """Shuts the server down (tests)."""
+    global _server
+    with _lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def running_port() -> Optional[int]:
+    with _lock:
+        return _server.server_address[1] if _server is not None else None
+
+
+def image_url(image_hash: Optional[str], rendition: str = "card", host: Optional[str] = None, secure: bool = False) -> Optional[str]:
+    """
+    Absolute URL of an image, or None when it cannot be served by URL (no hash, server not running,
+    or an https page without IMAGE_BASE_URL - browsers block http images there).
+
+    Args:
+        host (str): Host header the browser sent to Streamlit, e.g. "192.168.1.20:8501".
+        secure (bool): Whether the page itself was loaded over https.
+    """
+    if not isinstance(image_hash, str) or not image_hash:
+        return None
+    port = running_port()
+    if port is None:
+        return None
+    if IMAGE_BASE_URL:
+        return f"{IMAGE_BASE_URL}{image_path(image_hash, rendition)}"
+    if secure or not host:
+        return None
+
+    return f"http://{_hostname(host)}:{port}{image_path(image_hash, rendition)}"
@@ -0,0 +1,409 @@
+import re
+import hashlib
+import sqlite3
+import logging
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🗂️ SCHEMA MIGRATIONS (PRAGMA user_version)
+# ==========================================
+# init_db.py creates the baseline tables. Everything added after that lives here as a
+# numbered step, so existing shop databases are upgraded in place on the next start.
+# Rule: never edit a released step - append a new one.
+
+def _add_hot_path_indexes(cursor: sqlite3.Cursor) -> None:
+    """Secondary indexes for the dashboard polling, undo and product lookup queries."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_goals_due_date ON production_goals(due_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_goals_product ON production_goals(product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_product ON recipes(product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_goal ON production_logs(goal_id, log_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_product_goal ON production_logs(product_id, goal_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name_active ON products(display_name COLLATE NOCASE, active)")
+
+def _column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_info({table})").fetchall())
+
+def _create_image_store(cursor: sqlite3.Cursor) -> None:
+    """
+    Moves product photos out of the products table into a content-addressed store.
+    Products keep only a SHA-256 key, so polling queries never drag BLOBs along.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_images (
+            image_hash TEXT PRIMARY KEY,
+            image_data BLOB NOT NULL,
+            byte_size INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if not _column_exists(cursor, "products", "image_hash"):
+        cursor.execute("ALTER TABLE products ADD COLUMN image_hash TEXT")
+    _move_product_blobs(cursor)
+
+def _move_product_blobs(cursor: sqlite3.Cursor) -> None:
+    """Moves any BLOBs still held in products.image_data into product_images, one copy per unique image."""
+    if not _column_exists(cursor, "products", "image_data"):
+        return
+    # One row at a time to keep memory flat on large catalogs
+    cursor.execute("SELECT product_id FROM products WHERE image_data IS NOT NULL")
+    for (p_id,) in cursor.fetchall():
+        blob = cursor.execute("SELECT image_data FROM products WHERE product_id = ?", (p_id,)).fetchone()[0]
+        image_hash = hashlib.sha256(blob).hexdigest()
+        cursor.execute("INSERT OR IGNORE INTO product_images (image_hash, image_data, byte_size) VALUES (?, ?, ?)",
+                       (image_hash, blob, len(blob)))
+        cursor.execute("UPDATE products SET image_hash = ?, image_data = NULL WHERE product_id = ?", (image_hash, p_id))
+
+def _create_image_renditions(cursor: sqlite3.Cursor) -> None:
+    """
+    Pre-sized copies of each stored image (thumb/card/full), so every screen can fetch the
+    smallest one it needs. Existing images get their renditions built on first request.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_renditions (
+            image_hash TEXT NOT NULL,
+            rendition TEXT NOT NULL,
+            format TEXT NOT NULL DEFAULT 'JPEG',
+            image_data BLOB NOT NULL,
+            byte_size INTEGER,
+            PRIMARY KEY (image_hash, rendition, format),
+            FOREIGN KEY(image_hash) REFERENCES product_images(image_hash)
+        )
+    ''')
+
+def _add_log_quantity(cursor: sqlite3.Cursor) -> None:
+    """
+    Lets one production_logs row stand for a whole batch ("made 40") instead of 40 rows.
+    Existing rows are single units, so the default of 1 keeps their meaning.
+    """
+    if not _column_exists(cursor, "production_logs", "qty"):
+        cursor.execute("ALTER TABLE production_logs ADD COLUMN qty INTEGER NOT NULL DEFAULT 1")
+
+def _create_log_items_snapshot(cursor: sqlite3.Cursor) -> None:
+    """
+    Records exactly which inventory items (per unit) each MAKE/STOCK log deducted, including
+    substitutions and custom builds, so undo reverses the real deduction instead of re-reading
+    a recipe. Legacy one-row-per-unit logs written in the same instant are folded into batch rows.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS production_log_items (
+            log_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            qty INTEGER NOT NULL,
+            PRIMARY KEY (log_id, item_id),
+            FOREIGN KEY(log_id) REFERENCES production_logs(log_id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute("""
+        SELECT MIN(log_id), SUM(qty), goal_id, product_id, action_type, timestamp
+        FROM production_logs
+        GROUP BY goal_id, product_id, action_type, timestamp
+        HAVING COUNT(*) > 1
+    """)
+    for keep_id, total, goal_id, product_id, action_type, ts in cursor.fetchall():
+        cursor.execute("UPDATE production_logs SET qty = ? WHERE log_id = ?", (total, keep_id))
+        cursor.execute("""
+            DELETE FROM production_logs
+            WHERE log_id != ? AND goal_id IS ? AND product_id IS ? AND action_type IS ? AND timestamp IS ?
+        """, (keep_id, goal_id, product_id, action_type, ts))
+
+def _add_log_journal_flag(cursor: sqlite3.Cursor) -> None:
+    """
+    Marks which logs carry a deduction journal. An empty journal is valid (a custom build of
+    nothing), so "has items" cannot tell journaled logs apart from legacy ones.
+    """
+    if not _column_exists(cursor, "production_logs", "bom_journaled"):
+        cursor.execute("ALTER TABLE production_logs ADD COLUMN bom_journaled INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE production_logs SET bom_journaled = 1 WHERE log_id IN (SELECT log_id FROM production_log_items)")
+
+# Tables whose changes the polling dashboards care about
+VERSIONED_TABLES = ("inventory", "products", "recipes", "production_goals", "production_logs")
+
+def _create_data_versions(cursor: sqlite3.Cursor) -> None:
+    """
+    Per-table change counters kept current by triggers, so a polling view can tell "nothing
+    changed" with one primary-key read instead of re-running its queries. Triggers also catch
+    writes from other processes and from code that bypasses db_utils.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.executemany("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)",
+                       [(t,) for t in VERSIONED_TABLES])
+    for table in VERSIONED_TABLES:
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{op.lower()}
+                AFTER {op} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            """)
+
+def _create_import_progress(cursor: sqlite3.Cursor) -> None:
+    """
+    Checkpoints for streaming CSV imports. Each committed chunk records how many data rows of
+    the upload are done, keyed by a hash of the file, so an interrupted import can pick up
+    where it stopped when the same file is uploaded again.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            import_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _create_image_manifest(cursor: sqlite3.Cursor) -> None:
+    """
+    What uni_seed.py last saw for each file in images/recipes. A file whose mtime and size
+    still match is skipped without being read; a changed photo updates its product in place.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_manifest (
+            source_path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            byte_size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            product_id INTEGER,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+# Text of one product's search row: name, note, variant type and ingredient names
+# (specific items by inventory name, generics by category). {pid} is an SQL expression.
+_SEARCH_ROW_SQL = """
+    INSERT INTO product_search (rowid, display_name, note, variant_type, ingredients)
+    SELECT p.product_id, p.display_name, COALESCE(p.note, ''), COALESCE(p.variant_type, ''),
+           COALESCE((SELECT group_concat(COALESCE(i.name, r.requirement_value), ' ')
+                     FROM recipes r LEFT JOIN inventory i ON i.item_id = r.item_id
+                     WHERE r.product_id = p.product_id), '')
+    FROM products p WHERE p.product_id {match}
+"""
+
+def _create_product_search(cursor: sqlite3.Cursor) -> None:
+    """
+    FTS5 trigram index over product names, notes, variant types and ingredient names, rowid =
+    product_id. Triggers on products, recipes and inventory renames keep it in sync, so search
+    boxes query the index instead of scanning DataFrames. Builds without FTS5 (or SQLite < 3.34,
+    which lacks the trigram tokenizer) skip this step; db_utils.search_product_ids then uses LIKE.
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+                display_name, note, variant_type, ingredients, tokenize = 'trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"_create_product_search: Full-text search unavailable ({e}); search falls back to LIKE")
+        return
+
+    refresh_new = "DELETE FROM product_search WHERE rowid = NEW.product_id;" + _SEARCH_ROW_SQL.format(match="= NEW.product_id") + ";"
+    refresh_old = "DELETE FROM product_search WHERE rowid = OLD.product_id;" + _SEARCH_ROW_SQL.format(match="= OLD.product_id") + ";"
+    triggers = {
+        "trg_search_products_insert": ("AFTER INSERT ON products", refresh_new),
+        "trg_search_products_update": ("AFTER UPDATE OF display_name, note, variant_type ON products", refresh_new),
+        "trg_search_products_delete": ("AFTER DELETE ON products", "DELETE FROM product_search WHERE rowid = OLD.product_id;"),
+        "trg_search_recipes_insert": ("AFTER INSERT ON recipes", refresh_new),
+        "trg_search_recipes_update": ("AFTER UPDATE ON recipes", refresh_old + refresh_new),
+        "trg_search_recipes_delete": ("AFTER DELETE ON recipes", refresh_old),
+        "trg_search_inventory_rename": (
+            "AFTER UPDATE OF name ON inventory",
+            "DELETE FROM product_search WHERE rowid IN (SELECT product_id FROM recipes WHERE item_id = NEW.item_id);"
+            + _SEARCH_ROW_SQL.format(match="IN (SELECT product_id FROM recipes WHERE item_id = NEW.item_id)") + ";"),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    # Backfill
+    cursor.execute("DELETE FROM product_search")
+    cursor.execute(_SEARCH_ROW_SQL.format(match="IS NOT NULL"))
+
+def _add_recipe_page_index(cursor: sqlite3.Cursor) -> None:
+    """Keyset index for the paged Recipe Book: each page is one range seek on (active, display_name, product_id)."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_active_name_id ON products(active, display_name, product_id)")
+
+def _add_image_reference_index(cursor: sqlite3.Cursor) -> None:
+    """
+    Index for image reference lookups (db_utils.purge_unreferenced_images), plus a second pass
+    over products.image_data for BLOBs written there by older app versions since step 2 ran.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_image_hash ON products(image_hash)")
+    _move_product_blobs(cursor)
+
+def _drop_redundant_renditions(cursor: sqlite3.Cursor) -> None:
+    """
+    Drops stored "full" renditions (an 800px re-encode of the 800px original, which is now served
+    as "full" directly) and "thumb" renditions, which no screen requests.
+    """
+    cursor.execute("DELETE FROM image_renditions WHERE rendition IN ('full', 'thumb')")
+
+def _guard_search_rename_trigger(cursor: sqlite3.Cursor) -> None:
+    """
+    Inventory writes used to reindex every product using the item on any `UPDATE OF name`, even
+    when the name was unchanged (bulk imports and upserts rewrite it on every row), with a full
+    scan of recipes per row. The trigger now fires only on a real rename and finds the affected
+    products through idx_recipes_item.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_item ON recipes(item_id)")
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_search_inventory_rename'").fetchone()
+    if not exists:
+        return  # FTS5 unavailable: step 10 created no search triggers
+    cursor.execute("DROP TRIGGER trg_search_inventory_rename")
+    cursor.execute(
+        "CREATE TRIGGER trg_search_inventory_rename AFTER UPDATE OF name ON inventory WHEN OLD.name IS NOT NEW.name BEGIN "
+        "DELETE FROM product_search WHERE rowid IN (SELECT product_id FROM recipes WHERE item_id = NEW.item_id);"
+        + _SEARCH_ROW_SQL.format(match="IN (SELECT product_id FROM recipes WHERE item_id = NEW.item_id)") + "; END"
+    )
+
+def _add_recipe_category_index(cursor: sqlite3.Cursor) -> None:
+    """
+    Covering index for the forecast's generic (Category) requirements. With planner statistics
+    and few or no goals, SQLite drives that join from recipes and scanned the whole table; this
+    lets it seek requirement_type = 'Category' and read the rest from the index.
+    """
+    if not all(_column_exists(cursor, "recipes", c) for c in ("requirement_type", "requirement_value", "qty_needed")):
+        return  # Schema predates generic requirements: nothing to forecast by category
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipes_type_product "
+        "ON recipes(requirement_type, product_id, requirement_value, qty_needed)"
+    )
+
+# (version, description, step). Versions must be consecutive, starting at 1.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "Hot query path indexes", _add_hot_path_indexes),
+    (2, "Content-addressed product image store", _create_image_store),
+    (3, "Multi-resolution image renditions", _create_image_renditions),
+    (4, "Batch quantity on production logs", _add_log_quantity),
+    (5, "Per-log BOM snapshot and legacy log compaction", _create_log_items_snapshot),
+    (6, "Deduction journal flag on production logs", _add_log_journal_flag),
+    (7, "Trigger-maintained per-table data versions", _create_data_versions),
+    (8, "Resumable CSV import checkpoints", _create_import_progress),
+    (9, "Image seeding manifest", _create_image_manifest),
+    (10, "Full-text product search index", _create_product_search),
+    (11, "Recipe Book keyset index", _add_recipe_page_index),
+    (12, "Image reference index and legacy BLOB dedupe", _add_image_reference_index),
+    (13, "Drop duplicate full-size and unused thumbnail renditions", _drop_redundant_renditions),
+    (14, "Search reindex only on real inventory renames", _guard_search_rename_trigger),
+    (15, "Covering index for generic recipe requirements", _add_recipe_category_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Returns the migration version recorded in the database header."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Applies every pending migration, each in its own transaction together with its
+    user_version bump. Returns the resulting schema version.
+    """
+    current = get_schema_version(conn)
+    applied = 0
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            step(cursor)
+            # PRAGMA does not accept bound parameters; version is an int from MIGRATIONS
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            applied += 1
+            current = version
+            logger.info(f"run_migrations: Applied migration {version} ({description})")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"run_migrations: Migration {version} ({description}) failed: {e}")
+            raise
+
+    if applied:
+        # Refresh planner statistics for the new indexes
+        conn.execute("PRAGMA optimize")
+    return current
+
+def migrate_database(db_path: str) -> int:
+    """Opens db_path and brings its schema up to LATEST_VERSION."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return run_migrations(conn)
+    finally:
+        conn.close()
+
+# ==========================================
+# 🔎 QUERY PLAN GUARD
+# ==========================================
+# Representative forms of the queries the dashboards run on every tick. Each entry lists the
+# table aliases that must be reached through an index; a plain SCAN of any of them means a
+# schema or query change has regressed the hot path to a full table scan.
+
+HOT_QUERIES: Dict[str, Tuple[str, tuple, Tuple[str, ...]]] = {
+    "get_production_goals_range": (
+        """SELECT pg.goal_id, p.display_name FROM production_goals pg
+           JOIN products p ON pg.product_id = p.product_id
+           WHERE pg.due_date BETWEEN ? AND ?""",
+        ('2024-02-01', '2024-02-14'), ("pg", "p")),
+    "get_production_requirements": (
+        """SELECT p.product_id, COALESCE(SUM(MAX(0, pg.qty_ordered - pg.qty_fulfilled)), 0)
+           FROM products p
+           LEFT JOIN production_goals pg ON p.product_id = pg.product_id AND pg.due_date BETWEEN ? AND ?
+           WHERE p.active = 1 OR pg.goal_id IS NOT NULL
+           GROUP BY p.product_id""",
+        ('2024-02-01', '2024-02-14'), ("pg",)),
+    "get_forecast_generic_requirements": (
+        """SELECT r.requirement_value, SUM((g.qty_ordered - g.qty_fulfilled) * r.qty_needed)
+           FROM production_goals g JOIN recipes r ON g.product_id = r.product_id
+           WHERE g.due_date BETWEEN ? AND ? AND r.requirement_type = 'Category'
+           GROUP BY r.requirement_value""",
+        ('2024-02-01', '2024-02-14'), ("g", "r")),
+    "recipe_by_product": (
+        "SELECT item_id, qty_needed FROM recipes WHERE product_id = ? AND requirement_type = 'Specific'",
+        (1,), ("recipes",)),
+    "pending_goals_by_product": (
+        "SELECT COUNT(*) FROM production_goals WHERE product_id = ? AND qty_fulfilled < qty_ordered",
+        (1,), ("production_goals",)),
+    "undo_production": (
+        "SELECT log_id, action_type, product_id, qty FROM production_logs WHERE goal_id = ? ORDER BY log_id DESC LIMIT 1",
+        (1,), ("production_logs",)),
+    "undo_stock_production": (
+        "SELECT log_id, action_type, qty FROM production_logs WHERE product_id = ? AND goal_id IS NULL ORDER BY log_id DESC LIMIT 1",
+        (1,), ("production_logs",)),
+    "get_recipe_page": (
+        """SELECT product_id, display_name, selling_price FROM products
+           WHERE active = ? AND (display_name, product_id) > (?, ?)
+           ORDER BY display_name, product_id LIMIT 10""",
+        (1, 'M', 0), ("products",)),
+    "get_recipe_page_ingredients": (
+        """SELECT r.product_id, i.name FROM recipes r LEFT JOIN inventory i ON r.item_id = i.item_id
+           WHERE r.product_id IN (?, ?) ORDER BY r.product_id, r.rowid""",
+        (1, 2), ("r",)),
+    "get_product_details": (
+        "SELECT product_id FROM products WHERE display_name = ? COLLATE NOCASE AND active = 1",
+        ('Valentine Special',), ("products",)),
+}
+
+# Matches "SCAN pg", "SCAN TABLE production_goals AS pg" (older SQLite) and index scans alike
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?")
+
+def find_full_scans(conn: sqlite3.Connection) -> List[str]:
+    """Runs EXPLAIN QUERY PLAN over HOT_QUERIES. Returns a description of every full scan found."""
+    problems = []
+    for name, (sql, params, must_search) in HOT_QUERIES.items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall():
+            detail = row[-1]
+            match = _SCAN_RE.match(detail)
+            if not match:
+                continue
+            table, alias = match.group(1), match.group(2)
+            if (alias or table) in must_search:
+                problems.append(f"{name}: {detail}")
+    return problems
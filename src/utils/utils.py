@@ -1,37 +1,139 @@
 import io
+import os
 import logging
-from typing import Optional, Tuple, Union
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# Longest-edge pixel size of every stored original (process_image / prepare_image).
+# The original itself is served as the "full" rendition, so no copy is kept at this size.
+FULL_IMAGE_SIZE = 800
+
+# Smaller copies stored with every product image, by longest edge:
+# "card" for the 200px dashboard cards and the Recipe Book list.
+RENDITION_SIZES = {
+    "card": 200,
+}
+
+def _open_rgb(image_input: Union[str, io.BytesIO, bytes]) -> Image.Image:
+    """Decodes an image (path, stream or bytes) into an RGB PIL image ready for JPEG encoding."""
+    if isinstance(image_input, bytes):
+        image_input = io.BytesIO(image_input)
+
+    # Ensure we are at the start of the stream if it's a file-like object
+    if hasattr(image_input, 'seek'):
+        image_input.seek(0)
+
+    with Image.open(image_input) as image:
+        image.load()
+        # Convert to RGB if RGBA (png) or Palette to ensure JPEG compatibility
+        if image.mode != "RGB":
+            return image.convert("RGB")
+        return image.copy()
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format=image_format, quality=quality)
+    return img_byte_arr.getvalue()
+
 def process_image(
-    image_input: Union[str, io.BytesIO, bytes], 
-    max_size: Tuple[int, int] = (800, 800), 
+    image_input: Union[str, io.BytesIO, bytes],
+    max_size: Tuple[int, int] = (FULL_IMAGE_SIZE, FULL_IMAGE_SIZE),
     quality: int = 85
 ) -> Optional[bytes]:
     """Resizes and compresses an image to JPEG bytes for database storage."""
     if not image_input:
         return None
     try:
-        if isinstance(image_input, bytes):
-            image_input = io.BytesIO(image_input)
-
-        # Ensure we are at the start of the stream if it's a file-like object
-        if hasattr(image_input, 'seek'):
-            image_input.seek(0)
-
-        with Image.open(image_input) as image:
-            # Convert to RGB if RGBA (png) or Palette to ensure JPEG compatibility
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-            
-            # Resize to max dimensions while maintaining aspect ratio
-            image.thumbnail(max_size)
-            
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='JPEG', quality=quality)
-            return img_byte_arr.getvalue()
+        image = _open_rgb(image_input)
+        # Resize to max dimensions while maintaining aspect ratio
+        image.thumbnail(max_size)
+        return _encode(image, 'JPEG', quality)
     except Exception as e:
         logger.error(f"process_image: Error processing image: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def process_image_renditions(
+    image_input: Union[str, io.BytesIO, bytes],
+    sizes: Optional[Dict[str, int]] = None,
+    quality: int = 85
+) -> Dict[Tuple[str, str], bytes]:
+    """
+    Builds every rendition of an image from a single decode.
+    Each size is downscaled from the next larger one, so the full-size source is resized only once.
+    Returns {(rendition, format): bytes}, e.g. {("card", "JPEG"): b"..."}. Empty dict on failure.
+    """
+    if not image_input:
+        return {}
+    sizes = sizes or RENDITION_SIZES
+    try:
+        image = _open_rgb(image_input)
+    except Exception as e:
+        logger.error(f"process_image_renditions: Error decoding image: {e}")
+        return {}
+
+    renditions = {}
+    try:
+        for name, edge in sorted(sizes.items(), key=lambda kv: kv[1], reverse=True):
+            image.thumbnail((edge, edge))
+            renditions[(name, 'JPEG')] = _encode(image, 'JPEG', quality)
+    except Exception as e:
+        logger.error(f"process_image_renditions: Error encoding renditions: {e}")
+        return {}
+    return renditions
+
+# ==========================================
+# 🏭 PARALLEL IMAGE PIPELINE
+# ==========================================
+# Catalog imports and uni_seed.py process hundreds of photos. Decoding, resizing and encoding
+# run on a process pool; callers write the results to the database themselves afterwards, so
+# SQLite still sees a single writer.
+
+# Worker cap. One core is always left free for the POS and the Streamlit server.
+MAX_IMAGE_WORKERS = 4
+
+# Below this many images the pool's start-up costs more than it saves
+PARALLEL_MIN_IMAGES = 4
+
+class PreparedImage(NamedTuple):
+    """Storage JPEG plus its renditions (see process_image_renditions), or the error that stopped it."""
+    image_bytes: Optional[bytes]
+    renditions: Dict[Tuple[str, str], bytes]
+    error: Optional[str]
+
+def prepare_image(image_input: Union[str, io.BytesIO, bytes], max_size: Tuple[int, int] = (FULL_IMAGE_SIZE, FULL_IMAGE_SIZE), quality: int = 85) -> PreparedImage:
+    """Does all CPU work for one stored image. Errors are captured, never raised (safe as a pool task)."""
+    try:
+        image = _open_rgb(image_input)
+        image.thumbnail(max_size)
+        image_bytes = _encode(image, 'JPEG', quality)
+    except Exception as e:
+        return PreparedImage(None, {}, f"{type(e).__name__}: {e}")
+    # Renditions come from the stored bytes, exactly as db_utils._store_renditions builds them
+    return PreparedImage(image_bytes, process_image_renditions(image_bytes, quality=quality), None)
+
+def default_image_workers() -> int:
+    return max(1, min(MAX_IMAGE_WORKERS, (os.cpu_count() or 1) - 1))
+
+def prepare_images(sources: Sequence[Union[str, bytes]], max_workers: Optional[int] = None) -> List[PreparedImage]:
+    """
+    Runs prepare_image over many files (paths or bytes) on a bounded process pool.
+    Results are in the order of `sources`; a bad file yields a PreparedImage with `error` set.
+    Small batches, single-core machines and platforms without a usable pool run in-process.
+    """
+    sources = list(sources)
+    workers = min(max_workers or default_image_workers(), len(sources))
+    if workers < 2 or len(sources) < PARALLEL_MIN_IMAGES:
+        return [prepare_image(s) for s in sources]
+
+    try:
+        # "spawn": forking a threaded process (the Streamlit server) can deadlock the child
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return list(pool.map(prepare_image, sources, chunksize=max(1, len(sources) // (workers * 4))))
+    except (OSError, BrokenProcessPool) as e:
+        logger.warning(f"prepare_images: Process pool unavailable ({e}); processing serially")
+        return [prepare_image(s) for s in sources]
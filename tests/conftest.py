@@ -46,6 +46,10 @@ def setup_db():
     
     yield TEST_DB
     
+    # Release pooled handles before deleting the file (required on Windows)
+    db_utils.close_pooled_connections()
+    # The next test may get a recreated file with the same inode; start from a cold cache
+    db_utils.clear_read_cache()
     if os.path.exists(TEST_DB):
         os.remove(TEST_DB)
     db_utils.DB_PATH = original_db
\ No newline at end of file
@@ -147,4 +147,25 @@ def test_clipboard_bulk_update_whitespace(setup_db):
     cursor = conn.cursor()
     cursor.execute("SELECT count_on_hand FROM inventory WHERE name = 'Red Rose'")
     assert cursor.fetchone()[0] == 25
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def test_clipboard_engine_per_line_results(setup_db):
+    """The engine reports every line, resolves IDs and names in one pass and applies all counts together."""
+    text = (
+        "1, Red Rose, Rose, Stem, bundle_count=10, loss= 5, count= 4\n"   # 4 bundles of 10, minus 5
+        "\n"
+        "2, White Lily, , Stem, bundle_count=1, loss= , count= \n"        # no count entered
+        "99, Ghost, , , bundle_count=1, loss= , count= 3\n"
+        "white lily 30\n"
+        "Just words\n"
+    )
+    results = db_utils.apply_clipboard_update(text)
+
+    assert [(r.line_no, r.status) for r in results] == [
+        (1, "updated"), (3, "skipped"), (4, "unknown"), (5, "updated"), (6, "invalid")]
+    assert results[0].message == "Red Rose (New Stock: 35)"
+    assert (results[3].item_id, results[3].new_count) == (2, 30)
+
+    inventory = db_utils.get_inventory().set_index('name')
+    assert inventory.loc['Red Rose', 'count_on_hand'] == 35
+    assert inventory.loc['White Lily', 'count_on_hand'] == 30
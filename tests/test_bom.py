@@ -0,0 +1,117 @@
+import sqlite3
+import os
+import sys
+import pandas as pd
+
+# Add parent directory to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import bom, db_utils
+
+def test_build_shopping_list_rounds_up_to_packs():
+    requirements = pd.DataFrame({'item_id': [10, 11], 'qty_needed': [54.0, 4.0]})
+    inventory = pd.DataFrame({
+        'item_id': [10, 11], 'name': ['Rose', 'Fern'],
+        'count_on_hand': [1, 5], 'bundle_count': [25, 0],
+    })
+    rows = bom.build_shopping_list(requirements, inventory).set_index('Ingredient')
+    # 54 needed, 25 on hand -> 29 short -> 2 packs of 25
+    assert rows.loc['Rose', 'Deficit (Units)'] == 29
+    assert rows.loc['Rose', 'To Buy (Packs)'] == 2
+    # Bundle size 0 is treated as singles: 5 on hand covers 4
+    assert rows.loc['Fern', 'To Buy (Packs)'] == 0
+
+def test_explode_matches_database_recipes(setup_db):
+    """Works directly on the matrix and frames the UI fetches."""
+    demand = pd.DataFrame({'product_id': [1], 'Expected': [3]})
+    requirements = db_utils.get_bom_matrix().explode_frame(demand)
+    shopping = bom.build_shopping_list(requirements, db_utils.get_inventory())
+    assert shopping.iloc[0]['Ingredient'] == 'Red Rose'
+    assert shopping.iloc[0]['Total Needed'] == 36
+
+def _matrix():
+    return bom.BomMatrix.from_records([
+        (1, 10, 12, 'Specific', None),
+        (1, 11, 2, 'Specific', None),
+        (1, None, 3, 'Category', 'Greenery'),
+        (2, 10, 6, 'Specific', None),
+        (2, 10, 1, 'Specific', None),   # duplicate line is summed
+        (3, None, 0, 'Specific', None),  # nothing usable
+    ])
+
+def test_bom_matrix_explode():
+    m = _matrix()
+    assert m.product_ids == [1, 2]
+    assert m.row(2) == {10: 7.0}
+    assert m.has_generics(1) and not m.has_generics(2)
+    assert m.explode({1: 2, 2: 5, 99: 4}) == {10: 59.0, 11: 4.0, 'cat:Greenery': 6.0}
+
+def test_bom_matrix_explode_frame():
+    demand = pd.DataFrame({'product_id': [1, 2, 3], 'Expected': [2, 5, 4]})
+    frame = _matrix().explode_frame(demand).set_index('item_id')['qty_needed'].to_dict()
+    # Generic (Category) lines and recipe-less products are left out
+    assert frame == {10: 59.0, 11: 4.0}
+
+    zero = pd.DataFrame({'product_id': [1, 2], 'Expected': [0, 0]})
+    assert _matrix().explode_frame(zero).empty
+
+def test_bom_matrix_max_makeable():
+    m = _matrix()
+    stock = {10: 30, 11: 100, 'cat:Greenery': 4}
+    # Product 1 limited by Greenery (4 // 3); product 2 by item 10 (30 // 7)
+    assert m.max_makeable(stock) == {1: 1, 2: 4}
+    assert m.max_makeable({}) == {1: 0, 2: 0}
+
+def test_bom_matrix_cached_until_recipes_change(setup_db):
+    first = db_utils.get_bom_matrix()
+    assert db_utils.get_bom_matrix() is first
+
+    # Unrelated writes keep the cached matrix
+    db_utils.update_inventory_cost(1, 3.0)
+    assert db_utils.get_bom_matrix() is first
+
+    conn = sqlite3.connect(setup_db)
+    conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (1, 2, 4)")
+    conn.commit()
+    conn.close()
+    rebuilt = db_utils.get_bom_matrix()
+    assert rebuilt is not first
+    assert rebuilt.row(1) == {1: 12.0, 2: 4.0}
+
+def test_joint_allocation_shares_stems():
+    # Both products need 10 Roses; only 25 in stock
+    m = bom.BomMatrix.from_records([
+        (1, 10, 10, 'Specific', None),
+        (2, 10, 10, 'Specific', None),
+        (2, None, 2, 'Category', 'Greenery'),
+    ])
+    stock = {10: 25, 20: 3, 21: 2}
+    members = {'cat:Greenery': [20, 21]}
+
+    # On its own each product could use all the roses (product 2 also limited by 5 greenery / 2)
+    assert bom.max_makeable_units(m, stock, members, [1, 2, 3]) == {1: 2, 2: 2, 3: None}
+
+    # Jointly, the first in line takes what it needs and the rest is left for the next
+    assert bom.allocate_capacity(m, stock, members, [(1, 1), (2, 5)]) == {1: 1, 2: 1}
+
+def test_generic_and_specific_lines_compete_for_same_item():
+    # Recipe: 4 of item 10 specifically + 4 of any Rose, and item 10 is itself a Rose
+    m = bom.BomMatrix.from_records([
+        (1, 10, 4, 'Specific', None),
+        (1, None, 4, 'Category', 'Rose'),
+    ])
+    members = {'cat:Rose': [10]}
+    # 12 stems: the column bounds say 3, but each unit really takes 8 stems
+    assert bom.max_makeable_units(m, {10: 12}, members, [1]) == {1: 1}
+
+def test_get_production_capacity(setup_db):
+    conn = sqlite3.connect(setup_db)
+    conn.execute("UPDATE inventory SET count_on_hand = 30 WHERE item_id = 1")
+    conn.commit()
+    conn.close()
+
+    cap = db_utils.get_production_capacity('2023-10-01', '2023-11-01').set_index('product_id')
+    # Goal of 10, nothing in the cooler; 30 roses / 12 per unit
+    assert cap.loc[1, 'deficit'] == 10
+    assert cap.loc[1, 'can_make'] == 2
+    assert cap.loc[1, 'plan_covered'] == 2
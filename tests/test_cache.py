@@ -0,0 +1,101 @@
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path to import db_utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import db_utils
+from src.components import change_watcher
+from src.utils.cache import ByteLRUCache, VersionedCache
+
+def test_versioned_cache_hits_until_version_changes():
+    cache = VersionedCache(max_entries=2)
+    calls = []
+    loader = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_load("a", 1, loader) == 1
+    assert cache.get_or_load("a", 1, loader) == 1
+    assert cache.get_or_load("a", 2, loader) == 2
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stale']) == (1, 2, 1)
+
+    # LRU bound
+    cache.get_or_load("b", 1, loader)
+    cache.get_or_load("c", 1, loader)
+    assert cache.stats()['entries'] == 2
+
+def test_byte_lru_cache_is_capped_by_size():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put("a", b"xxxx")
+    cache.put("b", b"yyyy")
+    assert cache.get("a") == b"xxxx"  # "a" is now most recent
+
+    cache.put("c", b"zzzz")  # over budget: least recently used ("b") goes
+    assert "b" not in cache and "a" in cache and "c" in cache
+
+    cache.put("huge", b"0" * 11)  # larger than the whole budget: never cached
+    assert "huge" not in cache
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['evictions'], stats['entries']) == (1, 1, 2)
+
+def test_get_all_recipes_cached_and_invalidated_by_writes(setup_db):
+    """Repeated reads are cache hits; a pooled write or an out-of-process write invalidates them."""
+    db_utils.clear_read_cache()
+    # The first pooled connection switches the file to WAL mode, which itself counts as a change
+    db_utils.get_all_recipes()
+    first = db_utils.get_all_recipes()
+    before = db_utils.get_cache_stats()
+    second = db_utils.get_all_recipes()
+    assert db_utils.get_cache_stats()['hits'] == before['hits'] + 1
+    assert second.equals(first)
+
+    # Callers get their own copy
+    second.loc[:, 'Product'] = 'Mutated'
+    assert (db_utils.get_all_recipes()['Product'] == 'Valentine Special').all()
+
+    # A write through db_utils moves the data version
+    assert db_utils.add_inventory_item("Fern", "Greenery", "", 10, 0.5, 1) is True
+    conn = sqlite3.connect(setup_db)
+    conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (1, 2, 3)")
+    conn.commit()
+    conn.close()
+
+    df = db_utils.get_all_recipes()
+    assert set(df['Ingredient']) == {'Red Rose', 'White Lily'}
+
+def test_get_data_versions_only_moves_on_change(setup_db):
+    """Polling views compare these counters to skip reloads when nothing changed."""
+    tables = ("inventory", "production_goals")
+    first = db_utils.get_data_versions(tables)
+    assert set(first) == set(tables)
+
+    # Reads leave the counters alone
+    db_utils.get_inventory()
+    db_utils.get_production_goals_range('2023-10-01', '2023-11-01')
+    assert db_utils.get_data_versions(tables) == first
+
+    db_utils.update_inventory_cost(1, 1.25)
+    changed = db_utils.get_data_versions(tables)
+    assert changed['inventory'] > first['inventory']
+    assert changed['production_goals'] == first['production_goals']
+
+def test_change_watcher_reuses_loads_until_tables_change(setup_db):
+    """A polling tick with no writes re-renders from the previous load instead of querying again."""
+    calls = []
+    def get_inventory():
+        calls.append(1)
+        return db_utils.get_inventory()
+
+    tables = ("inventory",)
+    first = change_watcher.load("test_watch", tables, get_inventory)
+    first['count_on_hand'] = 0  # callers get their own copy
+    again = change_watcher.load("test_watch", tables, get_inventory)
+    assert len(calls) == 1
+    assert again['count_on_hand'].tolist() == [100, 100]
+
+    db_utils.update_inventory_cost(1, 1.25)
+    change_watcher.load("test_watch", tables, get_inventory)
+    assert len(calls) == 2
@@ -92,6 +92,42 @@ def test_undo_production_logic(setup_db):
     finally:
         conn.close()
 
+def test_log_production_qty(setup_db):
+    """Tests that making N units in one call matches N single calls, and undo steps back one unit."""
+    db_path = setup_db
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT goal_id FROM production_goals")
+        goal_id = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    # --- ACTION: Make 4 at once (recipe is 12 Roses each) ---
+    assert db_utils.log_production(goal_id, qty=4) is True
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT qty_fulfilled FROM production_goals WHERE goal_id = ?", (goal_id,))
+        assert cursor.fetchone()[0] == 4
+        cursor.execute("SELECT count_on_hand FROM inventory WHERE name = 'Red Rose'")
+        assert cursor.fetchone()[0] == 100 - 48
+    finally:
+        conn.close()
+
+    # Undo still reverses a single unit
+    assert db_utils.undo_production(goal_id) is True
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT qty_fulfilled FROM production_goals WHERE goal_id = ?", (goal_id,))
+        assert cursor.fetchone()[0] == 3
+        cursor.execute("SELECT count_on_hand FROM inventory WHERE name = 'Red Rose'")
+        assert cursor.fetchone()[0] == 100 - 36
+    finally:
+        conn.close()
+
 def test_get_production_goals_range(setup_db):
     """Tests fetching goals within a date range."""
     # Seeded goal is 2023-10-30
@@ -172,4 +208,47 @@ def test_log_production_targets_specific_goal(setup_db):
         cursor.execute("SELECT qty_fulfilled FROM production_goals WHERE goal_id = ?", (g_id_early,))
         assert cursor.fetchone()[0] == 0
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+def test_search_product_ids_ranks_and_stays_in_sync(setup_db):
+    """The search index covers names, notes, variant types and ingredients and follows every write."""
+    db_path = setup_db
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO products (product_id, display_name, note, variant_type) VALUES (2, 'Lily Cascade', 'tall vase', 'DLX')")
+    conn.execute("INSERT INTO products (product_id, display_name) VALUES (3, 'Spring Mix')")
+    conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (3, 2, 4)")   # White Lily
+    conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value) VALUES (3, NULL, 1, 'Category', 'Greenery')")
+    conn.commit()
+    conn.close()
+
+    # Name match ranks above ingredient match; terms are ANDed, case-insensitive substrings
+    assert db_utils.search_product_ids("lily") == [2, 3]
+    assert db_utils.search_product_ids("LILY green") == [3]
+    assert db_utils.search_product_ids("vase dlx") == [2]
+    assert db_utils.search_product_ids("rose") == [1]          # ingredient 'Red Rose'
+    assert db_utils.search_product_ids("mi") == [3]             # short term: LIKE on the index
+    assert db_utils.search_product_ids("  ") == []
+
+    # Renaming an ingredient, editing a recipe or deleting a product updates the index
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE inventory SET name = 'Stargazer' WHERE item_id = 2")
+    conn.execute("DELETE FROM recipes WHERE product_id = 1")
+    conn.execute("DELETE FROM products WHERE product_id = 2")
+    conn.commit()
+    conn.close()
+    assert db_utils.search_product_ids("stargazer") == [3]
+    assert db_utils.search_product_ids("lily") == []
+    assert db_utils.search_product_ids("rose") == []
+
+def test_search_falls_back_without_index(setup_db):
+    """Without the FTS table, search gives the same answers through LIKE on the base tables."""
+    conn = sqlite3.connect(setup_db)
+    conn.execute("DROP TABLE product_search")
+    conn.commit()
+    conn.close()
+    assert db_utils.search_product_ids("red ro") == [1]
+    assert db_utils.search_product_ids("valentine 50%") == []
+
+def test_filter_dataframe_by_search(setup_db):
+    df = pd.DataFrame({"product_id": [1, 1, 99], "Product": ["Valentine Special", "Valentine Special", "Other"]})
+    assert db_utils.filter_dataframe_by_search(df, "special")["product_id"].tolist() == [1, 1]
+    assert db_utils.filter_dataframe_by_search(df, "")["product_id"].tolist() == [1, 1, 99]
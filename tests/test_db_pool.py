@@ -0,0 +1,95 @@
+import pytest
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path to import db_utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import db_utils
+from src.utils.db_pool import ConnectionPool
+
+def test_connections_are_reused(tmp_path):
+    """A closed connection goes back to the pool and is handed out again."""
+    pool = ConnectionPool()
+    db_file = str(tmp_path / "pool.db")
+
+    conn = pool.checkout(db_file)
+    conn.close()
+    conn_again = pool.checkout(db_file)
+
+    assert conn_again is conn
+    stats = pool.stats()
+    assert stats['created'] == 1
+    assert stats['reused'] == 1
+    assert stats['in_use'] == 1
+
+    conn_again.close()
+    assert pool.stats()['checkins'] == 2
+    pool.close_all()
+
+def test_connection_is_preconfigured(tmp_path):
+    """Pooled connections come with foreign keys and WAL already enabled."""
+    pool = ConnectionPool()
+    with pool.connection(str(tmp_path / "pool.db")) as conn:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    pool.close_all()
+
+def test_checkin_rolls_back_open_transaction(tmp_path):
+    """Uncommitted work must not leak into the next caller of a reused connection."""
+    pool = ConnectionPool()
+    db_file = str(tmp_path / "pool.db")
+    with pool.connection(db_file) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+
+    with pool.connection(db_file) as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+        # No commit
+
+    with pool.connection(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close_all()
+
+def test_recreated_database_is_not_served_stale(tmp_path):
+    """If the database file is deleted and recreated, idle connections to the old file are dropped."""
+    pool = ConnectionPool()
+    db_file = str(tmp_path / "pool.db")
+    with pool.connection(db_file) as conn:
+        conn.execute("CREATE TABLE old_table (x INTEGER)")
+        conn.commit()
+
+    os.remove(db_file)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    sqlite3.connect(db_file).close()
+
+    with pool.connection(db_file) as conn:
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        assert tables == []
+    assert pool.stats()['discarded'] == 1
+    pool.close_all()
+
+def test_disabled_pool_closes_connections(tmp_path):
+    """Drop-in mode: with pooling off, close() really closes the handle."""
+    pool = ConnectionPool()
+    pool.enabled = False
+    conn = pool.checkout(str(tmp_path / "pool.db"))
+    conn.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.stats()['idle'] == 0
+
+def test_db_utils_uses_pool(setup_db):
+    """Every db_utils call checks a connection out and back in."""
+    before = db_utils.get_pool_stats()
+    db_utils.get_inventory()
+    db_utils.check_product_exists("Valentine Special")
+    after = db_utils.get_pool_stats()
+
+    assert after['checkouts'] - before['checkouts'] == 2
+    assert after['checkins'] - before['checkins'] == 2
+    assert after['in_use'] == before['in_use']
@@ -1,7 +1,9 @@
 import pytest
 import sqlite3
+import io
 import os
 import sys
+import time
 from unittest.mock import patch
 
 # Add parent directory to path to import init_db
@@ -21,6 +23,8 @@ def mock_db(tmp_path):
     # Patch the DB_PATH in db_utils to point to our temp file
     with patch("src.utils.db_utils.DB_PATH", str(db_file)):
         yield str(db_file)
+    db_utils.close_pooled_connections()
+    db_utils.clear_read_cache()
 
 def test_produce_stock(mock_db):
     """Test that producing stock increases product stock and decreases inventory."""
@@ -56,6 +60,125 @@ def test_produce_stock(mock_db):
     assert cursor.fetchone()[0] == 1
     conn.close()
 
+def test_produce_stock_qty_merges_deductions(mock_db):
+    """Test that qty=N deducts a merged recipe + substitution map once for all units."""
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    
+    # Setup: Recipe lists Rose twice (10 + 2) plus a Category line; substitution also uses Rose
+    cursor.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Rose', 200)")
+    rose_id = cursor.lastrowid
+    cursor.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Fern', 50)")
+    fern_id = cursor.lastrowid
+    cursor.execute("INSERT INTO products (display_name, stock_on_hand) VALUES ('Bouquet', 0)")
+    p_id = cursor.lastrowid
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, ?, 10)", (p_id, rose_id))
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, ?, 2)", (p_id, rose_id))
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value) VALUES (?, NULL, 3, 'Category', 'Greenery')", (p_id,))
+    conn.commit()
+    conn.close()
+    
+    # Action: 3 units, substitutions are per unit
+    assert db_utils.produce_stock(p_id, substitutions=[(fern_id, 3), (rose_id, 1)], qty=3) is True
+    
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT stock_on_hand FROM products WHERE product_id = ?", (p_id,))
+    assert cursor.fetchone()[0] == 3
+    cursor.execute("SELECT count_on_hand FROM inventory WHERE item_id = ?", (rose_id,))
+    assert cursor.fetchone()[0] == 200 - (10 + 2 + 1) * 3
+    cursor.execute("SELECT count_on_hand FROM inventory WHERE item_id = ?", (fern_id,))
+    assert cursor.fetchone()[0] == 50 - 3 * 3
+    # One compact log row carries the whole batch
+    cursor.execute("SELECT count(*), SUM(qty) FROM production_logs WHERE product_id = ? AND goal_id IS NULL", (p_id,))
+    assert cursor.fetchone() == (1, 3)
+    conn.close()
+    
+    # Undo peels one unit off the batch row
+    assert db_utils.undo_stock_production(p_id) is True
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT stock_on_hand FROM products WHERE product_id = ?", (p_id,))
+    assert cursor.fetchone()[0] == 2
+    cursor.execute("SELECT qty FROM production_logs WHERE product_id = ?", (p_id,))
+    assert cursor.fetchone()[0] == 2
+    conn.close()
+    
+    # Invalid quantities are rejected without touching stock
+    assert db_utils.produce_stock(p_id, qty=0) is False
+
+def test_undo_uses_deduction_snapshot(mock_db):
+    """Test that undo restores exactly what was deducted, including substitutions and custom builds."""
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Rose', 100)")
+    rose_id = cursor.lastrowid
+    cursor.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Tulip', 100)")
+    tulip_id = cursor.lastrowid
+    cursor.execute("INSERT INTO products (display_name, stock_on_hand) VALUES ('Bouquet', 0)")
+    p_id = cursor.lastrowid
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, ?, 6)", (p_id, rose_id))
+    cursor.execute("INSERT INTO production_goals (product_id, qty_ordered, qty_fulfilled) VALUES (?, 5, 0)", (p_id,))
+    g_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    
+    # Goal build with a generic substitution, then a custom stock build that skips the recipe
+    assert db_utils.log_production(g_id, substitutions=[(tulip_id, 4)]) is True
+    assert db_utils.produce_stock(p_id, substitutions=[(tulip_id, 9)], ignore_recipe=True) is True
+    
+    # The recipe changing afterwards must not affect what undo gives back
+    conn = sqlite3.connect(mock_db)
+    conn.execute("UPDATE recipes SET qty_needed = 50 WHERE product_id = ?", (p_id,))
+    conn.commit()
+    conn.close()
+    
+    assert db_utils.undo_stock_production(p_id) is True
+    assert db_utils.undo_production(g_id) is True
+    
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT item_id, count_on_hand FROM inventory ORDER BY item_id")
+    assert cursor.fetchall() == [(rose_id, 100), (tulip_id, 100)]
+    cursor.execute("SELECT COUNT(*) FROM production_log_items")
+    assert cursor.fetchone()[0] == 0
+    conn.close()
+
+def test_undo_legacy_and_empty_journal(mock_db):
+    """Test that legacy logs fall back to the Specific recipe rows and an empty journal restores nothing."""
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Rose', 88)")
+    rose_id = cursor.lastrowid
+    cursor.execute("INSERT INTO products (display_name, stock_on_hand) VALUES ('Bouquet', 2)")
+    p_id = cursor.lastrowid
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, ?, 12)", (p_id, rose_id))
+    cursor.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value) VALUES (?, NULL, 3, 'Category', 'Greenery')", (p_id,))
+    # A stock log written before the journal existed
+    cursor.execute("INSERT INTO production_logs (goal_id, product_id, action_type) VALUES (NULL, ?, 'STOCK')", (p_id,))
+    conn.commit()
+    conn.close()
+    
+    # Custom build that used nothing: journaled, but with no items
+    assert db_utils.produce_stock(p_id, substitutions=[], ignore_recipe=True) is True
+    assert db_utils.undo_stock_production(p_id) is True
+    
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT count_on_hand FROM inventory WHERE item_id = ?", (rose_id,))
+    assert cursor.fetchone()[0] == 88
+    conn.close()
+    
+    # Legacy log: recipe Specific rows come back
+    assert db_utils.undo_stock_production(p_id) is True
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT count_on_hand FROM inventory WHERE item_id = ?", (rose_id,))
+    assert cursor.fetchone()[0] == 100
+    cursor.execute("SELECT stock_on_hand FROM products WHERE product_id = ?", (p_id,))
+    assert cursor.fetchone()[0] == 1
+    conn.close()
+
 def test_fulfill_goal_logic(mock_db):
     """Test fulfillment constraints: Cannot fulfill if stock is 0."""
     conn = sqlite3.connect(mock_db)
@@ -119,6 +242,34 @@ def test_undo_fulfillment(mock_db):
     assert cursor.fetchone()[0] == 0 # Reversed
     conn.close()
 
+def test_release_overage_splits_batch_logs(mock_db):
+    """Test that releasing part of a batch detaches only the released units to stock."""
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO products (display_name, stock_on_hand) VALUES ('Bouquet', 2)")
+    p_id = cursor.lastrowid
+    cursor.execute("INSERT INTO production_goals (product_id, qty_ordered, qty_fulfilled) VALUES (?, 10, 0)", (p_id,))
+    g_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    
+    # 5 made as one batch, then 2 packed from the cooler as one batch
+    assert db_utils.log_production_batch(g_id, 5) is True
+    assert db_utils.fulfill_goal(g_id, qty=2) == 2
+    
+    # Order shrinks to 4 -> release 3 (the 2 packed + 1 of the made batch)
+    assert db_utils.release_overage_to_stock(g_id, 3) is True
+    
+    conn = sqlite3.connect(mock_db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT qty_fulfilled FROM production_goals WHERE goal_id = ?", (g_id,))
+    assert cursor.fetchone()[0] == 4
+    cursor.execute("SELECT action_type, qty FROM production_logs WHERE goal_id = ?", (g_id,))
+    assert cursor.fetchall() == [('MAKE', 4)]
+    cursor.execute("SELECT action_type, qty FROM production_logs WHERE goal_id IS NULL")
+    assert cursor.fetchall() == [('STOCK', 1)]
+    conn.close()
+
 def test_stock_rollover(mock_db):
     """Test that updating a recipe carries over the stock count."""
     conn = sqlite3.connect(mock_db)
@@ -147,4 +298,272 @@ def test_stock_rollover(mock_db):
     row = cursor.fetchone()
     assert row[1] == "New Ver"
     assert row[0] == 5
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def test_diff_inventory_edits_and_bulk_update(mock_db):
+    """Test that only edited rows are reported and that they are saved in one batch."""
+    conn = sqlite3.connect(mock_db)
+    conn.executemany("INSERT INTO inventory (name, count_on_hand, unit_cost, bundle_count) VALUES (?, ?, ?, ?)",
+                     [('Rose', 10, 1.0, 25), ('Lily', 5, 2.0, 10), ('Fern', 7, 0.5, 1)])
+    conn.commit()
+    conn.close()
+
+    original = db_utils.get_inventory()
+    edited = original.copy()
+    edited.loc[edited['name'] == 'Rose', 'count_on_hand'] = 12
+    edited.loc[edited['name'] == 'Fern', 'unit_cost'] = 0.5004  # below the cost tolerance
+    edited.loc[edited['name'] == 'Lily', 'bundle_count'] = 12
+
+    diff = db_utils.diff_inventory_edits(original, edited)
+    assert sorted(diff['Item']) == ['Lily', 'Rose']
+    rose = diff[diff['Item'] == 'Rose'].iloc[0]
+    assert (rose['Old Stock'], rose['New Stock']) == (10, 12)
+
+    rows = list(zip(diff['item_id'], diff['New Stock'], diff['New Cost'], diff['New Bundle']))
+    assert db_utils.update_item_details_bulk(rows) == 2
+
+    after = db_utils.get_inventory().set_index('name')
+    assert after.loc['Rose', 'count_on_hand'] == 12
+    assert after.loc['Lily', 'bundle_count'] == 12
+    assert after.loc['Fern', 'unit_cost'] == 0.5
+
+def test_bulk_inventory_upload_upserts_and_reports(mock_db):
+    """Test cleaning, upsert by ID, insert without ID and per-row errors in one import."""
+    conn = sqlite3.connect(mock_db)
+    conn.execute("INSERT INTO inventory (item_id, name, count_on_hand, unit_cost) VALUES (5, 'Old Rose', 1, 0.10)")
+    conn.commit()
+    conn.close()
+
+    csv = io.StringIO(
+        "Item_ID,Name,Count_On_Hand,Unit_Cost,Bundle_Count,Category\n"
+        "5,Red Rose,40,\"$1,250.50\",25,Stem\n"     # update existing ID
+        "9,Tulip,abc,2,,\n"                          # re-create missing ID, bad count -> 0
+        ",Fern,7,0.5,1,Greenery\n"                   # no ID -> new item
+        ",  ,3,1,1,\n"                               # blank name -> reported, skipped
+    )
+    count, errors = db_utils.process_bulk_inventory_upload(csv)
+    assert count == 3
+    assert errors == ["Row 5 Error: missing name"]
+
+    conn = sqlite3.connect(mock_db)
+    rows = {r[1]: r for r in conn.execute("SELECT item_id, name, category, count_on_hand, unit_cost, bundle_count FROM inventory")}
+    conn.close()
+    assert rows['Red Rose'] == (5, 'Red Rose', 'Stem', 40, 1250.5, 25)
+    assert rows['Tulip'] == (9, 'Tulip', None, 0, 2.0, 1)
+    assert rows['Fern'][2:] == ('Greenery', 7, 0.5, 1)
+    assert len(rows) == 3
+
+def test_bulk_inventory_upload_truncates_fractional_numbers(mock_db):
+    """Fractional or out-of-range numbers are cleaned like int(float(x)) instead of aborting the import."""
+    csv = io.StringIO(
+        "item_id,name,count_on_hand,unit_cost,bundle_count\n"
+        "3.5,Rose,12.9,1,10.0\n"
+        "inf,Lily,inf,1,1e30\n"
+    )
+    count, errors = db_utils.process_bulk_inventory_upload(csv)
+    assert (count, errors) == (2, [])
+
+    conn = sqlite3.connect(mock_db)
+    rows = {r[1]: r for r in conn.execute("SELECT item_id, name, count_on_hand, bundle_count FROM inventory")}
+    conn.close()
+    assert rows['Rose'] == (3, 'Rose', 12, 10)
+    assert rows['Lily'][2:] == (0, 1)
+
+def test_bulk_inventory_upsert_scales_with_recipes(mock_db):
+    """Re-uploading an unchanged inventory must not reindex every product that uses each item."""
+    items, products = 5000, 3000
+    conn = sqlite3.connect(mock_db)
+    conn.executemany("INSERT INTO inventory (item_id, name, count_on_hand) VALUES (?, ?, 0)",
+                     [(i, f"Item {i}") for i in range(1, items + 1)])
+    conn.executemany("INSERT INTO products (product_id, display_name) VALUES (?, ?)",
+                     [(p, f"Product {p}") for p in range(1, products + 1)])
+    conn.executemany(
+        "INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, ?, 1)",
+        [(p, (p * 7 + k) % items + 1) for p in range(1, products + 1) for k in range(6)])
+    conn.commit()
+    conn.close()
+
+    csv = io.StringIO("item_id,name,count_on_hand\n" + "".join(f"{i},Item {i},5\n" for i in range(1, items + 1)))
+    start = time.perf_counter()
+    count, errors = db_utils.process_bulk_inventory_upload(csv)
+    elapsed = time.perf_counter() - start
+    assert (count, errors) == (items, [])
+    # ~0.1s with the guarded rename trigger, >1s when every matched row reindexes its products
+    assert elapsed < 0.6, f"inventory upsert took {elapsed:.2f}s"
+
+def test_bulk_inventory_upload_requires_columns(mock_db):
+    count, errors = db_utils.process_bulk_inventory_upload(io.StringIO("name,cost\nRose,1\n"))
+    assert count == 0 and "missing required columns" in errors[0]
+
+def test_streaming_inventory_upload_resumes_after_failure(mock_db):
+    """A streamed import commits per chunk; re-uploading the same file after a crash skips the committed rows."""
+    text = "name,count_on_hand\n" + "".join(f"Item {i},{i}\n" for i in range(5))
+    calls = []
+    original = db_utils._upsert_inventory_rows
+
+    def failing_upsert(cursor, clean):
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("disk I/O error")
+        calls.append(len(clean))
+        return original(cursor, clean)
+
+    with patch("src.utils.db_utils._upsert_inventory_rows", side_effect=failing_upsert):
+        count, errors = db_utils.process_bulk_inventory_upload(io.StringIO(text), chunk_size=2)
+    assert count == 2 and "disk I/O error" in errors[-1]
+
+    progress = []
+    count, errors = db_utils.process_bulk_inventory_upload(io.StringIO(text), chunk_size=2,
+                                                           progress=lambda done, total: progress.append((done, total)))
+    assert (count, errors) == (3, [])
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+
+    conn = sqlite3.connect(mock_db)
+    names = [r[0] for r in conn.execute("SELECT name FROM inventory ORDER BY item_id")]
+    assert conn.execute("SELECT COUNT(*) FROM import_progress").fetchone()[0] == 0
+    conn.close()
+    assert names == [f"Item {i}" for i in range(5)]
+
+def test_streaming_recipe_upload_keeps_products_whole(mock_db):
+    """Products whose rows straddle a chunk boundary are written once with their full recipe."""
+    conn = sqlite3.connect(mock_db)
+    conn.execute("INSERT INTO inventory (item_id, name) VALUES (1, 'Rose'), (2, 'Fern')")
+    conn.commit()
+    conn.close()
+
+    csv = io.StringIO(
+        "Product,Ingredient,Qty\n"
+        "Alpha,Rose,3\n"
+        "Beta,Rose,1\n"
+        "Beta,Fern,2\n"      # chunk boundary falls inside Beta
+        "Beta,Filler,4\n"
+        "Gamma,Fern,5\n"
+        "Alpha,Fern,1\n"     # Alpha again: reported, Alpha's recipe kept
+    )
+    count, errors = db_utils.process_bulk_recipe_upload(csv, chunk_size=2)
+    assert count == 3
+    assert len(errors) == 1 and "Alpha" in errors[0]
+
+    conn = sqlite3.connect(mock_db)
+    recipes = conn.execute("""
+        SELECT p.display_name, COUNT(*) FROM products p JOIN recipes r ON p.product_id = r.product_id
+        WHERE p.active = 1 GROUP BY p.display_name ORDER BY p.display_name
+    """).fetchall()
+    conn.close()
+    assert recipes == [('Alpha', 1), ('Beta', 3), ('Gamma', 1)]
+
+def test_recipe_upload_resolves_items_and_versions_products(mock_db):
+    """Ingredients resolve by ID, then case-insensitive name, else become generics; an existing product is versioned."""
+    conn = sqlite3.connect(mock_db)
+    conn.execute("INSERT INTO inventory (item_id, name) VALUES (1, 'Red Rose'), (2, 'Fern')")
+    conn.execute("INSERT INTO products (product_id, display_name, stock_on_hand, variant_group_id, variant_type) VALUES (7, 'Sunrise', 4, 'grp-1', 'DLX')")
+    conn.commit()
+    conn.close()
+
+    csv = io.StringIO(
+        "product_id,Product,Price,item_id,Ingredient,Qty\n"
+        "7,Sunrise,$45.00,1,Whatever,3\n"     # by ID
+        "7,Sunrise,,,FERN,2\n"                # by name, any case
+        "7,Sunrise,,,Any Filler,1\n"          # generic
+        ",Moonlight Deluxe,30,,red rose,6\n"
+        ",Moonlight Standard,20,,Red Rose,0\n" # no valid rows -> skipped
+    )
+    count, errors = db_utils.process_bulk_recipe_upload(csv)
+    assert count == 2
+    assert errors == ["Skipped 'Moonlight Standard': No valid ingredients."]
+
+    conn = sqlite3.connect(mock_db)
+    old_active = conn.execute("SELECT active FROM products WHERE product_id = 7").fetchone()[0]
+    new = conn.execute("""
+        SELECT product_id, selling_price, stock_on_hand, variant_group_id, variant_type FROM products
+        WHERE display_name = 'Sunrise' AND active = 1
+    """).fetchone()
+    recipe = conn.execute("SELECT item_id, qty_needed, requirement_type, requirement_value FROM recipes WHERE product_id = ? ORDER BY qty_needed DESC", (new[0],)).fetchall()
+    moon = conn.execute("SELECT p.product_id, p.variant_type, r.item_id FROM products p JOIN recipes r ON r.product_id = p.product_id WHERE p.display_name = 'Moonlight Deluxe'").fetchone()
+    conn.close()
+
+    assert old_active == 0
+    assert new[0] > 7 and new[1:] == (45.0, 4, 'grp-1', 'DLX')
+    assert recipe == [(1, 3, 'Specific', None), (2, 2, 'Specific', None), (None, 1, 'Category', 'Filler')]
+    assert moon[0] not in (7, new[0]) and moon[1:] == ('DLX', 1)
+
+def test_recipe_upload_survives_concurrent_product_writes(mock_db):
+    """Products created or versioned by another session while images are processed do not break the import."""
+    conn = sqlite3.connect(mock_db)
+    conn.execute("INSERT INTO inventory (item_id, name) VALUES (1, 'Rose')")
+    conn.execute("INSERT INTO products (product_id, display_name, variant_group_id, variant_type) VALUES (7, 'Sunrise', 'grp-1', 'STD')")
+    conn.commit()
+    conn.close()
+
+    real_prepare = db_utils.utils.prepare_images
+    calls = []
+    def prepare_with_concurrent_writes(sources):
+        # Runs before each chunk's write lock: another session adds a product and versions Sunrise
+        calls.append(1)
+        other = sqlite3.connect(mock_db)
+        other.execute("INSERT INTO products (display_name, variant_group_id) VALUES (?, ?)", (f"Walk-in {len(calls)}", f"w{len(calls)}"))
+        if len(calls) == 2:
+            other.execute("UPDATE products SET active = 0 WHERE product_id = 7")
+            other.execute("INSERT INTO products (display_name, variant_group_id, variant_type) VALUES ('Sunrise', 'grp-1', 'STD')")
+        other.commit()
+        other.close()
+        return real_prepare(sources)
+
+    csv = io.StringIO(
+        "product_id,Product,Ingredient,Qty\n"
+        ",Alpha,Rose,1\n"
+        ",Beta,Rose,2\n"
+        "7,Sunrise,Rose,3\n"    # second chunk: product 7 was versioned meanwhile
+        ",Gamma,Rose,4\n"
+    )
+    with patch.object(db_utils.utils, 'prepare_images', side_effect=prepare_with_concurrent_writes):
+        count, errors = db_utils.process_bulk_recipe_upload(csv, chunk_size=2)
+    assert (count, errors) == (4, [])
+
+    conn = sqlite3.connect(mock_db)
+    active = conn.execute("SELECT display_name, COUNT(*) FROM products WHERE active = 1 GROUP BY display_name ORDER BY display_name").fetchall()
+    sunrise_recipe = conn.execute("""
+        SELECT r.qty_needed FROM products p JOIN recipes r ON r.product_id = p.product_id
+        WHERE p.display_name = 'Sunrise' AND p.active = 1
+    """).fetchall()
+    conn.close()
+    assert active == [('Alpha', 1), ('Beta', 1), ('Gamma', 1), ('Sunrise', 1), ('Walk-in 1', 1), ('Walk-in 2', 1), ('Walk-in 3', 1)]
+    assert sunrise_recipe == [(3,)]
+
+def test_scan_recipe_images_prefers_jpg(tmp_path):
+    for name in ("Rose Box.png", "Rose Box.jpg", "Lily.PNG", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+    index = db_utils._scan_recipe_images(str(tmp_path))
+    assert sorted(index) == ["Lily", "Rose Box"]
+    assert index["Rose Box"].endswith("Rose Box.jpg")
+
+def test_recipe_pages_walk_by_keyset(mock_db):
+    """Pages follow (display_name, product_id) order, ties included, and carry only their own ingredients."""
+    conn = sqlite3.connect(mock_db)
+    conn.execute("INSERT INTO inventory (item_id, name) VALUES (1, 'Rose')")
+    names = ["Cedar", "Aster", "Birch", "Aster", "Dahlia"]   # duplicate name: ordered by id
+    for pid, name in enumerate(names, start=1):
+        conn.execute("INSERT INTO products (product_id, display_name, active) VALUES (?, ?, 1)", (pid, name))
+        conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (?, 1, ?)", (pid, pid))
+    conn.execute("INSERT INTO products (product_id, display_name, active) VALUES (6, 'Aster', 0)")
+    conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value) VALUES (6, NULL, 2, 'Category', 'Filler')")
+    conn.commit()
+    conn.close()
+
+    assert db_utils.get_recipe_counts() == {"active": 5, "archived": 1}
+
+    seen, cursor = [], None
+    while True:
+        products, ingredients = db_utils.get_recipe_page(True, limit=2, after=cursor)
+        if products.empty:
+            break
+        assert set(ingredients['product_id']) == set(products['product_id'])
+        seen += products['product_id'].tolist()
+        cursor = db_utils.recipe_page_cursor(products)
+    assert seen == [2, 4, 3, 1, 5]
+
+    products, ingredients = db_utils.get_recipe_page(False)
+    assert products['product_id'].tolist() == [6]
+    assert ingredients['Ingredient'].tolist() == ['Any Filler']
+
+    products, _ = db_utils.get_recipe_products([5, 2])
+    assert products['product_id'].tolist() == [5, 2]
@@ -5,11 +5,14 @@ import io
 from PIL import Image
 import sys
 import pandas as pd
+import urllib.request
+import urllib.error
+from unittest.mock import patch
 
 # Add parent directory to path to import local modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.utils import db_utils, utils
+from src.utils import db_utils, utils, image_server
 
 @pytest.fixture
 def dummy_image_bytes():
@@ -40,9 +43,227 @@ def test_product_image_persistence(setup_db, dummy_image_bytes):
     
     db_utils.create_new_product(product_name, 10.0, dummy_image_bytes, [(1, 1)])
     
-    # Retrieve via get_all_recipes (which is used in the UI)
+    # get_all_recipes (used in the UI) carries only the image key, never the bytes
     df = db_utils.get_all_recipes()
     product_row = df[df['Product'] == product_name].iloc[0]
     
-    assert pd.notna(product_row['image_data'])
-    assert product_row['image_data'] == dummy_image_bytes
\ No newline at end of file
+    assert 'image_data' not in df.columns
+    assert pd.notna(product_row['image_hash'])
+    assert db_utils.get_image(product_row['image_hash'], rendition=None) == dummy_image_bytes
+    assert db_utils.get_product_image_by_id(int(product_row['product_id']), rendition=None) == dummy_image_bytes
+
+def test_create_new_products_batch(setup_db, dummy_image_bytes):
+    """One transaction creates every product, its shared image and recipe rows, returning ids in order."""
+    conn = sqlite3.connect(setup_db)
+    conn.execute("INSERT INTO products (display_name, active) VALUES ('Deleted Later', 0)")
+    conn.execute("DELETE FROM products WHERE display_name = 'Deleted Later'")
+    conn.commit()
+    conn.close()
+
+    ids = db_utils.create_new_products([
+        {"name": "Batch A", "selling_price": 5.0, "image_bytes": dummy_image_bytes, "recipe_items": [(1, 3)], "variant_group_id": "g1"},
+        {"name": "Batch A Deluxe", "image_bytes": dummy_image_bytes, "variant_group_id": "g1", "variant_type": "DLX",
+         "recipe_items": [{"type": "Category", "val": "Greenery", "qty": 2}]},
+    ])
+    # AUTOINCREMENT: the deleted id 2 is not handed out again
+    assert ids == [3, 4]
+
+    variants = db_utils.get_active_product_variants()
+    assert variants[("batch a", "STD")] == (3, "g1")
+    assert variants[("batch a deluxe", "DLX")] == (4, "g1")
+    assert db_utils.get_product_image_by_id(4, rendition=None) == dummy_image_bytes
+
+    conn = sqlite3.connect(setup_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM product_images").fetchone()[0] == 1
+        recipes = conn.execute("SELECT product_id, item_id, qty_needed, requirement_type, requirement_value FROM recipes WHERE product_id >= 3 ORDER BY product_id").fetchall()
+        assert recipes == [(3, 1, 3, 'Specific', None), (4, None, 2, 'Category', 'Greenery')]
+    finally:
+        conn.close()
+    assert db_utils.create_new_products([]) == []
+
+def test_dashboard_queries_exclude_image_bytes(setup_db, dummy_image_bytes):
+    """Polling queries return an image key only; new versions reuse the stored image."""
+    db_path = setup_db
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 12)], image_bytes=dummy_image_bytes)
+
+    # Edit again without a new image - the new version must keep pointing at the same image
+    details = db_utils.get_product_details("Valentine Special")
+    assert details['image_data'] == dummy_image_bytes
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 10)])
+
+    req_df = db_utils.get_production_requirements('2023-10-01', '2023-11-01')
+    goals_df = db_utils.get_production_goals_range('2023-10-01', '2023-11-01')
+    assert 'image_data' not in req_df.columns
+    assert 'image_data' not in goals_df.columns
+
+    active_row = req_df[req_df['active'] == 1].iloc[0]
+    assert db_utils.get_image(active_row['image_hash'], rendition=None) == dummy_image_bytes
+
+    # Stored once, even though three product versions reference it
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM product_images").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_renditions_stored_with_product(setup_db):
+    """Saving a product image stores the card rendition; "full" is served from the original, not a second copy."""
+    large = io.BytesIO()
+    Image.new('RGB', (1200, 900), color='blue').save(large, format='PNG')
+    stored_bytes = utils.process_image(large.getvalue())
+
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 12)], image_bytes=stored_bytes)
+    image_hash = db_utils.get_product_details("Valentine Special")['image_hash']
+
+    for rendition, edge in {**utils.RENDITION_SIZES, 'full': utils.FULL_IMAGE_SIZE}.items():
+        data = db_utils.get_image(image_hash, rendition=rendition)
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.format == 'JPEG'
+            assert max(img.size) == edge
+
+    assert db_utils.get_image(image_hash, rendition='full') == stored_bytes
+    assert len(db_utils.get_image(image_hash, rendition='card')) < len(stored_bytes)
+
+    conn = sqlite3.connect(setup_db)
+    try:
+        stored = {r[0] for r in conn.execute("SELECT rendition FROM image_renditions WHERE image_hash = ?", (image_hash,))}
+        assert stored == set(utils.RENDITION_SIZES)
+    finally:
+        conn.close()
+
+def test_renditions_built_for_legacy_images(setup_db, dummy_image_bytes):
+    """Images stored without renditions get them generated on first request."""
+    db_path = setup_db
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO product_images (image_hash, image_data) VALUES ('legacyhash', ?)", (dummy_image_bytes,))
+    conn.commit()
+    conn.close()
+
+    card = db_utils.get_image('legacyhash', rendition='card')
+    assert card is not None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM image_renditions WHERE image_hash = 'legacyhash'").fetchone()[0]
+        assert count == len(utils.RENDITION_SIZES)
+    finally:
+        conn.close()
+
+def test_batch_image_fetch_uses_cache(setup_db, dummy_image_bytes):
+    """A page of product images is one batch; repeating it is served from memory without queries."""
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 12)], image_bytes=dummy_image_bytes)
+    row = db_utils.get_product_details("Valentine Special")
+    pid, image_hash = row['product_id'], row['image_hash']
+    db_utils.clear_image_cache()
+
+    images = db_utils.get_product_images([pid, 9999], rendition='card')
+    assert list(images) == [pid]
+    assert images[pid] == db_utils.get_image(image_hash, rendition='card')
+
+    with patch.object(db_utils, 'get_connection', side_effect=AssertionError("image cache miss")):
+        assert db_utils.get_product_images([pid], rendition='card') == {pid: images[pid]}
+
+    assert db_utils.get_images([None, float('nan'), 'nohash']) == {}
+    # Callers that name no rendition get the card, never the full-size original
+    assert db_utils.get_images([image_hash]) == {image_hash: images[pid]}
+    assert db_utils.get_product_images([pid]) == images
+    assert db_utils.get_image_cache_stats()['hits'] >= 1
+
+def test_purge_unreferenced_images(setup_db, dummy_image_bytes):
+    """Images used by any product version (archived included) survive GC; replaced ones are purged with their renditions."""
+    blue = io.BytesIO()
+    Image.new('RGB', (10, 10), color='blue').save(blue, format='JPEG')
+
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 12)], image_bytes=dummy_image_bytes)
+    archived_hash = db_utils.get_product_details("Valentine Special")['image_hash']
+
+    # New version, same photo: still one stored copy
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 10)], image_bytes=dummy_image_bytes)
+    assert db_utils.get_image_storage_stats()['images'] == 1
+
+    # Only the archived version still uses the red photo: it is kept
+    conn = sqlite3.connect(setup_db)
+    archived_id, active_id = [r[0] for r in conn.execute("SELECT product_id FROM products WHERE image_hash = ? ORDER BY product_id", (archived_hash,))]
+    conn.close()
+    replaced_hash = db_utils.set_product_image(active_id, blue.getvalue())
+    assert db_utils.purge_unreferenced_images() == {"images": 0, "renditions": 0}
+
+    # Once no version uses it, it is unreferenced
+    db_utils.set_product_image(archived_id, blue.getvalue())
+
+    stats = db_utils.get_image_storage_stats()
+    assert (stats['images'], stats['references'], stats['unreferenced']) == (2, 2, 1)
+
+    assert db_utils.purge_unreferenced_images(vacuum=True) == {"images": 1, "renditions": len(utils.RENDITION_SIZES)}
+    assert db_utils.get_image_storage_stats()['unreferenced'] == 0
+    assert db_utils.get_image(replaced_hash, rendition='card') is not None
+
+    conn = sqlite3.connect(setup_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM image_renditions WHERE image_hash = ?", (archived_hash,)).fetchone()[0] == 0
+    finally:
+        conn.close()
+
+def test_image_server_serves_immutable_urls(setup_db, dummy_image_bytes):
+    """Images are served by content-hash URL with long-lived caching; a matching ETag gets a 304."""
+    details = db_utils.get_product_details("Valentine Special")
+    assert db_utils.update_product_recipe(details['product_id'], "Valentine Special", [(1, 12)], image_bytes=dummy_image_bytes)
+    image_hash = db_utils.get_product_details("Valentine Special")['image_hash']
+
+    assert image_server.image_url(image_hash, host="localhost:8501") is None  # not running yet
+    port = image_server.start(port=0, bind="127.0.0.1")
+    try:
+        url = image_server.image_url(image_hash, 'card', host="localhost:8501")
+        assert url == f"http://localhost:{port}/img/{image_hash}/card.jpg"
+        assert image_server.image_url(image_hash, host="[::1]:8501").startswith(f"http://[::1]:{port}/")
+        assert image_server.image_url(image_hash, host="localhost:8501", secure=True) is None
+
+        with urllib.request.urlopen(url) as resp:
+            assert resp.read() == db_utils.get_image(image_hash, rendition='card')
+            assert resp.headers['Content-Type'] == 'image/jpeg'
+            assert 'immutable' in resp.headers['Cache-Control']
+            etag = resp.headers['ETag']
+
+        with pytest.raises(urllib.error.HTTPError) as not_modified:
+            urllib.request.urlopen(urllib.request.Request(url, headers={'If-None-Match': etag}))
+        assert not_modified.value.code == 304
+
+        for bad in ("/img/nohash/card.jpg", f"/img/{image_hash}/huge.jpg", "/etc/passwd"):
+            with pytest.raises(urllib.error.HTTPError) as missing:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{bad}")
+            assert missing.value.code == 404
+    finally:
+        image_server.stop()
+
+def test_uni_seed_is_incremental(setup_db, tmp_path, monkeypatch):
+    """Reruns skip unchanged photos without decoding them; a changed photo replaces the image in place."""
+    import uni_seed
+    monkeypatch.setattr(uni_seed, "IMAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(uni_seed, "SEED_CHUNK_SIZE", 1)
+    for name, color in (("Sunset_Wrap.png", "orange"), ("Sunset_Wrap_Deluxe.png", "red")):
+        Image.new('RGB', (50, 50), color=color).save(tmp_path / name)
+
+    uni_seed.seed_from_images()
+    variants = db_utils.get_active_product_variants()
+    std_id, group_id = variants[("sunset wrap", "STD")]
+    assert variants[("sunset wrap deluxe", "DLX")][1] == group_id
+    old_hash = db_utils.get_product_details("Sunset Wrap")['image_hash']
+
+    with patch("src.utils.utils.prepare_image") as prepare:
+        uni_seed.seed_from_images()
+        prepare.assert_not_called()
+
+    Image.new('RGB', (50, 50), color='purple').save(tmp_path / "Sunset_Wrap.png")
+    uni_seed.seed_from_images()
+
+    details = db_utils.get_product_details("Sunset Wrap")
+    assert details['product_id'] == std_id
+    assert details['image_hash'] not in (None, old_hash)
+    manifest = db_utils.get_image_manifest()
+    assert {entry[3] for entry in manifest.values()} == {std_id, variants[("sunset wrap deluxe", "DLX")][0]}
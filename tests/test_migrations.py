@@ -0,0 +1,220 @@
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path to import init_db
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import init_db
+from src.utils import migrations
+
+def _index_names(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+        return {r[0] for r in rows}
+    finally:
+        conn.close()
+
+def test_fresh_database_is_fully_migrated(tmp_path):
+    """initialize_database runs every migration and records the version."""
+    db_file = str(tmp_path / "fresh.db")
+    init_db.initialize_database(db_file)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        assert migrations.get_schema_version(conn) == migrations.LATEST_VERSION
+    finally:
+        conn.close()
+    assert {"idx_goals_due_date", "idx_recipes_product", "idx_logs_goal"} <= _index_names(db_file)
+
+def test_existing_database_is_upgraded_in_place(tmp_path):
+    """A pre-migration database (user_version 0, data present) gains the index set without data loss."""
+    db_file = str(tmp_path / "legacy.db")
+    init_db.initialize_database(db_file)
+
+    # Simulate a database created before migrations existed
+    conn = sqlite3.connect(db_file)
+    for name in _index_names(db_file):
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA user_version = 0")
+    conn.execute("INSERT INTO products (display_name) VALUES ('Legacy Bouquet')")
+    conn.commit()
+    conn.close()
+    assert _index_names(db_file) == set()
+
+    assert migrations.migrate_database(db_file) == migrations.LATEST_VERSION
+    assert "idx_products_name_active" in _index_names(db_file)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+    # Re-running is a no-op
+    assert migrations.migrate_database(db_file) == migrations.LATEST_VERSION
+
+def test_hot_queries_use_indexes(setup_db):
+    """Fails if any dashboard/undo hot query regresses to a full table scan."""
+    conn = sqlite3.connect(setup_db)
+    try:
+        assert migrations.find_full_scans(conn) == []
+    finally:
+        conn.close()
+
+def test_hot_queries_use_indexes_after_analyze(tmp_path):
+    """The plan guard must also hold with real planner statistics, before and after orders exist."""
+    db_file = str(tmp_path / "seeded.db")
+    init_db.initialize_database(db_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.executemany("INSERT INTO inventory (item_id, name) VALUES (?, ?)", [(i, f"Item {i}") for i in range(1, 301)])
+        conn.executemany("INSERT INTO products (product_id, display_name) VALUES (?, ?)", [(p, f"Product {p}") for p in range(1, 1001)])
+        conn.executemany(
+            "INSERT INTO recipes (product_id, item_id, qty_needed, requirement_type, requirement_value) VALUES (?, ?, ?, ?, ?)",
+            [(p, (p * 7 + k) % 300 + 1, 1, 'Specific', None) for p in range(1, 1001) for k in range(5)]
+            + [(p, None, 3, 'Category', 'Greenery') for p in range(1, 1001, 10)])
+        conn.commit()
+
+        # A freshly seeded catalogue without orders drives the forecast join from recipes
+        conn.execute("ANALYZE")
+        assert not [p for p in migrations.find_full_scans(conn) if p.startswith("get_forecast_generic_requirements")]
+
+        conn.executemany(
+            "INSERT INTO production_goals (product_id, due_date, qty_ordered, qty_fulfilled) VALUES (?, ?, 5, 0)",
+            [(g % 1000 + 1, f"2024-{g % 12 + 1:02d}-{g % 28 + 1:02d}") for g in range(2000)])
+        conn.commit()
+        conn.execute("ANALYZE")
+        assert migrations.find_full_scans(conn) == []
+    finally:
+        conn.close()
+
+def test_full_scan_is_detected(tmp_path):
+    """The plan guard itself must catch a missing index."""
+    db_file = str(tmp_path / "noindex.db")
+    init_db.initialize_database(db_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("DROP INDEX idx_goals_due_date")
+        problems = migrations.find_full_scans(conn)
+        assert any(p.startswith("get_production_goals_range") for p in problems)
+    finally:
+        conn.close()
+
+def test_image_blobs_move_to_image_store(tmp_path):
+    """Migration 2 moves legacy products.image_data BLOBs into product_images keyed by hash."""
+    db_file = str(tmp_path / "legacy_images.db")
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE products (product_id INTEGER PRIMARY KEY AUTOINCREMENT, display_name TEXT NOT NULL, image_data BLOB, active BOOLEAN DEFAULT 1, note TEXT, variant_type TEXT)")
+    conn.execute("CREATE TABLE production_goals (goal_id INTEGER PRIMARY KEY, product_id INTEGER, due_date DATE)")
+    conn.execute("CREATE TABLE recipes (id INTEGER PRIMARY KEY, product_id INTEGER, item_id INTEGER, requirement_value TEXT)")
+    conn.execute("CREATE TABLE inventory (item_id INTEGER PRIMARY KEY, name TEXT, count_on_hand INTEGER)")
+    conn.execute("CREATE TABLE production_logs (log_id INTEGER PRIMARY KEY, goal_id INTEGER, product_id INTEGER, action_type TEXT DEFAULT 'MAKE', timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO products (display_name, image_data) VALUES ('V1', X'FFD8FF01')")
+    conn.execute("INSERT INTO products (display_name, image_data) VALUES ('V2', X'FFD8FF01')")
+    conn.commit()
+    conn.close()
+
+    migrations.migrate_database(db_file)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute("SELECT image_data, image_hash FROM products").fetchall()
+        assert all(r[0] is None for r in rows)
+        assert rows[0][1] == rows[1][1]
+        stored = conn.execute("SELECT image_data FROM product_images").fetchall()
+        assert stored == [(b'\xff\xd8\xff\x01',)]
+    finally:
+        conn.close()
+
+def test_redundant_renditions_are_dropped(tmp_path):
+    """Migration 13 drops stored full-size and thumbnail copies; the original and card rendition stay."""
+    db_file = str(tmp_path / "renditions.db")
+    init_db.initialize_database(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute("INSERT INTO product_images (image_hash, image_data) VALUES ('h1', X'FFD8FF01')")
+    for rendition in ('thumb', 'card', 'full'):
+        conn.execute("INSERT INTO image_renditions (image_hash, rendition, image_data) VALUES ('h1', ?, X'FFD8')", (rendition,))
+    conn.execute("PRAGMA user_version = 12")
+    conn.commit()
+    conn.close()
+
+    assert migrations.migrate_database(db_file) == migrations.LATEST_VERSION
+
+    conn = sqlite3.connect(db_file)
+    try:
+        assert conn.execute("SELECT rendition FROM image_renditions").fetchall() == [('card',)]
+        assert conn.execute("SELECT COUNT(*) FROM product_images").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_legacy_unit_logs_are_compacted(tmp_path):
+    """Migration 5 folds one-row-per-unit logs from the same action into a single batch row."""
+    db_file = str(tmp_path / "legacy_logs.db")
+    init_db.initialize_database(db_file)
+
+    conn = sqlite3.connect(db_file)
+    conn.execute("DROP TABLE production_log_items")
+    conn.execute("PRAGMA user_version = 4")
+    # fulfill_goal used to insert range(qty) identical PACK rows in one transaction
+    conn.executemany("INSERT INTO production_logs (goal_id, product_id, action_type, timestamp) VALUES (1, 1, 'PACK', '2024-02-10 09:00:00')", [()] * 5)
+    conn.execute("INSERT INTO production_logs (goal_id, product_id, action_type, timestamp) VALUES (1, 1, 'MAKE', '2024-02-10 09:00:00')")
+    conn.execute("INSERT INTO production_logs (goal_id, product_id, action_type, timestamp) VALUES (1, 1, 'PACK', '2024-02-10 09:05:00')")
+    conn.commit()
+    conn.close()
+
+    assert migrations.migrate_database(db_file) == migrations.LATEST_VERSION
+
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute("SELECT action_type, qty, timestamp FROM production_logs ORDER BY log_id").fetchall()
+        assert rows == [
+            ('PACK', 5, '2024-02-10 09:00:00'),
+            ('MAKE', 1, '2024-02-10 09:00:00'),
+            ('PACK', 1, '2024-02-10 09:05:00'),
+        ]
+    finally:
+        conn.close()
+
+def test_data_versions_bumped_by_triggers(tmp_path):
+    """Migration 7 keeps a per-table change counter that moves on every write, from any connection."""
+    db_file = str(tmp_path / "versions.db")
+    init_db.initialize_database(db_file)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        def versions():
+            return dict(conn.execute("SELECT table_name, version FROM data_versions").fetchall())
+        before = versions()
+        conn.execute("INSERT INTO inventory (name, count_on_hand) VALUES ('Rose', 5)")
+        conn.execute("UPDATE inventory SET count_on_hand = 4")
+        conn.commit()
+        after = versions()
+        assert after['inventory'] == before['inventory'] + 2
+        assert after['products'] == before['products']
+    finally:
+        conn.close()
+
+def test_search_reindex_only_on_real_rename(tmp_path):
+    """Migration 14: rewriting an item's name with the same value does not reindex its products."""
+    db_file = str(tmp_path / "search.db")
+    init_db.initialize_database(db_file)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("INSERT INTO inventory (item_id, name) VALUES (1, 'Red Rose')")
+        conn.execute("INSERT INTO products (product_id, display_name) VALUES (1, 'Bouquet')")
+        conn.execute("INSERT INTO recipes (product_id, item_id, qty_needed) VALUES (1, 1, 3)")
+        # Drop the product's index row so any reindex is visible
+        conn.execute("DELETE FROM product_search WHERE rowid = 1")
+
+        conn.execute("UPDATE inventory SET name = 'Red Rose' WHERE item_id = 1")
+        assert conn.execute("SELECT COUNT(*) FROM product_search WHERE rowid = 1").fetchone()[0] == 0
+
+        conn.execute("UPDATE inventory SET name = 'Crimson Rose' WHERE item_id = 1")
+        assert conn.execute("SELECT ingredients FROM product_search WHERE rowid = 1").fetchone()[0] == 'Crimson Rose'
+        conn.commit()
+    finally:
+        conn.close()
+    assert "idx_recipes_item" in _index_names(db_file)
@@ -7,7 +7,7 @@ from PIL import Image
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.utils.utils import process_image
+from src.utils.utils import process_image, process_image_renditions, prepare_images, RENDITION_SIZES
 
 def create_dummy_image(format='PNG', size=(1000, 1000), color='red'):
     """Helper to create a byte stream image."""
@@ -44,4 +44,36 @@ def test_process_image_rgba_conversion():
     assert processed_bytes is not None
     
     with Image.open(io.BytesIO(processed_bytes)) as img:
-        assert img.mode == 'RGB'
\ No newline at end of file
+        assert img.mode == 'RGB'
+
+def test_process_image_renditions_sizes():
+    """One call produces every rendition, each bounded by its own edge size."""
+    renditions = process_image_renditions(create_dummy_image(size=(1600, 1200)))
+
+    assert set(renditions) == {(name, 'JPEG') for name in RENDITION_SIZES}
+    for name, edge in RENDITION_SIZES.items():
+        with Image.open(io.BytesIO(renditions[(name, 'JPEG')])) as img:
+            assert img.format == 'JPEG'
+            assert max(img.size) == edge
+
+def test_process_image_renditions_invalid_input():
+    """Invalid input yields no renditions rather than raising."""
+    assert process_image_renditions(None) == {}
+    assert process_image_renditions(b"not an image") == {}
+
+def test_prepare_images_keeps_order_and_captures_errors(tmp_path):
+    """The process pool returns results in input order; a bad file does not stop the batch."""
+    sources = []
+    for i, color in enumerate(['red', 'green', 'blue', 'white']):
+        path = tmp_path / f"photo_{i}.png"
+        path.write_bytes(create_dummy_image(size=(900, 300 + i * 100), color=color))
+        sources.append(str(path))
+    sources.insert(2, b"not an image")
+
+    results = prepare_images(sources, max_workers=2)
+    assert [r.error is None for r in results] == [True, True, False, True, True]
+    assert results[2].image_bytes is None and results[2].renditions == {}
+
+    with Image.open(io.BytesIO(results[4].image_bytes)) as img:
+        assert img.size == (800, 533)
+    assert set(results[0].renditions) == {(name, 'JPEG') for name in RENDITION_SIZES}
@@ -1,5 +1,6 @@
 import os
 import glob
+import hashlib
 import logging
 import uuid
 from src.utils import db_utils, utils
@@ -16,11 +17,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 IMAGE_DIR = os.path.join("images", "recipes")
+# New products written per transaction
+SEED_CHUNK_SIZE = 200
+
+def _file_hash(path):
+    """SHA-256 of a source photo's bytes (tells a re-saved file from a changed one)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 def seed_from_images():
     """
     Scans images/recipes and creates products for any images that don't 
     already have an active product in the database.
+    Incremental: files unchanged since the last run (per the image manifest) are not read,
+    and a changed photo replaces its product's image in place.
     """
     if not os.path.exists(IMAGE_DIR):
         print(f"❌ Directory not found: {IMAGE_DIR}")
@@ -31,6 +44,8 @@ def seed_from_images():
     
     files = glob.glob(os.path.join(IMAGE_DIR, "*"))
     count = 0
+    updated = 0
+    unchanged = 0
     skipped = 0
     errors = 0
     
@@ -87,7 +102,18 @@ def seed_from_images():
 
     print(f"🧩 Found {len(product_groups)} unique product families.")
 
-    # --- PASS 2: PROCESS AND INSERT ---
+    # --- PASS 2: PLAN ---
+    # One read each of the manifest and the active products; only new or changed files go on
+    manifest = db_utils.get_image_manifest()
+    active = db_utils.get_active_product_variants()
+    groups_by_name = {}
+    for (name, _), (_, gid) in active.items():
+        if gid:
+            groups_by_name.setdefault(name, gid)
+
+    to_create = []   # (variant, group_id, stat, content_hash)
+    to_update = []   # (variant, product_id, stat, content_hash)
+    manifest_rows = []
     
     for base_name, variants in product_groups.items():
         # Generate a shared Group ID for this family
@@ -96,7 +122,7 @@ def seed_from_images():
         potential_std_names = [base_name, f"{base_name} Standard"]
         
         for n in potential_std_names:
-            gid = db_utils.get_product_group_id(n)
+            gid = groups_by_name.get(n.lower())
             if gid:
                 existing_group_id = gid
                 break
@@ -105,46 +131,94 @@ def seed_from_images():
         group_id = existing_group_id if existing_group_id else str(uuid.uuid4())
         
         for v in variants:
-            p_name = v['full_name']
-            v_type = v['type']
             f_path = v['file']
-            
-            # 1. Check for Duplicates
-            if db_utils.check_product_variant(p_name, v_type):
-                 print(f"⚠️  Skipping '{p_name}' (Already active)")
-                 skipped += 1
-                 continue
-
-            # 2. Process Image
-            try:
-                image_bytes = utils.process_image(f_path)
-            except Exception as e:
-                logger.error(f"Failed to process image {f_path}: {e}")
-                print(f"❌ Failed to process image for '{p_name}'")
-                errors += 1
+            stat = os.stat(f_path)
+            current = active.get((v['full_name'].lower(), v['type']))
+            product_id = current[0] if current else None
+            seen = manifest.get(f_path)
+
+            # 1. Same mtime and size as last run: nothing to read or decode
+            if seen and product_id and seen[0] == stat.st_mtime_ns and seen[1] == stat.st_size:
+                if seen[3] != product_id:
+                    # Product was re-versioned (e.g. recipe edit); follow the active row
+                    manifest_rows.append((f_path, stat.st_mtime_ns, stat.st_size, seen[2], product_id))
+                unchanged += 1
                 continue
 
-            # 3. Create Product
-            success = db_utils.create_new_product(
-                name=p_name,
-                selling_price=0.0,
-                image_bytes=image_bytes,
-                recipe_items=[], # Empty recipe
-                category="Standard",
-                note="Imported via uni_seed.py",
-                variant_group_id=group_id,
-                variant_type=v_type
-            )
-            
-            if success:
-                print(f"✅ Created '{p_name}' [{v_type}]")
-                count += 1
+            content_hash = _file_hash(f_path)
+            if product_id is None:
+                to_create.append((v, group_id, stat, content_hash))
+            elif seen is not None and seen[2] != content_hash:
+                to_update.append((v, product_id, stat, content_hash))
             else:
-                print(f"❌ Failed to create '{p_name}' (DB Error)")
+                # Touched but identical, or created before the manifest existed: just record it
+                if seen is None:
+                    print(f"⚠️  Skipping '{v['full_name']}' (Already active)")
+                    skipped += 1
+                else:
+                    unchanged += 1
+                manifest_rows.append((f_path, stat.st_mtime_ns, stat.st_size, content_hash, product_id))
+
+    # --- PASS 3: PROCESS IMAGES (parallel) ---
+    pending = to_create + to_update
+    if pending:
+        print(f"🖼️  Processing {len(pending)} images on up to {utils.default_image_workers()} workers...")
+    prepared = utils.prepare_images([v['file'] for v, *_ in pending])
+    created_images = prepared[:len(to_create)]
+    updated_images = prepared[len(to_create):]
+
+    # --- PASS 4: WRITE (single writer, one transaction per chunk of new products) ---
+    for start in range(0, len(to_create), SEED_CHUNK_SIZE):
+        chunk = zip(to_create[start:start + SEED_CHUNK_SIZE], created_images[start:start + SEED_CHUNK_SIZE])
+        batch, batch_files = [], []
+        for (v, group_id, stat, content_hash), image in chunk:
+            if image.error:
+                logger.error(f"Failed to process image {v['file']}: {image.error}")
+                print(f"❌ Failed to process image for '{v['full_name']}'")
                 errors += 1
+                continue
+            batch.append({
+                "name": v['full_name'],
+                "selling_price": 0.0,
+                "image_bytes": image.image_bytes,
+                "recipe_items": [], # Empty recipe
+                "category": "Standard",
+                "note": "Imported via uni_seed.py",
+                "variant_group_id": group_id,
+                "variant_type": v['type'],
+                "image_renditions": image.renditions,
+            })
+            batch_files.append((v, stat, content_hash))
+
+        product_ids = db_utils.create_new_products(batch)
+        if product_ids is None:
+            for v, _, _ in batch_files:
+                print(f"❌ Failed to create '{v['full_name']}' (DB Error)")
+            errors += len(batch_files)
+            continue
+        for (v, stat, content_hash), product_id in zip(batch_files, product_ids):
+            print(f"✅ Created '{v['full_name']}' [{v['type']}]")
+            manifest_rows.append((v['file'], stat.st_mtime_ns, stat.st_size, content_hash, product_id))
+        count += len(product_ids)
+
+    for (v, product_id, stat, content_hash), image in zip(to_update, updated_images):
+        if image.error:
+            logger.error(f"Failed to process image {v['file']}: {image.error}")
+            print(f"❌ Failed to process image for '{v['full_name']}'")
+            errors += 1
+            continue
+        if db_utils.set_product_image(product_id, image.image_bytes, image.renditions):
+            print(f"🔄 Updated image for '{v['full_name']}' [{v['type']}]")
+            updated += 1
+            manifest_rows.append((v['file'], stat.st_mtime_ns, stat.st_size, content_hash, product_id))
+        else:
+            print(f"❌ Failed to update image for '{v['full_name']}' (DB Error)")
+            errors += 1
+
+    db_utils.save_image_manifest(manifest_rows)
 
     print("-" * 40)
-    print(f"🎉 Finished! Created: {count} | Skipped: {skipped} | Errors: {errors}")
+    print(f"🎉 Finished! Created: {count} | Updated: {updated} | Unchanged: {unchanged} | Skipped: {skipped} | Errors: {errors}")
 
 if __name__ == "__main__":
     seed_from_images()
\ No newline at end of file